@@ -12,21 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from airflow import configuration
 from airflow.exceptions import AirflowException
 from airflow.models import DagBag
 
 
 def get_task(dag_id, task_id):
     """Return the task object identified by the given dag_id and task_id."""
-    dagbag = DagBag()
+    dagbag = DagBag(store_serialized_dags=configuration.getboolean(
+        'core', 'store_serialized_dags'))
 
     # Check DAG exists.
-    if dag_id not in dagbag.dags:
+    dag = dagbag.get_dag(dag_id)
+    if dag is None:
         error_message = "Dag id {} not found".format(dag_id)
         raise AirflowException(error_message)
 
-    # Get DAG object and check Task Exists
-    dag = dagbag.get_dag(dag_id)
+    # Check Task Exists
     if not dag.has_task(task_id):
         error_message = 'Task {} not found in dag {}'.format(task_id, dag_id)
         raise AirflowException(error_message)
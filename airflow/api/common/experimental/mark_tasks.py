@@ -16,6 +16,7 @@ import datetime
 
 from airflow.jobs import BackfillJob
 from airflow.models import DagRun, TaskInstance
+from airflow.dag.serialization import SerializedBaseOperator
 from airflow.operators.subdag_operator import SubDagOperator
 from airflow.settings import Session
 from airflow.utils.state import State
@@ -128,7 +129,9 @@ def set_state(task, execution_date, upstream=False, downstream=False,
                 continue
 
             current_task = current_dag.get_task(task_id)
-            if isinstance(current_task, SubDagOperator):
+            if (isinstance(current_task, SubDagOperator) or
+                    (isinstance(current_task, SerializedBaseOperator) and
+                     current_task.subdag)):
                 # this works as a kind of integrity check
                 # it creates missing dag runs for subdagoperators,
                 # maybe this should be moved to dagrun.verify_integrity
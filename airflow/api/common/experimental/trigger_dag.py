@@ -15,18 +15,19 @@
 import datetime
 import json
 
+from airflow import configuration
 from airflow.exceptions import AirflowException
 from airflow.models import DagRun, DagBag
 from airflow.utils.state import State
 
 
 def trigger_dag(dag_id, run_id=None, conf=None, execution_date=None):
-    dagbag = DagBag()
-
-    if dag_id not in dagbag.dags:
-        raise AirflowException("Dag id {} not found".format(dag_id))
+    dagbag = DagBag(store_serialized_dags=configuration.getboolean(
+        'core', 'store_serialized_dags'))
 
     dag = dagbag.get_dag(dag_id)
+    if dag is None:
+        raise AirflowException("Dag id {} not found".format(dag_id))
 
     if not execution_date:
         execution_date = datetime.datetime.utcnow()
@@ -800,7 +800,8 @@ def scheduler(args):
         subdir=process_subdir(args.subdir),
         run_duration=args.run_duration,
         num_runs=args.num_runs,
-        do_pickle=args.do_pickle)
+        do_pickle=args.do_pickle,
+        profile=args.profile)
 
     if args.daemon:
         pid, stdout, stderr, log_file = setup_locations("scheduler", args.pid, args.stdout, args.stderr, args.log_file)
@@ -1381,6 +1382,13 @@ class CLIFactory(object):
             ("-n", "--num_runs"),
             default=-1, type=int,
             help="Set the number of runs to execute before exiting"),
+        'profile': Arg(
+            ("--profile",),
+            default=False,
+            help=(
+                "Periodically print the time spent and the number of queries "
+                "run in each phase of the scheduling loop"),
+            action="store_true"),
         # worker
         'do_pickle': Arg(
             ("-p", "--do_pickle"),
@@ -1581,8 +1589,8 @@ class CLIFactory(object):
             'func': scheduler,
             'help': "Start a scheduler instance",
             'args': ('dag_id_opt', 'subdir', 'run_duration', 'num_runs',
-                     'do_pickle', 'pid', 'daemon', 'stdout', 'stderr',
-                     'log_file'),
+                     'do_pickle', 'profile', 'pid', 'daemon', 'stdout',
+                     'stderr', 'log_file'),
         }, {
             'func': worker,
             'help': "Start a Celery worker node",
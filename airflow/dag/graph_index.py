@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import defaultdict, deque
+
+from airflow.exceptions import AirflowException
+
+
+class DagGraphIndex(object):
+    """
+    Precomputed view of the dependencies between the tasks of a DAG: the
+    direct relatives of each task, a topological order of the tasks and,
+    computed on first use, the topological waves of the tasks and the
+    transitive closure of the dependencies.
+
+    The closure is stored as one bitmask per task, where bit i stands for the
+    i-th task in topological order, so that the relatives of a task are
+    merged with a single OR per edge and their priority weights are summed
+    with a popcount per distinct weight.
+
+    The index is a snapshot: the DAG drops it when tasks or dependencies are
+    added, see DAG.graph_index.
+    """
+
+    def __init__(self, dag_id, task_dict):
+        """
+        :param dag_id: the ID of the DAG, for the error messages
+        :type dag_id: unicode
+        :param task_dict: the tasks of the DAG by task ID
+        :type task_dict: dict[unicode, BaseOperator]
+        :raises AirflowException: if the dependencies contain a cycle
+        """
+        self.task_dict = task_dict
+        self.upstream = {}
+        self.downstream = {}
+        for task_id, task in task_dict.items():
+            self.upstream[task_id] = [
+                tid for tid in task._upstream_task_ids if tid in task_dict]
+            self.downstream[task_id] = [
+                tid for tid in task._downstream_task_ids if tid in task_dict]
+        self.topological_order = self._sort(dag_id)
+        self._bits = {task_id: 1 << i
+                      for i, task_id in enumerate(self.topological_order)}
+        self.sorted_tasks = tuple(task_dict[task_id]
+                                  for task_id in self.topological_order)
+        self._waves = None
+        self._upstream_lists = {}
+        self._downstream_lists = {}
+        self._closures = {}
+        self._weight_masks = None
+        self._priority_weight_totals = {}
+
+    def _sort(self, dag_id):
+        """
+        Kahn's algorithm, keeping the order of the tasks in the DAG among
+        the tasks that are ready at the same time.
+        """
+        in_degree = {task_id: len(upstream)
+                     for task_id, upstream in self.upstream.items()}
+        ready = deque(task_id for task_id in self.task_dict
+                      if not in_degree[task_id])
+        order = []
+        while ready:
+            task_id = ready.popleft()
+            order.append(task_id)
+            for downstream_task_id in self.downstream[task_id]:
+                in_degree[downstream_task_id] -= 1
+                if not in_degree[downstream_task_id]:
+                    ready.append(downstream_task_id)
+        if len(order) < len(self.task_dict):
+            raise AirflowException("A cyclic dependency occurred in dag: {}"
+                                   .format(dag_id))
+        return order
+
+    @property
+    def waves(self):
+        """
+        The tasks grouped by their depth in the DAG: the first wave holds the
+        tasks without upstream tasks, and each other wave holds the tasks
+        whose upstream tasks are all in the previous waves, at least one of
+        them in the previous wave. The tasks of a wave don't depend on each
+        other.
+
+        :rtype: tuple[tuple[BaseOperator]]
+        """
+        if self._waves is None:
+            depths = {}
+            waves = []
+            for task_id in self.topological_order:
+                depth = max([depths[tid] + 1 for tid in self.upstream[task_id]] or [0])
+                depths[task_id] = depth
+                if depth == len(waves):
+                    waves.append([])
+                waves[depth].append(self.task_dict[task_id])
+            self._waves = tuple(tuple(wave) for wave in waves)
+        return self._waves
+
+    def get_direct_relatives(self, task_id, upstream=False):
+        """
+        :return: the tasks directly upstream or downstream of a task
+        :rtype: list[BaseOperator]
+        """
+        lists = self._upstream_lists if upstream else self._downstream_lists
+        tasks = lists.get(task_id)
+        if tasks is None:
+            relatives = self.upstream if upstream else self.downstream
+            tasks = [self.task_dict[tid] for tid in relatives[task_id]]
+            lists[task_id] = tasks
+        return tasks
+
+    def _get_closure(self, upstream):
+        closure = self._closures.get(upstream)
+        if closure is None:
+            closure = {}
+            if upstream:
+                order, relatives = self.topological_order, self.upstream
+            else:
+                order, relatives = reversed(self.topological_order), self.downstream
+            # The relatives of a task come before it in this order
+            for task_id in order:
+                mask = 0
+                for relative_id in relatives[task_id]:
+                    mask |= self._bits[relative_id] | closure[relative_id]
+                closure[task_id] = mask
+            self._closures[upstream] = closure
+        return closure
+
+    def get_flat_relative_ids(self, task_id, upstream=False):
+        """
+        :return: the IDs of all the tasks upstream or downstream of a task,
+            in topological order
+        :rtype: list[unicode]
+        """
+        mask = self._get_closure(upstream)[task_id]
+        order = self.topological_order
+        return [order[i] for i, bit in enumerate(reversed(bin(mask)[2:]))
+                if bit == '1']
+
+    def priority_weight_total(self, task_id):
+        """
+        :return: the priority weight of a task plus the priority weights of
+            all the tasks downstream of it
+        :rtype: int
+        """
+        total = self._priority_weight_totals.get(task_id)
+        if total is None:
+            if self._weight_masks is None:
+                weight_masks = defaultdict(int)
+                for tid, bit in self._bits.items():
+                    weight_masks[self.task_dict[tid].priority_weight] |= bit
+                self._weight_masks = list(weight_masks.items())
+            mask = self._get_closure(upstream=False)[task_id]
+            total = self.task_dict[task_id].priority_weight
+            if mask:
+                for weight, weight_mask in self._weight_masks:
+                    total += weight * bin(mask & weight_mask).count('1')
+            self._priority_weight_totals[task_id] = total
+        return total
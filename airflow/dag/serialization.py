@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Serialization of DAGs to JSON-compatible dicts, so that the webserver and the
+API can display DAGs without executing the DAG files.
+
+Only what is needed to display a DAG and to create its DAG runs is kept: the
+attributes of the DAG, the attributes of its tasks, the dependencies between
+the tasks and the values of their template fields. Values that can't be
+represented in JSON, e.g. callables, are stored as their string
+representation.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from datetime import datetime, timedelta
+
+import dateutil.parser
+import six
+
+from airflow.exceptions import AirflowException
+from airflow.models import BaseOperator, DAG
+
+TYPE = '__type'
+VALUE = '__value'
+
+DAG_FIELDS = [
+    'description', 'schedule_interval', 'start_date', 'end_date', 'fileloc',
+    'full_filepath', 'concurrency', 'max_active_runs', 'dagrun_timeout',
+    'default_view', 'orientation', 'catchup', 'params', 'template_searchpath',
+]
+
+TASK_FIELDS = [
+    'owner', 'email', 'email_on_retry', 'email_on_failure', 'retries',
+    'retry_delay', 'retry_exponential_backoff', 'max_retry_delay', 'start_date',
+    'end_date', 'depends_on_past', 'wait_for_downstream', 'adhoc', 'params',
+    'priority_weight', 'queue', 'pool', 'sla', 'execution_timeout',
+    'trigger_rule', 'run_as_user', 'task_concurrency',
+]
+
+
+def serialize_value(value):
+    """
+    :return: a JSON-compatible representation of the value
+    """
+    if value is None or isinstance(value, (bool, int, float) + six.string_types):
+        return value
+    if isinstance(value, datetime):
+        return {TYPE: 'datetime', VALUE: value.isoformat()}
+    if isinstance(value, timedelta):
+        return {TYPE: 'timedelta', VALUE: value.total_seconds()}
+    if isinstance(value, (list, tuple, set)):
+        return [serialize_value(v) for v in value]
+    if isinstance(value, dict):
+        return {TYPE: 'dict',
+                VALUE: {str(k): serialize_value(v) for k, v in value.items()}}
+    return str(value)
+
+
+def deserialize_value(value):
+    """
+    :return: the value represented by the output of serialize_value
+    """
+    if isinstance(value, list):
+        return [deserialize_value(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    value_type = value[TYPE]
+    if value_type == 'datetime':
+        return dateutil.parser.parse(value[VALUE])
+    if value_type == 'timedelta':
+        return timedelta(seconds=value[VALUE])
+    if value_type == 'dict':
+        return {k: deserialize_value(v) for k, v in value[VALUE].items()}
+    raise ValueError("Unknown serialized type {}".format(value_type))
+
+
+class SerializedBaseOperator(BaseOperator):
+    """
+    Stands in for the tasks of a deserialized DAG. It has the attributes and
+    the values of the template fields of the original task, but can't be
+    executed.
+    """
+
+    # The subdag of a deserialized SubDagOperator
+    subdag = None
+
+    def __init__(self, task_type, ui_color, ui_fgcolor, template_fields,
+                 *args, **kwargs):
+        super(SerializedBaseOperator, self).__init__(*args, **kwargs)
+        self._task_type = task_type
+        self.ui_color = ui_color
+        self.ui_fgcolor = ui_fgcolor
+        self.template_fields = template_fields
+
+    @property
+    def task_type(self):
+        return self._task_type
+
+    def execute(self, context):
+        raise AirflowException(
+            "The task {} was loaded from its serialized representation and "
+            "can't be executed".format(self.task_id))
+
+
+def serialize_task(task):
+    """
+    :param task: the task to serialize
+    :type task: BaseOperator
+    :rtype: dict
+    """
+    data = {
+        'task_id': task.task_id,
+        'task_type': task.task_type,
+        'ui_color': task.ui_color,
+        'ui_fgcolor': task.ui_fgcolor,
+        'template_fields': list(task.template_fields),
+        'template_field_values': {
+            field: serialize_value(getattr(task, field, None))
+            for field in task.template_fields},
+        'upstream_task_ids': sorted(task.upstream_task_ids),
+    }
+    for field in TASK_FIELDS:
+        data[field] = serialize_value(getattr(task, field, None))
+    subdag = getattr(task, 'subdag', None)
+    if isinstance(subdag, DAG):
+        data['subdag'] = serialize_dag(subdag)
+    return data
+
+
+def serialize_dag(dag):
+    """
+    :param dag: the DAG to serialize, along with its subdags
+    :type dag: DAG
+    :rtype: dict
+    """
+    data = {'dag_id': dag.dag_id}
+    for field in DAG_FIELDS:
+        data[field] = serialize_value(getattr(dag, field, None))
+    data['tasks'] = [serialize_task(task) for task in dag.tasks]
+    return data
+
+
+def deserialize_dag(data, parent_dag=None):
+    """
+    :param data: the output of serialize_dag
+    :type data: dict
+    :param parent_dag: the parent DAG if the DAG is a subdag
+    :type parent_dag: DAG
+    :return: a DAG whose tasks are SerializedBaseOperators
+    :rtype: DAG
+    """
+    kwargs = {field: deserialize_value(data[field]) for field in DAG_FIELDS
+              if field not in ('fileloc', 'full_filepath')}
+    dag = DAG(dag_id=data['dag_id'], full_filepath=data['full_filepath'], **kwargs)
+    dag.fileloc = data['fileloc']
+    if parent_dag is not None:
+        dag.parent_dag = parent_dag
+        dag.is_subdag = True
+
+    for task_data in data['tasks']:
+        kwargs = {field: deserialize_value(task_data[field])
+                  for field in TASK_FIELDS}
+        task = SerializedBaseOperator(
+            task_id=task_data['task_id'],
+            task_type=task_data['task_type'],
+            ui_color=task_data['ui_color'],
+            ui_fgcolor=task_data['ui_fgcolor'],
+            template_fields=task_data['template_fields'],
+            dag=dag,
+            **kwargs)
+        for field, value in task_data['template_field_values'].items():
+            setattr(task, field, deserialize_value(value))
+        if 'subdag' in task_data:
+            task.subdag = deserialize_dag(task_data['subdag'], parent_dag=dag)
+
+    for task_data in data['tasks']:
+        task = dag.get_task(task_data['task_id'])
+        for upstream_task_id in task_data['upstream_task_ids']:
+            task.set_upstream(dag.get_task(upstream_task_id))
+    return dag
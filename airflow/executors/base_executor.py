@@ -17,6 +17,7 @@ from datetime import datetime
 from airflow import configuration, settings
 from airflow.utils.log.logging_mixin import LoggingMixin
 from airflow.utils.state import State
+from airflow.utils.task_queue import TaskQueue
 
 PARALLELISM = configuration.getint('core', 'PARALLELISM')
 
@@ -34,7 +35,7 @@ class BaseExecutor(LoggingMixin):
         :type parallelism: int
         """
         self.parallelism = parallelism
-        self.queued_tasks = {}
+        self.queued_tasks = TaskQueue()
         self.running = {}
         self.event_buffer = {}
 
@@ -94,6 +95,17 @@ class BaseExecutor(LoggingMixin):
         """
         pass
 
+    def get_wait_handles(self):
+        """
+        Executors that receive task results asynchronously should override
+        this so that the scheduler can wait for results instead of polling.
+
+        :return: handles that become ready for reading when a task result
+        is available to sync
+        :rtype: list
+        """
+        return []
+
     def heartbeat(self):
 
         # Triggering new jobs
@@ -118,29 +130,31 @@ class BaseExecutor(LoggingMixin):
                 total_running_secs = (now - ti.start_date).total_seconds()
         Stats.gauge('outstanding_tasks_running_secs', total_running_secs)
 
-        sorted_queue = sorted(
-            [(k, v) for k, v in self.queued_tasks.items()],
-            key=lambda x: x[1][1],
-            reverse=True)
-        for i in range(min((open_slots, len(self.queued_tasks)))):
-            key, (command, _, queue, ti) = sorted_queue.pop(0)
-            # TODO(jlowin) without a way to know what Job ran which tasks,
-            # there is a danger that another Job started running a task
-            # that was also queued to this executor. This is the last chance
-            # to check if that happened. The most probable way is that a
-            # Scheduler tried to run a task that was originally queued by a
-            # Backfill. This fix reduces the probability of a collision but
-            # does NOT eliminate it.
-            self.queued_tasks.pop(key)
-            ti.refresh_from_db()
+        tasks_to_run = self.queued_tasks.pop_highest(open_slots)
+
+        # TODO(jlowin) without a way to know what Job ran which tasks,
+        # there is a danger that another Job started running a task
+        # that was also queued to this executor. This is the last chance
+        # to check if that happened. The most probable way is that a
+        # Scheduler tried to run a task that was originally queued by a
+        # Backfill. This fix reduces the probability of a collision but
+        # does NOT eliminate it.
+        # Imported here as airflow.models depends on the executors
+        from airflow.models import TaskInstance
+        TaskInstance.refresh_many_from_db(
+            [ti for _, (_, _, _, ti) in tasks_to_run])
+        batch = []
+        for key, (command, _, queue, ti) in tasks_to_run:
             if ti.state != State.RUNNING:
                 self.running[key] = command
-                self.execute_async(key, command=command, queue=queue)
+                batch.append((key, command, queue))
             else:
                 self.log.debug(
                     'Task is already running, not sending to executor: %s',
                     key
                 )
+        if batch:
+            self.execute_async_batch(batch)
 
         # Calling child class sync method
         self.log.debug("Calling the %s sync method", self.__class__)
@@ -183,6 +197,18 @@ class BaseExecutor(LoggingMixin):
         """
         raise NotImplementedError()
 
+    def execute_async_batch(self, tasks):
+        """
+        Executes the commands of a batch of tasks asynchronously. Executors
+        that can send many tasks at once should override this, the default
+        implementation calls execute_async for each task.
+
+        :param tasks: the key, command and queue of each task
+        :type tasks: list[tuple]
+        """
+        for key, command, queue in tasks:
+            self.execute_async(key, command=command, queue=queue)
+
     def end(self):  # pragma: no cover
         """
         This method is called when the caller is done submitting job and is
@@ -14,14 +14,19 @@
 
 import subprocess
 import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 
 from celery import Celery
 from celery import states as celery_states
+from celery.backends.base import KeyValueStoreBackend
+from celery.backends.database import DatabaseBackend, Task as TaskDb, session_cleanup
 
 from airflow.config_templates.default_celery import DEFAULT_CELERY_CONFIG
 from airflow.exceptions import AirflowException
 from airflow.executors.base_executor import BaseExecutor
 from airflow import configuration
+from airflow.settings import Stats
 from airflow.utils.log.logging_mixin import LoggingMixin
 from airflow.utils.module_loading import import_string
 
@@ -55,6 +60,71 @@ def execute_command(command):
         raise AirflowException('Celery command failed')
 
 
+class BulkStateFetcher(LoggingMixin):
+    """
+    Gets the states of many Celery tasks with as few round trips to the
+    result backend as possible: a single query for a database backend, a
+    single MGET for a key-value store backend such as Redis or Memcached.
+    Other backends are asked for the state of each task.
+
+    The tasks that are not known by the backend are PENDING, as with
+    AsyncResult.state.
+    """
+
+    # Maximum number of task ids in a query to a database backend
+    DB_BATCH_SIZE = 500
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_many(self, async_results):
+        """
+        :param async_results: the results of the tasks to get the states of
+        :type async_results: list[celery.result.AsyncResult]
+        :return: the state of each task, by task id
+        :rtype: dict[unicode, unicode]
+        """
+        if not async_results:
+            return {}
+        if isinstance(self.backend, DatabaseBackend):
+            states = self._get_many_from_db_backend(async_results)
+        elif isinstance(self.backend, KeyValueStoreBackend):
+            states = self._get_many_from_kv_backend(async_results)
+        else:
+            states = {result.task_id: result.state for result in async_results}
+        self.log.debug("Fetched the states of %s celery task(s)", len(states))
+        return states
+
+    def _get_many_from_kv_backend(self, async_results):
+        task_ids = [result.task_id for result in async_results]
+        keys = [self.backend.get_key_for_task(task_id) for task_id in task_ids]
+        values = self.backend.mget(keys)
+        if hasattr(values, 'items'):
+            values = [values.get(key) for key in keys]
+        states = {}
+        for task_id, value in zip(task_ids, values):
+            if value is None:
+                states[task_id] = celery_states.PENDING
+            else:
+                # Only the status is needed, so the result isn't turned back
+                # into an exception for the failed tasks
+                states[task_id] = self.backend.decode(value)['status']
+        return states
+
+    def _get_many_from_db_backend(self, async_results):
+        task_ids = [result.task_id for result in async_results]
+        states = dict.fromkeys(task_ids, celery_states.PENDING)
+        session = self.backend.ResultSession()
+        with session_cleanup(session):
+            for i in range(0, len(task_ids), self.DB_BATCH_SIZE):
+                batch = task_ids[i:i + self.DB_BATCH_SIZE]
+                states.update(
+                    session
+                    .query(TaskDb.task_id, TaskDb.status)
+                    .filter(TaskDb.task_id.in_(batch)))
+        return states
+
+
 class CeleryExecutor(BaseExecutor):
     """
     CeleryExecutor is recommended for production use of Airflow. It allows
@@ -63,10 +133,28 @@ class CeleryExecutor(BaseExecutor):
     Celery is a simple, flexible and reliable distributed system to process
     vast amounts of messages, while providing operations with the tools
     required to maintain such a system.
+
+    With bulk_state_sync, the states of the tasks are fetched from the result
+    backend all at once on every heartbeat, see BulkStateFetcher. The tasks
+    leave the executor as soon as they reach a ready state, which Celery
+    never changes, so only the tasks whose state may still change are polled.
+
+    The tasks released on a heartbeat are grouped by queue and sent to the
+    broker by send_task_parallelism threads, each publishing its share of
+    the tasks of a queue with a single producer from the connection pool of
+    the Celery app.
     """
     def start(self):
         self.tasks = {}
         self.last_state = {}
+        self.bulk_state_fetcher = None
+        if configuration.getboolean('celery', 'bulk_state_sync'):
+            self.bulk_state_fetcher = BulkStateFetcher(app.backend)
+        self.send_task_parallelism = configuration.getint(
+            'celery', 'send_task_parallelism')
+        self._send_pool = None
+        if self.send_task_parallelism > 1:
+            self._send_pool = ThreadPool(self.send_task_parallelism)
 
     def execute_async(self, key, command,
                       queue=DEFAULT_CELERY_CONFIG['task_default_queue']):
@@ -76,11 +164,82 @@ class CeleryExecutor(BaseExecutor):
             args=[command], queue=queue)
         self.last_state[key] = celery_states.PENDING
 
+    @staticmethod
+    def _send_tasks(tasks):
+        """
+        :return: the AsyncResult of each task, or the exception raised while
+            sending it
+        :rtype: list
+        """
+        results = []
+        with app.producer_or_acquire() as producer:
+            for key, command, queue in tasks:
+                try:
+                    result = execute_command.apply_async(
+                        args=[command], queue=queue, producer=producer)
+                except Exception as e:
+                    result = e
+                results.append(result)
+        return results
+
+    def execute_async_batch(self, tasks):
+        start_time = time.time()
+        # Each chunk goes to a single queue
+        tasks_by_queue = OrderedDict()
+        for task in tasks:
+            tasks_by_queue.setdefault(task[2], []).append(task)
+        chunks = []
+        for queue_tasks in tasks_by_queue.values():
+            num_chunks = 1
+            if self._send_pool is not None:
+                num_chunks = min(self.send_task_parallelism, len(queue_tasks))
+            chunks.extend(queue_tasks[i::num_chunks] for i in range(num_chunks))
+        if len(chunks) == 1:
+            results = [self._send_tasks(chunks[0])]
+        elif self._send_pool is None:
+            results = [self._send_tasks(chunk) for chunk in chunks]
+        else:
+            results = self._send_pool.map(self._send_tasks, chunks)
+        Stats.timing('celery_executor.publish_batch',
+                     (time.time() - start_time) * 1000)
+        Stats.gauge('celery_executor.publish_batch_size', len(tasks))
+
+        for chunk, chunk_results in zip(chunks, results):
+            for (key, command, queue), result in zip(chunk, chunk_results):
+                if isinstance(result, Exception):
+                    self.log.error("Error sending %s to celery: %s", key, result)
+                    self.fail(key)
+                    continue
+                self.log.info("[celery] queued %s through celery, queue=%s",
+                              key, queue)
+                self.tasks[key] = result
+                self.last_state[key] = celery_states.PENDING
+
+    def _get_states(self):
+        """
+        :return: the current state of each task, by task instance key
+        :rtype: dict[tuple, unicode]
+        """
+        if self.bulk_state_fetcher is None:
+            return {key: async_result.state
+                    for key, async_result in self.tasks.items()}
+        states = self.bulk_state_fetcher.get_many(list(self.tasks.values()))
+        return {key: states[async_result.task_id]
+                for key, async_result in self.tasks.items()}
+
     def sync(self):
         self.log.debug("Inquiring about %s celery task(s)", len(self.tasks))
-        for key, async in list(self.tasks.items()):
+        start_time = time.time()
+        try:
+            states = self._get_states()
+        except Exception as e:
+            self.log.error("Error syncing the celery executor, ignoring it:")
+            self.log.exception(e)
+            return
+        Stats.timing('celery_executor.sync', (time.time() - start_time) * 1000)
+
+        for key, state in states.items():
             try:
-                state = async.state
                 if self.last_state[key] != state:
                     if state == celery_states.SUCCESS:
                         self.success(key)
@@ -95,8 +254,8 @@ class CeleryExecutor(BaseExecutor):
                         del self.tasks[key]
                         del self.last_state[key]
                     else:
-                        self.log.info("Unexpected state: %s", async.state)
-                    self.last_state[key] = async.state
+                        self.log.info("Unexpected state: %s", state)
+                        self.last_state[key] = state
             except Exception as e:
                 self.log.error("Error syncing the celery executor, ignoring it:")
                 self.log.exception(e)
@@ -104,7 +263,10 @@ class CeleryExecutor(BaseExecutor):
     def end(self, synchronous=False):
         if synchronous:
             while any([
-                    async.state not in celery_states.READY_STATES
-                    for async in self.tasks.values()]):
+                    state not in celery_states.READY_STATES
+                    for state in self._get_states().values()]):
                 time.sleep(5)
         self.sync()
+        if self._send_pool is not None:
+            self._send_pool.close()
+            self._send_pool = None
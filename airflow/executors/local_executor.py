@@ -13,13 +13,17 @@
 # limitations under the License.
 
 import multiprocessing
+import os
+import shlex
+import signal
 import subprocess
-import time
+import sys
 
 from builtins import range
 
 from airflow import configuration
 from airflow.executors.base_executor import BaseExecutor
+from airflow.utils.db import configure_orm_after_fork
 from airflow.utils.log.logging_mixin import LoggingMixin
 from airflow.utils.state import State
 
@@ -27,13 +31,72 @@ PARALLELISM = configuration.get('core', 'PARALLELISM')
 
 
 class LocalWorker(multiprocessing.Process, LoggingMixin):
-    def __init__(self, task_queue, result_queue):
+    def __init__(self, task_queue, result_queue, fork_tasks=False):
+        """
+        :param fork_tasks: whether to run the airflow commands in a process
+            forked from the worker, which already imported airflow and its
+            command line interface, instead of a new interpreter
+        :type fork_tasks: bool
+        """
         multiprocessing.Process.__init__(self)
         self.task_queue = task_queue
         self.result_queue = result_queue
+        self.fork_tasks = fork_tasks
         self.daemon = True
 
+    def execute_in_subprocess(self, command):
+        command = "exec bash -c '{0}'".format(command)
+        try:
+            subprocess.check_call(command, shell=True)
+            return State.SUCCESS
+        except subprocess.CalledProcessError as e:
+            self.log.error("Failed to execute task %s.", str(e))
+            # TODO: Why is this commented out?
+            # raise e
+            return State.FAILED
+
+    def execute_in_fork(self, parser, args):
+        """
+        Runs an airflow command in a forked process, calling the function of
+        the command like the airflow script does.
+
+        :param parser: the parser of the command line interface
+        :type parser: argparse.ArgumentParser
+        :param args: the arguments of the airflow command
+        :type args: list[unicode]
+        """
+        pid = os.fork()
+        if pid:
+            _, status = os.waitpid(pid, 0)
+            if status == 0:
+                return State.SUCCESS
+            self.log.error("Failed to execute task: %s exited with status %s",
+                           args, status)
+            return State.FAILED
+
+        ret = 1
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            configure_orm_after_fork()
+            parsed_args = parser.parse_args(args)
+            parsed_args.func(parsed_args)
+            ret = 0
+        except Exception:
+            self.log.exception("Failed to execute task %s", args)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(ret)
+
     def run(self):
+        parser = None
+        if self.fork_tasks:
+            # Imported here so that it is only imported by the workers that
+            # fork the tasks
+            from airflow.bin.cli import CLIFactory
+            parser = CLIFactory.get_parser()
+
         while True:
             key, command = self.task_queue.get()
             if key is None:
@@ -41,18 +104,13 @@ class LocalWorker(multiprocessing.Process, LoggingMixin):
                 self.task_queue.task_done()
                 break
             self.log.info("%s running %s", self.__class__.__name__, command)
-            command = "exec bash -c '{0}'".format(command)
-            try:
-                subprocess.check_call(command, shell=True)
-                state = State.SUCCESS
-            except subprocess.CalledProcessError as e:
-                state = State.FAILED
-                self.log.error("Failed to execute task %s.", str(e))
-                # TODO: Why is this commented out?
-                # raise e
+            args = shlex.split(command) if parser is not None else None
+            if args and os.path.basename(args[0]) == 'airflow':
+                state = self.execute_in_fork(parser, args[1:])
+            else:
+                state = self.execute_in_subprocess(command)
             self.result_queue.put((key, state))
             self.task_queue.task_done()
-            time.sleep(1)
 
 
 class LocalExecutor(BaseExecutor):
@@ -60,27 +118,40 @@ class LocalExecutor(BaseExecutor):
     LocalExecutor executes tasks locally in parallel. It uses the
     multiprocessing Python library and queues to parallelize the execution
     of tasks.
+
+    With local_executor_fork_tasks, the workers run the airflow commands in
+    processes forked from themselves rather than in new interpreters started
+    through bash, so that the tasks don't wait for airflow to be imported.
     """
 
     def start(self):
         self.queue = multiprocessing.JoinableQueue()
         self.result_queue = multiprocessing.Queue()
+        fork_tasks = configuration.getboolean('core', 'local_executor_fork_tasks')
         self.workers = [
-            LocalWorker(self.queue, self.result_queue)
+            LocalWorker(self.queue, self.result_queue, fork_tasks=fork_tasks)
             for _ in range(self.parallelism)
         ]
 
+        # The number of tasks sent to the workers whose result wasn't read
+        self.num_pending = 0
+
         for w in self.workers:
             w.start()
 
     def execute_async(self, key, command, queue=None):
+        self.num_pending += 1
         self.queue.put((key, command))
 
     def sync(self):
         while not self.result_queue.empty():
             results = self.result_queue.get()
+            self.num_pending -= 1
             self.change_state(*results)
 
+    def get_wait_handles(self):
+        return [self.result_queue._reader]
+
     def end(self):
         # Sending poison pill to all worker
         for _ in self.workers:
@@ -88,4 +159,8 @@ class LocalExecutor(BaseExecutor):
 
         # Wait for commands to finish
         self.queue.join()
-        self.sync()
+        # The results may still be on their way to the queue
+        while self.num_pending:
+            results = self.result_queue.get()
+            self.num_pending -= 1
+            self.change_state(*results)
@@ -18,6 +18,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import getpass
+import importlib
 import logging
 import multiprocessing
 import os
@@ -29,7 +30,7 @@ import sys
 import threading
 import time
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timedelta
 from past.builtins import basestring
 from sqlalchemy import (
     Column, Integer, String, DateTime, func, Index, or_, and_, not_)
@@ -47,14 +48,22 @@ from airflow.settings import Stats
 from airflow.task_runner import get_task_runner
 from airflow.ti_deps.dep_context import DepContext, QUEUE_DEPS, RUN_DEPS
 from airflow.utils import asciiart
+from airflow.utils.dag_folder_watcher import DagFolderWatcher
+from airflow.utils.dag_parse_cache import (DagParseCache, get_local_module_paths,
+                                           hash_file)
 from airflow.utils.dag_processing import (AbstractDagFileProcessor,
                                           DagFileProcessorManager,
                                           SimpleDag,
                                           SimpleDagBag,
-                                          list_py_file_paths)
+                                          SimpleTaskInstance)
 from airflow.utils.db import provide_session, pessimistic_connection_handling
 from airflow.utils.email import send_email
+from airflow.utils.heartbeat import HeartbeatThread
+from airflow.utils.helpers import wait_for_handles
 from airflow.utils.log.logging_mixin import LoggingMixin, set_context, StreamLogWriter
+from airflow.utils.loop_profiler import LoopProfiler
+from airflow.utils.pool_ledger import PoolLedger
+from airflow.utils.scheduler_shards import ShardLeaseManager, get_shard
 from airflow.utils.state import State
 
 Base = models.Base
@@ -91,6 +100,11 @@ class BaseJob(Base, LoggingMixin):
         Index('job_type_heart', job_type, latest_heartbeat),
     )
 
+    # Whether the job may be heartbeat by the HeartbeatThread of its process
+    # when background_heartbeat is enabled, see heartbeat
+    supports_background_heartbeat = False
+    heartbeat_thread = None
+
     def __init__(
             self,
             executor=executors.GetDefaultExecutor(),
@@ -151,7 +165,16 @@ class BaseJob(Base, LoggingMixin):
         will sleep 50 seconds to complete the 60 seconds and keep a steady
         heart rate. If you go over 60 seconds before calling it, it won't
         sleep at all.
+
+        When the job is heartbeat by a HeartbeatThread, this waits for the
+        next beat of the thread instead of sleeping, checks whether the
+        thread saw the job shut down, and calls heartbeat_callback, which can
+        read what the thread fetched instead of querying the database.
         '''
+        if self.heartbeat_thread is not None:
+            self._heartbeat_from_thread()
+            return
+
         session = settings.Session()
         job = session.query(BaseJob).filter_by(id=self.id).one()
         make_transient(job)
@@ -183,6 +206,26 @@ class BaseJob(Base, LoggingMixin):
         session.close()
         self.log.debug('[heart] Boom.')
 
+    def _heartbeat_from_thread(self):
+        # The beats of the thread keep the heart rate, the timeout only
+        # matters if the thread stops beating
+        self.heartbeat_thread.wait_for_beat(timeout=2 * self.heartrate)
+        if self.heartbeat_thread.is_shut_down(self.id):
+            self.kill()
+
+        self.heartbeat_callback()
+
+    def get_latest_heartbeat_time(self):
+        """
+        :return: the time.time() of the latest heartbeat of the job that
+            reached the database, or the current time if the job heartbeats
+            inline, as BaseJob.heartbeat raises when it fails
+        :rtype: float
+        """
+        if self.heartbeat_thread is not None:
+            return self.heartbeat_thread.get_latest_beat(self.id)
+        return time.time()
+
     def run(self):
         Stats.start_publishing()
         Stats.incr(self.__class__.__name__.lower() + '_start', 1, 1)
@@ -195,8 +238,18 @@ class BaseJob(Base, LoggingMixin):
         make_transient(self)
         self.id = id_
 
+        if (self.supports_background_heartbeat and
+                conf.getboolean('scheduler', 'background_heartbeat')):
+            self.heartbeat_thread = HeartbeatThread.get(self.heartrate)
+            self.heartbeat_thread.register(self.id)
+
         # Run
-        self._execute()
+        try:
+            self._execute()
+        finally:
+            if self.heartbeat_thread is not None:
+                self.heartbeat_thread.unregister(self.id)
+                self.heartbeat_thread = None
 
         # Marking the success in the DB
         self.end_date = datetime.utcnow()
@@ -211,7 +264,8 @@ class BaseJob(Base, LoggingMixin):
         raise NotImplementedError("This method needs to be overridden")
 
     @provide_session
-    def reset_state_for_orphaned_tasks(self, filter_by_dag_run=None, session=None):
+    def reset_state_for_orphaned_tasks(self, filter_by_dag_run=None, dag_ids=None,
+                                       session=None):
         """
         This function checks if there are any tasks in the dagrun (or all)
         that have a scheduled state but are not known by the
@@ -222,6 +276,9 @@ class BaseJob(Base, LoggingMixin):
 
         :param filter_by_dag_run: the dag_run we want to process, None if all
         :type filter_by_dag_run: models.DagRun
+        :param dag_ids: if specified and filter_by_dag_run is None, only
+        reset the task instances of these DAGs
+        :type dag_ids: list[unicode]
         :return: the TIs reset (in expired SQLAlchemy state)
         :rtype: List(TaskInstance)
         """
@@ -233,7 +290,7 @@ class BaseJob(Base, LoggingMixin):
         TI = models.TaskInstance
         DR = models.DagRun
         if filter_by_dag_run is None:
-            resettable_tis = (
+            resettable_tis_query = (
                 session
                 .query(TI)
                 .join(
@@ -245,7 +302,12 @@ class BaseJob(Base, LoggingMixin):
                     DR.state == State.RUNNING,
                     DR.external_trigger == False,
                     DR.run_id.notlike(BackfillJob.ID_PREFIX + '%'),
-                    TI.state.in_(resettable_states))).all()
+                    TI.state.in_(resettable_states)))
+            if dag_ids is not None:
+                if not dag_ids:
+                    return []
+                resettable_tis_query = resettable_tis_query.filter(TI.dag_id.in_(dag_ids))
+            resettable_tis = resettable_tis_query.all()
         else:
             resettable_tis = filter_by_dag_run.get_task_instances(state=resettable_states,
                                                                   session=session)
@@ -287,7 +349,8 @@ class DagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
     # Counter that increments everytime an instance of this class is created
     class_creation_counter = 0
 
-    def __init__(self, file_path, pickle_dags, dag_id_white_list, timeout_seconds=None):
+    def __init__(self, file_path, pickle_dags, dag_id_white_list, timeout_seconds=None,
+                 zombies=None):
         """
         :param file_path: a Python file containing Airflow DAG definitions
         :type file_path: unicode
@@ -297,8 +360,11 @@ class DagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
         :type dag_id_whitelist: list[unicode]
         :param timeout_seconds: If specified, apply timeout for the dag processing.
         :type timeout_seconds: int
+        :param zombies: zombie task instances of the DAGs in the file to fail
+        :type zombies: list[SimpleTaskInstance]
         """
         self._file_path = file_path
+        self._zombies = zombies
         # Queue that's used to pass results from the child process.
         self._result_queue = multiprocessing.Queue()
         # The process that was launched to process the given .
@@ -326,7 +392,8 @@ class DagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
                         file_path,
                         pickle_dags,
                         dag_id_white_list,
-                        thread_name):
+                        thread_name,
+                        zombies=None):
         """
         Launch a process to process the given file.
 
@@ -342,6 +409,8 @@ class DagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
         :type dag_id_white_list: list[unicode]
         :param thread_name: the name to use for the process that is launched
         :type thread_name: unicode
+        :param zombies: zombie task instances of the DAGs in the file to fail
+        :type zombies: list[SimpleTaskInstance]
         :return: the process that was launched
         :rtype: multiprocessing.Process
         """
@@ -372,7 +441,8 @@ class DagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
                          os.getpid(), file_path)
                 scheduler_job = SchedulerJob(dag_ids=dag_id_white_list, log=log)
                 result = scheduler_job.process_file(file_path,
-                                                    pickle_dags)
+                                                    pickle_dags,
+                                                    zombies=zombies)
                 result_queue.put(result)
                 end_time = time.time()
                 log.info(
@@ -401,7 +471,8 @@ class DagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
             self.file_path,
             self._pickle_dags,
             self._dag_id_white_list,
-            "DagFileProcessor{}".format(self._instance_id))
+            "DagFileProcessor{}".format(self._instance_id),
+            self._zombies)
         self._start_time = datetime.utcnow()
 
     def terminate(self, sigkill=False):
@@ -504,6 +575,459 @@ class DagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
             raise AirflowException("Tried to get start time before it started!")
         return self._start_time
 
+    @property
+    def wait_handles(self):
+        """
+        :return: the reading end of the result queue, and the sentinel of the
+        process where available, which become ready when a result is put or
+        the process exits
+        :rtype: list
+        """
+        if self._process is None or self._done or self._result_queue is None:
+            return []
+        handles = [self._result_queue._reader]
+        sentinel = getattr(self._process, 'sentinel', None)
+        if sentinel is not None:
+            handles.append(sentinel)
+        return handles
+
+
+class DagParsingWorker(LoggingMixin):
+    """
+    A long-lived process that calls SchedulerJob.process_file() for the file
+    paths it receives, one at a time. The process exits by itself after it
+    processed max_files files or once it uses more than max_memory_mb, so
+    that the state left behind by the DAG files does not pile up.
+    """
+
+    # Counter that increments everytime an instance of this class is created
+    class_creation_counter = 0
+
+    def __init__(self, pickle_dags, dag_id_white_list, max_files, max_memory_mb):
+        """
+        :param pickle_dags: whether to serialize the DAG objects to the DB
+        :type pickle_dags: bool
+        :param dag_id_white_list: if specified, only look at these DAG ID's
+        :type dag_id_white_list: list[unicode]
+        :param max_files: number of files to process before exiting
+        :type max_files: int
+        :param max_memory_mb: resident memory, in megabytes, above which to
+        exit after processing a file
+        :type max_memory_mb: int
+        """
+        self._pickle_dags = pickle_dags
+        self._dag_id_white_list = dag_id_white_list
+        self._max_files = max_files
+        self._max_memory_mb = max_memory_mb
+        # Queues that are used to pass file paths to and results from the
+        # child process
+        self._file_path_queue = multiprocessing.Queue()
+        self._result_queue = multiprocessing.Queue()
+        self._process = None
+        self._retiring = False
+        self._instance_id = DagParsingWorker.class_creation_counter
+        DagParsingWorker.class_creation_counter += 1
+
+    @staticmethod
+    def _run(file_path_queue,
+             result_queue,
+             pickle_dags,
+             dag_id_white_list,
+             max_files,
+             max_memory_mb,
+             thread_name):
+        # This runs in the newly created process
+        log = logging.getLogger("airflow.processor")
+
+        stdout = StreamLogWriter(log, logging.INFO)
+        stderr = StreamLogWriter(log, logging.WARN)
+
+        # Re-configure the ORM engine as there are issues with multiple processes
+        settings.configure_orm()
+        threading.current_thread().name = thread_name
+        this_process = psutil.Process(os.getpid())
+
+        num_files = 0
+        retiring = False
+        while not retiring:
+            item = file_path_queue.get()
+            if item is None:
+                break
+            file_path, zombies = item
+
+            set_context(log, file_path)
+            result = None
+            try:
+                # redirect stdout/stderr to log
+                sys.stdout = stdout
+                sys.stderr = stderr
+
+                start_time = time.time()
+                log.info("Started process (PID=%s) to work on %s",
+                         os.getpid(), file_path)
+                scheduler_job = SchedulerJob(dag_ids=dag_id_white_list, log=log)
+                result = scheduler_job.process_file(file_path, pickle_dags,
+                                                    zombies=zombies)
+                end_time = time.time()
+                log.info(
+                    "Processing %s took %.3f seconds", file_path, end_time - start_time
+                )
+            except:
+                # Log exceptions through the logging framework.
+                log.exception("Got an exception! Propagating...")
+            finally:
+                sys.stdout = sys.__stdout__
+                sys.stderr = sys.__stderr__
+
+            # The worker tells that it exits along with its last result, so
+            # that no other file is sent to it
+            num_files += 1
+            if num_files >= max_files:
+                retiring = True
+            elif this_process.memory_info().rss > max_memory_mb * 1024 * 1024:
+                log.info("Exiting as the process uses more than %s MB", max_memory_mb)
+                retiring = True
+            result_queue.put((file_path, result, retiring))
+
+    def start(self):
+        """
+        Launch the process.
+        """
+        thread_name = "DagParsingWorker{}".format(self._instance_id)
+        self._process = multiprocessing.Process(
+            target=DagParsingWorker._run,
+            args=(self._file_path_queue,
+                  self._result_queue,
+                  self._pickle_dags,
+                  self._dag_id_white_list,
+                  self._max_files,
+                  self._max_memory_mb,
+                  thread_name),
+            name="{}-Process".format(thread_name))
+        self._process.start()
+
+    def submit(self, file_path, zombies=None):
+        """
+        Send a file to process to the process, along with the zombie task
+        instances of its DAGs to fail.
+        """
+        self._file_path_queue.put((file_path, zombies))
+
+    def get_result(self):
+        """
+        :return: the file path and the result of SchedulerJob.process_file()
+        for the last file sent, or None if it's not available yet
+        :rtype: (unicode, list[SimpleDag])
+        """
+        if self._result_queue.empty():
+            return None
+        file_path, result, retiring = self._result_queue.get_nowait()
+        if retiring:
+            self._retiring = True
+        return file_path, result
+
+    @property
+    def pid(self):
+        return self._process.pid
+
+    @property
+    def exit_code(self):
+        return self._process.exitcode
+
+    @property
+    def retiring(self):
+        """
+        :return: whether the worker sent its last result and exits
+        :rtype: bool
+        """
+        return self._retiring
+
+    @property
+    def alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def wait_handles(self):
+        handles = [self._result_queue._reader]
+        sentinel = getattr(self._process, 'sentinel', None)
+        if sentinel is not None:
+            handles.append(sentinel)
+        return handles
+
+    def terminate(self, sigkill=False):
+        """
+        Terminate (and then kill) the process.
+        :param sigkill: whether to issue a SIGKILL if SIGTERM doesn't work.
+        :type sigkill: bool
+        """
+        if self._process is None or not self._process.is_alive():
+            return
+        self._process.terminate()
+        # Arbitrarily wait 5s for the process to die
+        self._process.join(5)
+        if sigkill and self._process.is_alive():
+            self.log.warning("Killing PID %s", self._process.pid)
+            os.kill(self._process.pid, signal.SIGKILL)
+            self._process.join()
+
+    def stop(self):
+        """
+        Ask the process to exit once it's done with the current file.
+        """
+        self._file_path_queue.put(None)
+
+
+class DagParsingWorkerPool(LoggingMixin):
+    """
+    A pool of DagParsingWorkers, forked from a process that already imported
+    the modules that DAG files commonly use so that the workers don't have
+    to import them again for every file.
+    """
+
+    def __init__(self,
+                 size,
+                 pickle_dags,
+                 dag_id_white_list,
+                 max_files_per_worker,
+                 max_memory_mb_per_worker,
+                 preload_modules=()):
+        """
+        :param size: the number of workers
+        :type size: int
+        :param pickle_dags: whether to serialize the DAG objects to the DB
+        :type pickle_dags: bool
+        :param dag_id_white_list: if specified, only look at these DAG ID's
+        :type dag_id_white_list: list[unicode]
+        :param max_files_per_worker: number of files that a worker processes
+        before it's replaced
+        :type max_files_per_worker: int
+        :param max_memory_mb_per_worker: resident memory, in megabytes, above
+        which a worker is replaced
+        :type max_memory_mb_per_worker: int
+        :param preload_modules: modules to import before forking the workers
+        :type preload_modules: list[unicode]
+        """
+        self._size = size
+        self._pickle_dags = pickle_dags
+        self._dag_id_white_list = dag_id_white_list
+        self._max_files_per_worker = max_files_per_worker
+        self._max_memory_mb_per_worker = max_memory_mb_per_worker
+        self._preload_modules = preload_modules
+        self._idle_workers = []
+        self._busy_workers = []
+
+    def start(self):
+        """
+        Import the modules to preload and launch the workers.
+        """
+        for module_name in self._preload_modules:
+            try:
+                importlib.import_module(module_name)
+            except Exception:
+                self.log.exception("Could not preload %s", module_name)
+        for _ in range(self._size):
+            self._idle_workers.append(self._launch_worker())
+
+    def _launch_worker(self):
+        worker = DagParsingWorker(self._pickle_dags,
+                                  self._dag_id_white_list,
+                                  self._max_files_per_worker,
+                                  self._max_memory_mb_per_worker)
+        worker.start()
+        return worker
+
+    def acquire(self):
+        """
+        :return: an idle worker, replacing it if it exited
+        :rtype: DagParsingWorker
+        """
+        if not self._idle_workers:
+            raise AirflowException("There is no idle DAG parsing worker!")
+        worker = self._idle_workers.pop()
+        if not worker.alive:
+            self.log.debug("Replacing DAG parsing worker (PID: %s)", worker.pid)
+            worker = self._launch_worker()
+        self._busy_workers.append(worker)
+        return worker
+
+    def release(self, worker):
+        """
+        Give back a worker that is done with its file. A worker that exits
+        after its last file is replaced by a new one.
+        """
+        self._busy_workers.remove(worker)
+        if worker.retiring:
+            self.log.debug("Replacing retiring DAG parsing worker (PID: %s)",
+                           worker.pid)
+            worker = self._launch_worker()
+        self._idle_workers.append(worker)
+
+    def terminate(self):
+        """
+        Stop all the workers.
+        """
+        for worker in self._idle_workers:
+            worker.stop()
+        for worker in self._busy_workers + self._idle_workers:
+            worker.terminate(sigkill=True)
+        self._busy_workers = []
+        self._idle_workers = []
+
+
+class PooledDagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
+    """
+    Helps call SchedulerJob.process_file() in a worker of a
+    DagParsingWorkerPool.
+    """
+
+    def __init__(self, file_path, worker_pool, timeout_seconds=None, zombies=None):
+        """
+        :param file_path: a Python file containing Airflow DAG definitions
+        :type file_path: unicode
+        :param worker_pool: the pool of the workers to process the file with
+        :type worker_pool: DagParsingWorkerPool
+        :param timeout_seconds: If specified, apply timeout for the dag processing.
+        :type timeout_seconds: int
+        :param zombies: zombie task instances of the DAGs in the file to fail
+        :type zombies: list[SimpleTaskInstance]
+        """
+        self._file_path = file_path
+        self._zombies = zombies
+        self._worker_pool = worker_pool
+        self._timeout_seconds = timeout_seconds
+        self._worker = None
+        self._result = None
+        self._exit_code = None
+        self._done = False
+        self._requeued = False
+        self._start_time = None
+
+    @property
+    def file_path(self):
+        return self._file_path
+
+    def start(self):
+        """
+        Send the file to an idle worker.
+        """
+        self._worker = self._worker_pool.acquire()
+        self._worker.submit(self.file_path, self._zombies)
+        self._start_time = datetime.utcnow()
+
+    def _finish(self, exit_code):
+        self._done = True
+        self._exit_code = exit_code
+        self._worker_pool.release(self._worker)
+
+    def terminate(self, sigkill=False):
+        """
+        Terminate (and then kill) the worker processing the file.
+        :param sigkill: whether to issue a SIGKILL if SIGTERM doesn't work.
+        :type sigkill: bool
+        """
+        if self._worker is None:
+            raise AirflowException("Tried to call stop before starting!")
+        if self._done:
+            return
+        self._worker.terminate(sigkill=sigkill)
+        self._finish(self._worker.exit_code)
+
+    @property
+    def pid(self):
+        """
+        :return: the PID of the worker processing the given file
+        :rtype: int
+        """
+        if self._worker is None:
+            raise AirflowException("Tried to get PID before starting!")
+        return self._worker.pid
+
+    @property
+    def exit_code(self):
+        """
+        After the file is processed, this can be called to get the return code
+        :return: 0 if the worker returned a result, or the exit code of the
+        worker, or 1 if it exited cleanly, otherwise
+        :rtype: int
+        """
+        if not self._done:
+            raise AirflowException("Tried to call retcode before process was finished!")
+        return self._exit_code
+
+    @property
+    def done(self):
+        """
+        Check if the worker is done processing this file.
+        :return: whether the file is processed
+        :rtype: bool
+        """
+        if self._worker is None:
+            raise AirflowException("Tried to see if it's done before starting!")
+
+        if self._done:
+            return True
+
+        result = self._worker.get_result()
+        if result is not None:
+            _, self._result = result
+            self._finish(0)
+            return True
+
+        # Potential error case when the worker dies
+        if not self._worker.alive:
+            result = self._worker.get_result()
+            if result is not None:
+                _, self._result = result
+                self._finish(0)
+                return True
+            if not self._requeued:
+                self.log.warning(
+                    "Worker (PID: %s) exited with return code %s without "
+                    "processing %s. Sending it to another worker",
+                    self._worker.pid, self._worker.exit_code, self.file_path)
+                self._requeued = True
+                self._worker_pool.release(self._worker)
+                self.start()
+                return False
+            self._finish(self._worker.exit_code or 1)
+            return True
+
+        if self._timeout_seconds:
+            elapsed_seconds = (datetime.utcnow() - self._start_time).total_seconds()
+            if elapsed_seconds > self._timeout_seconds:
+                self.log.debug("Worker (PID: %s) timed out processing %s. Killing",
+                               self._worker.pid, self.file_path)
+                self.terminate(sigkill=True)
+                return True
+
+        return False
+
+    @property
+    def result(self):
+        """
+        :return: result of running SchedulerJob.process_file()
+        :rtype: SimpleDag
+        """
+        if not self.done:
+            raise AirflowException("Tried to get the result before it's done!")
+        return self._result
+
+    @property
+    def start_time(self):
+        """
+        :return: when this started to process the file
+        :rtype: datetime
+        """
+        if self._start_time is None:
+            raise AirflowException("Tried to get start time before it started!")
+        return self._start_time
+
+    @property
+    def wait_handles(self):
+        if self._worker is None or self._done:
+            return []
+        return self._worker.wait_handles
+
 
 class SchedulerJob(BaseJob):
     """
@@ -533,6 +1057,7 @@ class SchedulerJob(BaseJob):
             dag_file_processing_timeout_seconds=conf.getint(
                 'scheduler',
                 'dag_file_processing_timeout_seconds'),
+            profile=False,
             *args, **kwargs):
         """
         :param dag_id: if specified, only schedule tasks with this DAG ID
@@ -544,13 +1069,18 @@ class SchedulerJob(BaseJob):
         :type subdir: unicode
         :param num_runs: The number of times to try to schedule each DAG file.
         -1 for unlimited within the run_duration.
-        :param processor_poll_interval: The number of seconds to wait between
-        polls of running processors
+        :param processor_poll_interval: The maximum number of seconds to wait
+        between scheduling loops when no DAG file processor finishes and the
+        executor receives no task result
         :param run_duration: how long to run (in seconds) before exiting
         :type run_duration: int
         :param do_pickle: once a DAG object is obtained by executing the Python
         file, whether to serialize the DAG object to the DB
         :type do_pickle: bool
+        :param profile: whether to print a report of the time spent and the
+        queries run in each phase of the scheduling loop along with the file
+        processing stats and on exit
+        :type profile: bool
         """
         # for BaseJob compatibility
         self.dag_id = dag_id
@@ -566,6 +1096,7 @@ class SchedulerJob(BaseJob):
         self._processor_poll_interval = processor_poll_interval
 
         self.do_pickle = do_pickle
+        self.profile = profile
         super(SchedulerJob, self).__init__(*args, **kwargs)
 
         self.heartrate = conf.getint('scheduler', 'SCHEDULER_HEARTBEAT_SEC')
@@ -584,6 +1115,9 @@ class SchedulerJob(BaseJob):
         # How often to scan the DAGs directory for new files. Default to 5 minutes.
         self.dag_dir_list_interval = conf.getint('scheduler',
                                                  'dag_dir_list_interval')
+        # How to pick up the changes to the DAGs directory between scans,
+        # either 'inotify' or 'poll'
+        self.dag_dir_watcher = conf.get('scheduler', 'dag_dir_watcher')
         # How often to print out DAG file processing stats to the log. Default to
         # 30 seconds.
         self.print_stats_interval = conf.getint('scheduler',
@@ -593,139 +1127,353 @@ class SchedulerJob(BaseJob):
         self.file_process_interval = file_process_interval
 
         self.max_tis_per_query = conf.getint('scheduler', 'max_tis_per_query')
+
+        # How often to look for zombie task instances, and after how long
+        # without a heartbeat a task instance is a zombie
+        self.zombie_detection_interval = conf.getint('scheduler',
+                                                     'zombie_detection_interval')
+        self.zombie_task_threshold = conf.getint('scheduler',
+                                                 'scheduler_zombie_task_threshold')
+        # Map from DAG ID to the DAG file it was last found in, to hand the
+        # zombies to the processor of their file
+        self._dag_file_paths = {}
+
+        # When several schedulers run at the same time, the DAG files are
+        # split in num_shards shards that the schedulers lease, see
+        # ShardLeaseManager. 0 for a single scheduler.
+        self.num_shards = conf.getint('scheduler', 'num_shards')
+        self.shard_lease_timeout = conf.getint('scheduler', 'shard_lease_timeout')
+        self.shard_lease_manager = None
+
+        # Map from DAG ID to the earliest date a new DagRun could be created,
+        # see create_dag_run()
+        self._next_dag_run_dates = {}
+        # Whether to store the DAGs for the webserver, see SerializedDagModel
+        self.store_serialized_dags = conf.getboolean('core', 'store_serialized_dags')
+        # Serves the SimpleDags of the DAG files that don't need to be
+        # executed again
+        self.dag_parse_cache = None
+        if conf.getboolean('scheduler', 'dag_parse_cache'):
+            self.dag_parse_cache = DagParseCache(
+                conf.get('scheduler', 'dag_parse_cache_dir'),
+                conf.getint('scheduler', 'dag_parse_cache_max_age'))
         if run_duration is None:
             self.run_duration = conf.getint('scheduler',
                                             'run_duration')
 
         self.policy_lifo = conf.getboolean('scheduler', 'policy_lifo')
 
+        # Measures the time spent and the queries run in each phase of the
+        # scheduling loop
+        self.loop_profiler = LoopProfiler('scheduler_loop')
+
+        # Keeps track of the slots used in each pool between scheduling loops
+        self.pool_ledger = PoolLedger(
+            conf.getint('scheduler', 'pool_ledger_reconcile_interval'))
+
     @provide_session
     def manage_slas(self, dag, session=None):
         """
         Finding all tasks that have SLAs defined, and sending alert emails
         where needed. New SLA misses are also recorded in the database.
 
-        Where assuming that the scheduler runs often, so we only check for
-        tasks that should have succeeded in the past hour.
+        See manage_slas_for_dags.
         """
-        if not any([ti.sla for ti in dag.tasks]):
-            self.log.info(
-                "Skipping SLA check for %s because no tasks in DAG have SLAs",
-                dag
-            )
+        self.manage_slas_for_dags([dag], session=session)
+
+    @provide_session
+    def manage_slas_for_dags(self, dags, session=None):
+        """
+        Finding all tasks that have SLAs defined in the given DAGs, and sending
+        alert emails where needed. New SLA misses are also recorded in the
+        database.
+
+        The DAGs are checked together: the latest successful task instances
+        of all their SLA tasks are fetched with a single query, the new SLA
+        misses are inserted with a single statement and the alert emails are
+        batched so that each recipient gets one email for all their DAGs.
+
+        :param dags: the DAGs to check
+        :type dags: list[DAG]
+        """
+        dags = {dag.dag_id: dag for dag in dags}
+        sla_task_ids = {}
+        for dag_id, dag in dags.items():
+            task_ids = [task.task_id for task in dag.tasks if task.sla]
+            if task_ids:
+                sla_task_ids[dag_id] = set(task_ids)
+            else:
+                self.log.info(
+                    "Skipping SLA check for %s because no tasks in DAG have SLAs",
+                    dag
+                )
+        if not sla_task_ids:
             return
 
+        self._record_sla_misses(dags, sla_task_ids, session=session)
+        self._send_sla_miss_notifications(
+            [dags[dag_id] for dag_id in sla_task_ids], session=session)
+
+    def _record_sla_misses(self, dags, sla_task_ids, session):
+        """
+        Records the SLA misses of the tasks that have SLAs, i.e. the schedules
+        after the latest successful run of each task whose following schedule
+        plus the SLA of the task has passed.
+
+        :param dags: the DAGs by DAG ID
+        :type dags: dict[unicode, DAG]
+        :param sla_task_ids: the IDs of the tasks that have SLAs by DAG ID
+        :type sla_task_ids: dict[unicode, set[unicode]]
+        """
         TI = models.TaskInstance
-        sq = (
+        max_tis = (
             session
-            .query(
-                TI.task_id,
-                func.max(TI.execution_date).label('max_ti'))
+            .query(TI.dag_id, TI.task_id, func.max(TI.execution_date))
             .with_hint(TI, 'USE INDEX (PRIMARY)', dialect_name='mysql')
-            .filter(TI.dag_id == dag.dag_id)
+            .filter(TI.dag_id.in_(list(sla_task_ids)))
             .filter(TI.state == State.SUCCESS)
-            .filter(TI.task_id.in_(dag.task_ids))
-            .group_by(TI.task_id).subquery('sq')
+            .filter(TI.task_id.in_(set.union(*sla_task_ids.values())))
+            .group_by(TI.dag_id, TI.task_id)
+            .all()
         )
 
-        max_tis = session.query(TI).filter(
-            TI.dag_id == dag.dag_id,
-            TI.task_id == sq.c.task_id,
-            TI.execution_date == sq.c.max_ti,
-        ).all()
+        now = datetime.utcnow()
+        # The tasks of a DAG usually ran for the same schedules, so the
+        # following schedules are only computed once per DAG
+        following_schedules = defaultdict(dict)
 
-        ts = datetime.utcnow()
-        SlaMiss = models.SlaMiss
-        for ti in max_tis:
-            task = dag.get_task(ti.task_id)
-            dttm = ti.execution_date
-            if task.sla:
-                dttm = dag.following_schedule(dttm)
-                while dttm < datetime.utcnow():
-                    following_schedule = dag.following_schedule(dttm)
-                    if following_schedule + task.sla < datetime.utcnow():
-                        session.merge(models.SlaMiss(
-                            task_id=ti.task_id,
-                            dag_id=ti.dag_id,
-                            execution_date=dttm,
-                            timestamp=ts))
-                    dttm = dag.following_schedule(dttm)
-        session.commit()
+        def following_schedule(dag, dttm):
+            schedules = following_schedules[dag.dag_id]
+            if dttm not in schedules:
+                schedules[dttm] = dag.following_schedule(dttm)
+            return schedules[dttm]
 
-        slas = (
+        misses = set()
+        for dag_id, task_id, max_execution_date in max_tis:
+            if task_id not in sla_task_ids[dag_id]:
+                continue
+            dag = dags[dag_id]
+            sla = dag.get_task(task_id).sla
+            dttm = following_schedule(dag, max_execution_date)
+            while dttm is not None and dttm < now:
+                next_dttm = following_schedule(dag, dttm)
+                if next_dttm is None:
+                    break
+                if next_dttm + sla < now:
+                    misses.add((dag_id, task_id, dttm))
+                dttm = next_dttm
+        if not misses:
+            return
+
+        SlaMiss = models.SlaMiss
+        recorded = (
             session
-            .query(SlaMiss)
-            .filter(SlaMiss.notification_sent == False)
-            .filter(SlaMiss.dag_id == dag.dag_id)
+            .query(SlaMiss.dag_id, SlaMiss.task_id, SlaMiss.execution_date)
+            .filter(SlaMiss.dag_id.in_(set(key[0] for key in misses)))
+            .filter(SlaMiss.execution_date >= min(key[2] for key in misses))
             .all()
         )
+        for key in recorded:
+            misses.discard(tuple(key))
+        if misses:
+            session.execute(SlaMiss.__table__.insert(), [
+                {'dag_id': dag_id,
+                 'task_id': task_id,
+                 'execution_date': execution_date,
+                 'timestamp': now,
+                 'email_sent': False,
+                 'notification_sent': False}
+                for dag_id, task_id, execution_date in misses])
+            Stats.incr('sla_missed', len(misses))
+        session.commit()
 
-        if slas:
-            sla_dates = [sla.execution_date for sla in slas]
-            qry = (
-                session
-                .query(TI)
-                .filter(TI.state != State.SUCCESS)
-                .filter(TI.execution_date.in_(sla_dates))
-                .filter(TI.dag_id == dag.dag_id)
-                .all()
-            )
-            blocking_tis = []
-            for ti in qry:
-                if ti.task_id in dag.task_ids:
-                    ti.task = dag.get_task(ti.task_id)
-                    blocking_tis.append(ti)
-                else:
-                    session.delete(ti)
-                    session.commit()
+    def _send_sla_miss_notifications(self, dags, session):
+        """
+        Calls the SLA miss callbacks of the DAGs and sends the alert emails
+        for the SLA misses for which no notification was sent yet. Each
+        recipient gets one email listing the SLA misses of all the DAGs it is
+        a recipient of.
 
-            task_list = "\n".join([
+        :param dags: the DAGs to send the notifications of
+        :type dags: list[DAG]
+        """
+        dags = {dag.dag_id: dag for dag in dags}
+        SlaMiss = models.SlaMiss
+        slas_by_dag_id = defaultdict(list)
+        sla_dates_by_dag_id = defaultdict(set)
+        for sla in (session
+                    .query(SlaMiss)
+                    .filter(SlaMiss.notification_sent == False)
+                    .filter(SlaMiss.dag_id.in_(list(dags)))
+                    .all()):
+            slas_by_dag_id[sla.dag_id].append(sla)
+            sla_dates_by_dag_id[sla.dag_id].add(sla.execution_date)
+        if not slas_by_dag_id:
+            return
+
+        TI = models.TaskInstance
+        blocking_tis_by_dag_id = defaultdict(list)
+        for ti in (session
+                   .query(TI)
+                   .filter(TI.state != State.SUCCESS)
+                   .filter(TI.execution_date.in_(
+                       set.union(*sla_dates_by_dag_id.values())))
+                   .filter(TI.dag_id.in_(list(slas_by_dag_id)))
+                   .all()):
+            if ti.execution_date not in sla_dates_by_dag_id[ti.dag_id]:
+                continue
+            dag = dags[ti.dag_id]
+            if dag.has_task(ti.task_id):
+                ti.task = dag.get_task(ti.task_id)
+                blocking_tis_by_dag_id[ti.dag_id].append(ti)
+            else:
+                session.delete(ti)
+        session.commit()
+
+        task_lists = {}
+        blocking_task_lists = {}
+        # Track whether email or any alert notification sent
+        # We consider email or the alert callback as notifications
+        notified_dag_ids = set()
+        dag_ids_by_email = defaultdict(list)
+        for dag_id, slas in slas_by_dag_id.items():
+            dag = dags[dag_id]
+            blocking_tis = blocking_tis_by_dag_id[dag_id]
+            task_lists[dag_id] = "\n".join([
                 sla.task_id + ' on ' + sla.execution_date.isoformat()
                 for sla in slas])
-            blocking_task_list = "\n".join([
+            blocking_task_lists[dag_id] = "\n".join([
                 ti.task_id + ' on ' + ti.execution_date.isoformat()
                 for ti in blocking_tis])
-            # Track whether email or any alert notification sent
-            # We consider email or the alert callback as notifications
-            email_sent = False
-            notification_sent = False
             if dag.sla_miss_callback:
                 # Execute the alert callback
                 self.log.info(' --------------> ABOUT TO CALL SLA MISS CALL BACK ')
-                dag.sla_miss_callback(dag, task_list, blocking_task_list, slas, blocking_tis)
-                notification_sent = True
-            email_content = """\
-            Here's a list of tasks that missed their SLAs:
+                dag.sla_miss_callback(dag, task_lists[dag_id],
+                                      blocking_task_lists[dag_id], slas,
+                                      blocking_tis)
+                notified_dag_ids.add(dag_id)
+            for email in self._get_sla_miss_emails(dag):
+                dag_ids_by_email[email].append(dag_id)
+
+        # Recipients of the same DAGs share an email
+        emails_by_dag_ids = defaultdict(list)
+        for email, dag_ids in dag_ids_by_email.items():
+            emails_by_dag_ids[tuple(sorted(dag_ids))].append(email)
+
+        emailed_dag_ids = set()
+        for dag_ids, emails in emails_by_dag_ids.items():
+            email_content = "".join([
+                """\
+            Here's a list of tasks that missed their SLAs on DAG {dag_id}:
             <pre><code>{task_list}\n<code></pre>
             Blocking tasks:
-            <pre><code>{blocking_task_list}\n{bug}<code></pre>
-            """.format(bug=asciiart.bug, **locals())
-            emails = []
-            for t in dag.tasks:
-                if t.email:
-                    if isinstance(t.email, basestring):
-                        l = [t.email]
-                    elif isinstance(t.email, (list, tuple)):
-                        l = t.email
-                    for email in l:
-                        if email not in emails:
-                            emails.append(email)
-            if emails and len(slas):
-                send_email(
-                    emails,
-                    "[airflow] SLA miss on DAG=" + dag.dag_id,
-                    email_content)
-                email_sent = True
-                notification_sent = True
-            # If we sent any notification, update the sla_miss table
-            if notification_sent:
-                for sla in slas:
-                    if email_sent:
-                        sla.email_sent = True
-                    sla.notification_sent = True
-                    session.merge(sla)
-            session.commit()
-            session.close()
+            <pre><code>{blocking_task_list}\n<code></pre>
+            """.format(dag_id=dag_id,
+                       task_list=task_lists[dag_id],
+                       blocking_task_list=blocking_task_lists[dag_id])
+                for dag_id in dag_ids])
+            email_content += """\
+            <pre><code>{bug}<code></pre>
+            """.format(bug=asciiart.bug)
+            send_email(
+                sorted(emails),
+                "[airflow] SLA miss on DAG=" + ", ".join(dag_ids),
+                email_content)
+            emailed_dag_ids.update(dag_ids)
+        notified_dag_ids.update(emailed_dag_ids)
+
+        # If we sent any notification, update the sla_miss table
+        for dag_id in notified_dag_ids:
+            for sla in slas_by_dag_id[dag_id]:
+                if dag_id in emailed_dag_ids:
+                    sla.email_sent = True
+                sla.notification_sent = True
+                session.merge(sla)
+        session.commit()
+
+    @staticmethod
+    def _get_sla_miss_emails(dag):
+        """
+        :return: the email addresses of the tasks of the DAG
+        :rtype: list[unicode]
+        """
+        emails = []
+        for t in dag.tasks:
+            if t.email:
+                if isinstance(t.email, basestring):
+                    l = [t.email]
+                elif isinstance(t.email, (list, tuple)):
+                    l = t.email
+                for email in l:
+                    if email not in emails:
+                        emails.append(email)
+        return emails
+
+    @provide_session
+    def find_zombies(self, session=None):
+        """
+        Finds the task instances that are running according to the database
+        but whose LocalTaskJob is no longer running or hasn't issued a
+        heartbeat in scheduler_zombie_task_threshold seconds.
+
+        :return: the zombie task instances by the path of their DAG file
+        :rtype: dict[unicode, list[SimpleTaskInstance]]
+        """
+        TI = models.TaskInstance
+        limit_dttm = datetime.utcnow() - timedelta(seconds=self.zombie_task_threshold)
+        self.log.info("Finding 'running' jobs without a heartbeat after %s", limit_dttm)
+        zombies = [
+            SimpleTaskInstance(dag_id, task_id, execution_date)
+            for dag_id, task_id, execution_date in (
+                session
+                .query(TI.dag_id, TI.task_id, TI.execution_date)
+                .join(LocalTaskJob, TI.job_id == LocalTaskJob.id)
+                .filter(TI.state == State.RUNNING)
+                .filter(
+                    or_(
+                        LocalTaskJob.state != State.RUNNING,
+                        LocalTaskJob.latest_heartbeat < limit_dttm,
+                    ))
+                .all())
+        ]
+        Stats.gauge('zombies_found', len(zombies))
+        if not zombies:
+            return {}
+
+        # Fall back to the location of the DAGs in the database for the DAGs
+        # that were not processed yet, using the root DAG for subdags as they
+        # may be defined in another module
+        unknown_dag_ids = set(zombie.dag_id for zombie in zombies
+                              if zombie.dag_id not in self._dag_file_paths)
+        filelocs = {}
+        if unknown_dag_ids:
+            candidate_dag_ids = set()
+            for dag_id in unknown_dag_ids:
+                parts = dag_id.split('.')
+                candidate_dag_ids.update('.'.join(parts[:i + 1])
+                                         for i in range(len(parts)))
+            DM = models.DagModel
+            filelocs = dict(
+                session
+                .query(DM.dag_id, DM.fileloc)
+                .filter(DM.dag_id.in_(candidate_dag_ids))
+                .all())
+
+        zombies_by_file_path = defaultdict(list)
+        for zombie in zombies:
+            file_path = self._dag_file_paths.get(zombie.dag_id)
+            if file_path is None:
+                parts = zombie.dag_id.split('.')
+                for i in range(len(parts)):
+                    file_path = filelocs.get('.'.join(parts[:i + 1]))
+                    if file_path is not None:
+                        break
+            if file_path is None:
+                self.log.warning("Could not find the DAG file of the zombie %s", zombie)
+                continue
+            zombies_by_file_path[file_path].append(zombie)
+        self.log.info("Found %s zombies", len(zombies))
+        return zombies_by_file_path
 
     @staticmethod
     @provide_session
@@ -777,7 +1525,12 @@ class SchedulerJob(BaseJob):
         This method checks whether a new DagRun needs to be created
         for a DAG based on scheduling interval
         Returns DagRun if one is scheduled. Otherwise returns None.
+
+        When no DagRun needs to be created yet, the earliest date at which one
+        could be created is recorded in self._next_dag_run_dates, as long as
+        nothing else about the DAG changes.
         """
+        self._next_dag_run_dates.pop(dag.dag_id, None)
         if dag.schedule_interval:
             active_runs = DagRun.find(
                 dag_id=dag.dag_id,
@@ -814,6 +1567,7 @@ class SchedulerJob(BaseJob):
 
             # don't schedule @once again
             if dag.schedule_interval == '@once' and last_scheduled_run:
+                self._next_dag_run_dates[dag.dag_id] = datetime.max
                 return None
 
             # don't do scheduler catchup for dag's that don't have dag.catchup = True
@@ -866,19 +1620,22 @@ class SchedulerJob(BaseJob):
                     dag.start_date, next_run_date
                 )
 
-            # don't ever schedule in the future
-            if next_run_date > datetime.utcnow():
-                return
-
             # this structure is necessary to avoid a TypeError from concatenating
             # NoneType
+            period_end = None
             if dag.schedule_interval == '@once':
                 period_end = next_run_date
             elif next_run_date:
                 period_end = dag.following_schedule(next_run_date)
 
+            # don't ever schedule in the future
+            if next_run_date > datetime.utcnow():
+                self._next_dag_run_dates[dag.dag_id] = period_end
+                return
+
             # Don't schedule a dag beyond its end_date (as specified by the dag param)
             if next_run_date and dag.end_date and next_run_date > dag.end_date:
+                self._next_dag_run_dates[dag.dag_id] = datetime.max
                 return
 
             # Don't schedule a dag beyond its end_date (as specified by the task params)
@@ -888,6 +1645,7 @@ class SchedulerJob(BaseJob):
             if task_end_dates:
                 min_task_end_date = min(task_end_dates)
             if next_run_date and min_task_end_date and next_run_date > min_task_end_date:
+                self._next_dag_run_dates[dag.dag_id] = datetime.max
                 return
 
             if next_run_date and period_end and period_end <= datetime.utcnow():
@@ -899,6 +1657,10 @@ class SchedulerJob(BaseJob):
                     external_trigger=False
                 )
                 return next_run
+            if period_end:
+                self._next_dag_run_dates[dag.dag_id] = period_end
+        else:
+            self._next_dag_run_dates[dag.dag_id] = datetime.max
 
     def _process_task_instances(self, dag, queue):
         """
@@ -913,6 +1675,11 @@ class SchedulerJob(BaseJob):
         if self.policy_lifo:
             dag_runs = sorted(dag_runs, key=lambda dr: dr.execution_date, reverse=True)
 
+        # Only the runs whose task instances changed since their state was
+        # last updated need to be updated again
+        task_states_signatures = DagRun.get_task_states_signatures(
+            dag, dag_runs, session=session)
+
         active_dag_runs = []
         for run in dag_runs:
             self.log.info("Examining DAG run %s", run)
@@ -934,9 +1701,15 @@ class SchedulerJob(BaseJob):
 
             # todo: run.dag is transient but needs to be set
             run.dag = dag
-            # todo: preferably the integrity check happens at dag collection time
-            run.verify_integrity(session=session)
-            run.update_state(session=session)
+            task_states_signature = task_states_signatures[run.execution_date]
+            if run.task_states_signature == task_states_signature:
+                self.log.debug("Task instances of %s did not change, not updating "
+                               "its state", run)
+            else:
+                # todo: preferably the integrity check happens at dag collection time
+                run.verify_integrity(session=session)
+                run.task_states_signature = task_states_signature
+                run.update_state(session=session)
             if run.state == State.RUNNING:
                 make_transient(run)
                 active_dag_runs.append(run)
@@ -944,12 +1717,15 @@ class SchedulerJob(BaseJob):
         for run in active_dag_runs:
             self.log.debug("Examining active DAG run: %s", run)
             # this needs a fresh session sometimes tis get detached
-            tis = run.get_task_instances(state=(State.NONE,
-                                                State.UP_FOR_RETRY))
-
-            # this loop is quite slow as it uses are_dependencies_met for
-            # every task (in ti.is_runnable). This is also called in
-            # update_state above which has already checked these tasks
+            dag_run_tis = run.get_task_instances()
+            tis = [ti for ti in dag_run_tis
+                   if ti.state in (State.NONE, State.UP_FOR_RETRY)]
+
+            # The trigger rules of all the task instances are evaluated
+            # against the states loaded above, so that checking the
+            # dependencies of the whole run only takes a single query
+            dep_context = DepContext(flag_upstream_failed=True,
+                                     dag_run_tis=dag_run_tis)
             for ti in tis:
                 task = dag.get_task(ti.task_id)
 
@@ -964,7 +1740,7 @@ class SchedulerJob(BaseJob):
                     continue
 
                 if ti.are_dependencies_met(
-                        dep_context=DepContext(flag_upstream_failed=True),
+                        dep_context=dep_context,
                         session=session):
                     self.log.debug('Queuing task: %s', ti)
                     queue.append(ti.key)
@@ -1028,17 +1804,24 @@ class SchedulerJob(BaseJob):
                 "Set %s task instances to state=%s as their associated DagRun was not in RUNNING state",
                 tis_changed, new_state
             )
+            # queued task instances may have been moved out of their pools
+            self.pool_ledger.invalidate()
 
     @provide_session
-    def __get_task_concurrency_map(self, states, session=None):
+    def __get_concurrency_maps(self, states, simple_dag_bag, session=None):
         """
-        Returns a map from tasks to number in the states list given.
+        Returns a map from dag_id to the number of task instances in the states
+        list given, and a map from (dag_id, task_id) to the same count. Both
+        maps are built from a single grouped query. The task instances of
+        tasks that are no longer in their DAG are not counted.
 
         :param states: List of states to query for
         :type states: List[State]
-        :return: A map from (dag_id, task_id) to count of tasks in states
-        :rtype: Dict[[String, String], Int]
-
+        :param simple_dag_bag: the DAGs whose tasks are counted
+        :type simple_dag_bag: SimpleDagBag
+        :return: A map from dag_id to count of tasks in states, and a map from
+        (dag_id, task_id) to count of tasks in states
+        :rtype: Tuple[Dict[String, Int], Dict[[String, String], Int]]
         """
         TI = models.TaskInstance
         ti_concurrency_query = (
@@ -1047,11 +1830,17 @@ class SchedulerJob(BaseJob):
             .filter(TI.state.in_(states))
             .group_by(TI.task_id, TI.dag_id)
         ).all()
+        task_ids = {dag_id: set(simple_dag_bag.get_dag(dag_id).task_ids)
+                    for dag_id in simple_dag_bag.dag_ids}
+        dag_map = defaultdict(int)
         task_map = defaultdict(int)
         for result in ti_concurrency_query:
             task_id, dag_id, count = result
+            if dag_id in task_ids and task_id not in task_ids[dag_id]:
+                continue
+            dag_map[dag_id] += count
             task_map[(dag_id, task_id)] = count
-        return task_map
+        return dag_map, task_map
 
     @provide_session
     def _find_executable_task_instances(self, simple_dag_bag, states, session=None):
@@ -1108,14 +1897,19 @@ class SchedulerJob(BaseJob):
             ["{}".format(x) for x in task_instances_to_examine])
         self.log.info("Tasks up for execution:\n\t%s", task_instance_str)
 
-        # Get the pool settings
-        pools = {p.pool: p for p in session.query(models.Pool).all()}
+        # Get the pool settings and the slots in use in each pool
+        self.pool_ledger.refresh(session=session)
 
         pool_to_task_instances = defaultdict(list)
         for task_instance in task_instances_to_examine:
             pool_to_task_instances[task_instance.pool].append(task_instance)
 
-        task_concurrency_map = self.__get_task_concurrency_map(states=states_to_count_as_running, session=session)
+        # Running task counts per DAG and per task, so that the admission
+        # decisions below can be made without going back to the DB.
+        # TODO(saguziel): also check against QUEUED state, see AIRFLOW-1104
+        dag_concurrency_map, task_concurrency_map = self.__get_concurrency_maps(
+            states=states_to_count_as_running, simple_dag_bag=simple_dag_bag,
+            session=session)
 
         # Go through each pool, and queue up a task for execution if there are
         # any open slots in the pool.
@@ -1125,8 +1919,17 @@ class SchedulerJob(BaseJob):
                 # If queued outside of a pool, trigger no more than
                 # non_pooled_task_slot_count per run
                 open_slots = conf.getint('core', 'non_pooled_task_slot_count')
+            elif not self.pool_ledger.has_pool(pool):
+                self.log.warning(
+                    "Not scheduling %s task instances since pool %s does not exist",
+                    len(task_instances), pool
+                )
+                # The pool may have been created since the ledger was last
+                # reconciled
+                self.pool_ledger.invalidate()
+                continue
             else:
-                open_slots = pools[pool].open_slots(session=session)
+                open_slots = self.pool_ledger.open_slots(pool)
 
             num_queued = len(task_instances)
             self.log.info(
@@ -1144,9 +1947,6 @@ class SchedulerJob(BaseJob):
                 priority_sorted_task_instances = sorted(
                     task_instances, key=lambda ti: (-ti.priority_weight, ti.execution_date))
 
-            # DAG IDs with running tasks that equal the concurrency limit of the dag
-            dag_id_to_possibly_running_task_count = {}
-
             for task_instance in priority_sorted_task_instances:
                 if open_slots <= 0:
                     self.log.info(
@@ -1161,17 +1961,8 @@ class SchedulerJob(BaseJob):
                 dag_id = task_instance.dag_id
                 simple_dag = simple_dag_bag.get_dag(dag_id)
 
-                if dag_id not in dag_id_to_possibly_running_task_count:
-                    # TODO(saguziel): also check against QUEUED state, see AIRFLOW-1104
-                    dag_id_to_possibly_running_task_count[dag_id] = \
-                        DAG.get_num_task_instances(
-                            dag_id,
-                            simple_dag_bag.get_dag(dag_id).task_ids,
-                            states=states_to_count_as_running,
-                            session=session)
-
-                current_task_concurrency = dag_id_to_possibly_running_task_count[dag_id]
-                task_concurrency_limit = simple_dag_bag.get_dag(dag_id).concurrency
+                current_task_concurrency = dag_concurrency_map[dag_id]
+                task_concurrency_limit = simple_dag.concurrency
                 self.log.info(
                     "DAG %s has %s/%s running and queued tasks",
                     dag_id, current_task_concurrency, task_concurrency_limit
@@ -1202,7 +1993,7 @@ class SchedulerJob(BaseJob):
                     continue
                 executable_tis.append(task_instance)
                 open_slots -= 1
-                dag_id_to_possibly_running_task_count[dag_id] += 1
+                dag_concurrency_map[dag_id] += 1
 
         task_instance_str = "\n\t".join(
             ["{}".format(x) for x in executable_tis])
@@ -1274,8 +2065,13 @@ class SchedulerJob(BaseJob):
                                   TI.task_id == ti.task_id,
                                   TI.execution_date == ti.execution_date)
                              for ti in tis_to_set_to_queued])
+        queued_pools = [(ti.pool, ti.key) for ti in tis_to_set_to_queued]
         session.commit()
 
+        # only the TIs that were actually set to queued take up pool slots
+        for pool, key in queued_pools:
+            self.pool_ledger.take_slots(pool, key)
+
         # requery in batch since above was expired by commit
         tis_to_be_queued = (
             session
@@ -1359,6 +2155,12 @@ class SchedulerJob(BaseJob):
         :type states: Tuple[State]
         :return: None
         """
+        if self.shard_lease_manager is not None:
+            # The other schedulers queue task instances in the same pools:
+            # lock the pools until the task instances are queued, and count
+            # the slots in use again
+            session.query(models.Pool).with_for_update().all()
+            self.pool_ledger.invalidate()
         executable_tis = self._find_executable_task_instances(simple_dag_bag, states,
                                                               session=session)
         if self.max_tis_per_query == 0:
@@ -1404,6 +2206,7 @@ class SchedulerJob(BaseJob):
         :type tis_out: multiprocessing.Queue[TaskInstance]
         :return: None
         """
+        processed_dags = []
         for dag in dags:
             dag = dagbag.get_dag(dag.dag_id)
             if dag.is_paused:
@@ -1420,7 +2223,9 @@ class SchedulerJob(BaseJob):
             if dag_run:
                 self.log.info("Created %s", dag_run)
             self._process_task_instances(dag, tis_out)
-            self.manage_slas(dag)
+            processed_dags.append(dag)
+
+        self.manage_slas_for_dags(processed_dags)
 
         models.DagStat.update([d.dag_id for d in dags])
 
@@ -1448,6 +2253,8 @@ class SchedulerJob(BaseJob):
                     self.log.warning("TaskInstance %s went missing from the database", ti)
                     continue
 
+                self.pool_ledger.release_slots(key)
+
                 # TODO: should we fail RUNNING as well, as we do in Backfills?
                 if ti.state == State.QUEUED:
                     msg = ("Executor reports task instance %s finished (%s) "
@@ -1468,6 +2275,52 @@ class SchedulerJob(BaseJob):
                         session.merge(ti)
                         session.commit()
 
+    def _get_owned_file_paths(self, file_paths):
+        """
+        :return: the DAG files of the shards leased by the scheduler, or all
+        the files when there is a single scheduler
+        :rtype: list[unicode]
+        """
+        if self.shard_lease_manager is None:
+            return file_paths
+        return [file_path for file_path in file_paths
+                if self.shard_lease_manager.owns(file_path, self.subdir)]
+
+    def _heartbeat_shard_leases(self, processor_manager, known_file_paths):
+        """
+        Renews the shard leases of the scheduler, hands the files of its
+        current shards to the processor manager and resets the orphaned task
+        instances of the shards taken over from a scheduler that died or shut
+        down.
+
+        :param processor_manager: manager of the DAG file processors
+        :type processor_manager: DagFileProcessorManager
+        :param known_file_paths: all the files in the DAGs directory
+        :type known_file_paths: list[unicode]
+        """
+        orphaned_shards = self.shard_lease_manager.heartbeat()
+        owned_file_paths = self._get_owned_file_paths(known_file_paths)
+        if owned_file_paths != processor_manager.file_paths:
+            self.log.info("Processing %s files of the shards %s",
+                          len(owned_file_paths), sorted(self.shard_lease_manager.shards))
+            processor_manager.set_file_paths(owned_file_paths)
+        if orphaned_shards:
+            self.log.info("Resetting orphaned tasks of the shards %s", sorted(orphaned_shards))
+            self.reset_state_for_orphaned_tasks(
+                dag_ids=self._get_shard_dag_ids(orphaned_shards))
+
+    @provide_session
+    def _get_shard_dag_ids(self, shards, session=None):
+        """
+        :return: the IDs of the DAGs defined in the DAG files of the shards
+        :rtype: list[unicode]
+        """
+        DM = models.DagModel
+        return [
+            dag_id for dag_id, fileloc in
+            session.query(DM.dag_id, DM.fileloc).filter(DM.fileloc != None)
+            if get_shard(fileloc, self.subdir, self.num_shards) in shards]
+
     def _log_file_processing_stats(self,
                                    known_file_paths,
                                    processor_manager):
@@ -1556,14 +2409,38 @@ class SchedulerJob(BaseJob):
 
         # Build up a list of Python files that could contain DAGs
         self.log.info("Searching for files in %s", self.subdir)
-        known_file_paths = list_py_file_paths(self.subdir)
+        dag_folder_watcher = DagFolderWatcher(self.subdir, self.dag_dir_watcher)
+        dag_folder_watcher.check(full_scan=True)
+        known_file_paths = dag_folder_watcher.file_paths
         self.log.info("There are %s files in %s", len(known_file_paths), self.subdir)
 
-        def processor_factory(file_path):
+        worker_pool = None
+        if conf.getboolean('scheduler', 'dag_parsing_worker_pool'):
+            self.log.info("Processing files using a pool of %s workers", self.max_threads)
+            preload_modules = [
+                m.strip() for m in
+                conf.get('scheduler', 'dag_parsing_worker_preload_modules').split(',')
+                if m.strip()]
+            worker_pool = DagParsingWorkerPool(
+                self.max_threads,
+                pickle_dags,
+                self.dag_ids,
+                conf.getint('scheduler', 'dag_parsing_worker_max_files'),
+                conf.getint('scheduler', 'dag_parsing_worker_max_memory_mb'),
+                preload_modules)
+            worker_pool.start()
+
+        def processor_factory(file_path, zombies):
+            if worker_pool is not None:
+                return PooledDagFileProcessor(file_path,
+                                              worker_pool,
+                                              self.dag_file_processing_timeout_seconds,
+                                              zombies)
             return DagFileProcessor(file_path,
                                     pickle_dags,
                                     self.dag_ids,
-                                    self.dag_file_processing_timeout_seconds)
+                                    self.dag_file_processing_timeout_seconds,
+                                    zombies)
 
         processor_manager = DagFileProcessorManager(self.subdir,
                                                     known_file_paths,
@@ -1572,10 +2449,22 @@ class SchedulerJob(BaseJob):
                                                     self.num_runs,
                                                     processor_factory)
 
+        if self.num_shards > 0:
+            self.log.info("Processing the files of the shards leased out of %s shards",
+                          self.num_shards)
+            self.shard_lease_manager = ShardLeaseManager(self.id,
+                                                         self.num_shards,
+                                                         self.shard_lease_timeout)
+
         try:
-            self._execute_helper(processor_manager)
+            self._execute_helper(processor_manager, dag_folder_watcher)
         finally:
             self.log.info("Exited execute loop")
+            dag_folder_watcher.close()
+            if self.shard_lease_manager is not None:
+                self.shard_lease_manager.release()
+            if worker_pool is not None:
+                worker_pool.terminate()
 
             # Kill all child processes on exit since we don't want to leave
             # them as orphaned.
@@ -1608,18 +2497,36 @@ class SchedulerJob(BaseJob):
                         child.kill()
                         child.wait()
 
-    def _execute_helper(self, processor_manager):
+    def _execute_helper(self, processor_manager, dag_folder_watcher=None):
         """
         :param processor_manager: manager to use
         :type processor_manager: DagFileProcessorManager
+        :param dag_folder_watcher: watcher of the files in the DAGs directory,
+        or None to use one that is closed on exit
+        :type dag_folder_watcher: DagFolderWatcher
         :return: None
         """
+        if dag_folder_watcher is None:
+            dag_folder_watcher = DagFolderWatcher(self.subdir, self.dag_dir_watcher)
+            try:
+                return self._execute_helper(processor_manager, dag_folder_watcher)
+            finally:
+                dag_folder_watcher.close()
+
         self.executor.start()
+        self.loop_profiler.start()
 
-        session = settings.Session()
-        self.log.info("Resetting orphaned tasks for active dag runs")
-        self.reset_state_for_orphaned_tasks(session=session)
-        session.close()
+        # Use this value initially
+        known_file_paths = processor_manager.file_paths
+
+        if self.shard_lease_manager is None:
+            session = settings.Session()
+            self.log.info("Resetting orphaned tasks for active dag runs")
+            self.reset_state_for_orphaned_tasks(session=session)
+            session.close()
+        else:
+            # The orphaned tasks of the shards are reset as they are claimed
+            self._heartbeat_shard_leases(processor_manager, known_file_paths)
 
         execute_start_time = datetime.utcnow()
 
@@ -1629,41 +2536,80 @@ class SchedulerJob(BaseJob):
         last_self_heartbeat_time = datetime.utcnow()
         # Last time that the DAG dir was traversed to look for files
         last_dag_dir_refresh_time = datetime.utcnow()
-
-        # Use this value initially
-        known_file_paths = processor_manager.file_paths
+        # Last time zombies were looked for
+        last_zombie_detection_time = datetime(2000, 1, 1)
+        # Last time the shard leases were renewed
+        last_shard_lease_heartbeat_time = datetime.utcnow()
 
         # For the execute duration, parse and schedule DAGs
         while (datetime.utcnow() - execute_start_time).total_seconds() < \
                 self.run_duration or self.run_duration < 0:
             self.log.debug("Starting Loop...")
             loop_start_time = time.time()
+            self.loop_profiler.start_loop()
 
             # Traverse the DAG directory for Python files containing DAGs
             # periodically
             elapsed_time_since_refresh = (datetime.utcnow() -
                                           last_dag_dir_refresh_time).total_seconds()
 
-            if elapsed_time_since_refresh > self.dag_dir_list_interval:
-                # Build up a list of Python files that could contain DAGs
-                self.log.info("Searching for files in %s", self.subdir)
-                known_file_paths = list_py_file_paths(self.subdir)
-                last_dag_dir_refresh_time = datetime.utcnow()
-                self.log.info("There are %s files in %s", len(known_file_paths), self.subdir)
-                processor_manager.set_file_paths(known_file_paths)
-
-                self.log.debug("Removing old import errors")
-                self.clear_nonexistent_import_errors(known_file_paths=known_file_paths)
-
-            # Kick of new processes and collect results from finished ones
-            self.log.info("Heartbeating the process manager")
-            simple_dags = processor_manager.heartbeat()
-
-            if self.using_sqlite:
-                # For the sqlite case w/ 1 thread, wait until the processor
-                # is finished to avoid concurrent access to the DB.
-                self.log.debug("Waiting for processors to finish since we're using sqlite")
-                processor_manager.wait_until_finished()
+            full_scan = elapsed_time_since_refresh > self.dag_dir_list_interval
+            with self.loop_profiler.phase('list_dag_files'):
+                # Build up a list of Python files that could contain DAGs. In
+                # between full scans, only the changes reported by the watcher
+                # are picked up.
+                if full_scan:
+                    self.log.info("Searching for files in %s", self.subdir)
+                    last_dag_dir_refresh_time = datetime.utcnow()
+                if dag_folder_watcher.check(full_scan=full_scan):
+                    known_file_paths = dag_folder_watcher.file_paths
+                    self.log.info("There are %s files in %s", len(known_file_paths), self.subdir)
+                    processor_manager.set_file_paths(
+                        self._get_owned_file_paths(known_file_paths))
+                    full_scan = True
+
+                if full_scan:
+                    self.log.debug("Removing old import errors")
+                    self.clear_nonexistent_import_errors(known_file_paths=known_file_paths)
+                    if self.store_serialized_dags:
+                        models.SerializedDagModel.remove_deleted_dags(
+                            self.subdir, known_file_paths)
+
+            # Renew the shard leases well before they expire, and pick up
+            # the shards of the schedulers that died or started
+            if (self.shard_lease_manager is not None and
+                    (datetime.utcnow() - last_shard_lease_heartbeat_time).total_seconds() >
+                    self.shard_lease_timeout / 3.0):
+                with self.loop_profiler.phase('shard_lease_heartbeat'):
+                    self._heartbeat_shard_leases(processor_manager, known_file_paths)
+                    last_shard_lease_heartbeat_time = datetime.utcnow()
+
+            # Find zombies periodically, and have the processors of their
+            # DAG files fail them
+            if ((datetime.utcnow() - last_zombie_detection_time).total_seconds() >
+                    self.zombie_detection_interval):
+                with self.loop_profiler.phase('find_zombies'):
+                    zombies = self.find_zombies()
+                    if self.shard_lease_manager is not None:
+                        zombies = {
+                            file_path: simple_tis
+                            for file_path, simple_tis in zombies.items()
+                            if self.shard_lease_manager.owns(file_path, self.subdir)}
+                    processor_manager.add_zombies(zombies)
+                    last_zombie_detection_time = datetime.utcnow()
+
+            with self.loop_profiler.phase('processor_manager_heartbeat'):
+                # Kick of new processes and collect results from finished ones
+                self.log.info("Heartbeating the process manager")
+                simple_dags = processor_manager.heartbeat()
+                for simple_dag in simple_dags:
+                    self._dag_file_paths[simple_dag.dag_id] = simple_dag.full_filepath
+
+                if self.using_sqlite:
+                    # For the sqlite case w/ 1 thread, wait until the processor
+                    # is finished to avoid concurrent access to the DB.
+                    self.log.debug("Waiting for processors to finish since we're using sqlite")
+                    processor_manager.wait_until_finished()
 
             # Send tasks for execution if available
             simple_dag_bag = SimpleDagBag(simple_dags)
@@ -1676,47 +2622,55 @@ class SchedulerJob(BaseJob):
                 # If a task instance is up for retry but the corresponding DAG run
                 # isn't running, mark the task instance as FAILED so we don't try
                 # to re-run it.
-                self._change_state_for_tis_without_dagrun(simple_dag_bag,
-                                                          [State.UP_FOR_RETRY],
-                                                          State.FAILED)
-                # If a task instance is scheduled or queued, but the corresponding
-                # DAG run isn't running, set the state to NONE so we don't try to
-                # re-run it.
-                self._change_state_for_tis_without_dagrun(simple_dag_bag,
-                                                          [State.QUEUED,
-                                                           State.SCHEDULED],
-                                                          State.NONE)
-
-                self._execute_task_instances(simple_dag_bag,
-                                             (State.SCHEDULED,))
+                with self.loop_profiler.phase('change_state_for_tis_without_dagrun'):
+                    self._change_state_for_tis_without_dagrun(simple_dag_bag,
+                                                              [State.UP_FOR_RETRY],
+                                                              State.FAILED)
+                    # If a task instance is scheduled or queued, but the corresponding
+                    # DAG run isn't running, set the state to NONE so we don't try to
+                    # re-run it.
+                    self._change_state_for_tis_without_dagrun(simple_dag_bag,
+                                                              [State.QUEUED,
+                                                               State.SCHEDULED],
+                                                              State.NONE)
+
+                with self.loop_profiler.phase('execute_task_instances'):
+                    self._execute_task_instances(simple_dag_bag,
+                                                 (State.SCHEDULED,))
 
             # Call heartbeats
-            self.log.info("Heartbeating the executor")
-            self.executor.heartbeat()
+            with self.loop_profiler.phase('executor_heartbeat'):
+                self.log.info("Heartbeating the executor")
+                self.executor.heartbeat()
 
             # Process events from the executor
-            self._process_executor_events(simple_dag_bag)
+            with self.loop_profiler.phase('process_executor_events'):
+                self._process_executor_events(simple_dag_bag)
 
             # Heartbeat the scheduler periodically
             time_since_last_heartbeat = (datetime.utcnow() -
                                          last_self_heartbeat_time).total_seconds()
             if time_since_last_heartbeat > self.heartrate:
-                self.log.info("Heartbeating the scheduler")
-                self.heartbeat()
-                last_self_heartbeat_time = datetime.utcnow()
+                with self.loop_profiler.phase('scheduler_heartbeat'):
+                    self.log.info("Heartbeating the scheduler")
+                    self.heartbeat()
+                    last_self_heartbeat_time = datetime.utcnow()
+
+            self.loop_profiler.end_loop()
 
             # Occasionally print out stats about how fast the files are getting processed
             if ((datetime.utcnow() - last_stat_print_time).total_seconds() >
                     self.print_stats_interval):
-                if len(known_file_paths) > 0:
-                    self._log_file_processing_stats(known_file_paths,
+                if len(processor_manager.file_paths) > 0:
+                    self._log_file_processing_stats(processor_manager.file_paths,
                                                     processor_manager)
+                if self.profile:
+                    self._log_loop_profile()
                 last_stat_print_time = datetime.utcnow()
 
             loop_end_time = time.time()
             self.log.debug("Ran scheduling loop in %.2f seconds", loop_end_time - loop_start_time)
-            self.log.debug("Sleeping for %.2f seconds", self._processor_poll_interval)
-            time.sleep(self._processor_poll_interval)
+            self._wait_for_events(processor_manager, dag_folder_watcher)
 
             # Exit early for a test mode
             if processor_manager.max_runs_reached():
@@ -1728,8 +2682,8 @@ class SchedulerJob(BaseJob):
 
         # Verify that all files were processed, and if so, deactivate DAGs that
         # haven't been touched by the scheduler as they likely have been
-        # deleted.
-        all_files_processed = True
+        # deleted. The other schedulers touch the DAGs of the other shards.
+        all_files_processed = self.shard_lease_manager is None
         for file_path in known_file_paths:
             if processor_manager.get_last_finish_time(file_path) is None:
                 all_files_processed = False
@@ -1743,10 +2697,131 @@ class SchedulerJob(BaseJob):
 
         self.executor.end()
 
+        self.loop_profiler.stop()
+        if self.profile:
+            self._log_loop_profile()
+
         settings.Session.remove()
 
+    def _wait_for_events(self, processor_manager, dag_folder_watcher):
+        """
+        Waits until a DAG file processor finishes, the executor receives a
+        task result or a file changes in the DAGs directory, for at most
+        processor_poll_interval seconds, so that they are handled as soon as
+        they happen instead of after a fixed sleep.
+
+        :param processor_manager: manager of the DAG file processors
+        :type processor_manager: DagFileProcessorManager
+        :param dag_folder_watcher: watcher of the files in the DAGs directory
+        :type dag_folder_watcher: DagFolderWatcher
+        """
+        if self.executor.event_buffer:
+            # Events are waiting to be processed already
+            return
+        handles = (processor_manager.get_wait_handles() +
+                   self.executor.get_wait_handles() +
+                   dag_folder_watcher.get_wait_handles())
+        self.log.debug("Waiting up to %.2f seconds on %s handles",
+                       self._processor_poll_interval, len(handles))
+        wait_for_handles(handles, self._processor_poll_interval)
+
+    def _log_loop_profile(self):
+        """
+        Print out the time spent and the queries run in each phase of the
+        recent scheduling loops.
+        """
+        self.log.info(
+            "\n" +
+            "=" * 80 +
+            "\n" +
+            "Scheduler loop profile (last {} loops):\n\n".format(
+                len(self.loop_profiler.history)) +
+            "{}\n".format(self.loop_profiler.report()) +
+            "=" * 80)
+
+    @provide_session
+    def _schedule_task_instances(self, dagbag, ti_keys, session=None):
+        """
+        Creates or updates the task instances for the given keys, setting the
+        ones whose dependencies are met to the SCHEDULED state.
+
+        The task instances of each DagRun are locked with a single query,
+        their dependencies are evaluated in memory and all of their changes
+        are written in a single transaction.
+
+        :param dagbag: the DagBag containing the DAGs of the task instances
+        :type dagbag: models.DagBag
+        :param ti_keys: keys of the task instances to schedule
+        :type ti_keys: list[tuple[unicode, unicode, datetime]]
+        :return: None
+        """
+        TI = models.TaskInstance
+
+        # Group the keys per DagRun, keeping the order they came in
+        dag_run_keys = []
+        task_ids_by_dag_run = defaultdict(list)
+        for dag_id, task_id, execution_date in ti_keys:
+            if (dag_id, execution_date) not in task_ids_by_dag_run:
+                dag_run_keys.append((dag_id, execution_date))
+            task_ids_by_dag_run[(dag_id, execution_date)].append(task_id)
+
+        # We can defer checking the task dependency checks to the worker themselves
+        # since they can be expensive to run in the scheduler.
+        dep_context = DepContext(deps=QUEUE_DEPS, ignore_task_deps=True)
+
+        for dag_id, execution_date in dag_run_keys:
+            dag = dagbag.dags[dag_id]
+            task_ids = task_ids_by_dag_run[(dag_id, execution_date)]
+
+            existing_tis = (
+                session
+                .query(TI)
+                .filter(TI.dag_id == dag_id,
+                        TI.execution_date == execution_date,
+                        TI.task_id.in_(task_ids))
+                .with_for_update()
+                .all()
+            )
+            ti_by_task_id = {ti.task_id: ti for ti in existing_tis}
+
+            for task_id in task_ids:
+                task = dag.get_task(task_id)
+                ti = ti_by_task_id.get(task_id)
+                if ti is None:
+                    ti = models.TaskInstance(task, execution_date)
+                    session.add(ti)
+                else:
+                    # Keep the task specific attributes in line with the
+                    # current definition of the task
+                    ti.task = task
+                    ti.queue = task.queue
+                    ti.pool = task.pool
+                    ti.priority_weight = task.priority_weight_total
+                    ti.unixname = getpass.getuser()
+                    ti.run_as_user = task.run_as_user
+
+                # Only schedule tasks that have their dependencies met, e.g. to avoid
+                # a task that recently got it's state changed to RUNNING from somewhere
+                # other than the scheduler from getting it's state overwritten.
+                # TODO(aoen): It's not great that we have to check all the task instance
+                # dependencies twice; once to get the task scheduled, and again to actually
+                # run the task. We should try to come up with a way to only check them once.
+                if ti.are_dependencies_met(
+                        dep_context=dep_context,
+                        session=session,
+                        verbose=True):
+                    # Task starts out in the scheduled state. All tasks in the
+                    # scheduled state will be sent to the executor
+                    ti.state = State.SCHEDULED
+
+            self.log.info(
+                "Creating / updating %s task instances of DAG %s for %s in ORM",
+                len(task_ids), dag_id, execution_date
+            )
+            session.commit()
+
     @provide_session
-    def process_file(self, file_path, pickle_dags=False, session=None):
+    def process_file(self, file_path, pickle_dags=False, zombies=None, session=None):
         """
         Process a Python file containing Airflow DAGs.
 
@@ -1757,8 +2832,8 @@ class SchedulerJob(BaseJob):
         3. For each DAG, see what tasks should run and create appropriate task
         instances in the DB.
         4. Record any errors importing the file into ORM
-        5. Kill (in ORM) any task instances belonging to the DAGs that haven't
-        issued a heartbeat in a while.
+        5. Fail the zombie task instances found by the scheduler, i.e. the
+        task instances whose job hasn't issued a heartbeat in a while.
 
         Returns a list of SimpleDag objects that represent the DAGs found in
         the file
@@ -1768,6 +2843,9 @@ class SchedulerJob(BaseJob):
         :param pickle_dags: whether serialize the DAGs found in the file and
         save them to the db
         :type pickle_dags: bool
+        :param zombies: the zombie task instances of the DAGs in the file, see
+        find_zombies()
+        :type zombies: list[SimpleTaskInstance]
         :return: a list of SimpleDags made from the Dags found in the file
         :rtype: list[SimpleDag]
         """
@@ -1775,6 +2853,13 @@ class SchedulerJob(BaseJob):
         # As DAGs are parsed from this file, they will be converted into SimpleDags
         simple_dags = []
 
+        file_hash = None
+        if self.dag_parse_cache is not None and not pickle_dags and not zombies:
+            cached_simple_dags = self._process_file_from_cache(file_path, session=session)
+            if cached_simple_dags is not None:
+                return cached_simple_dags
+            file_hash = hash_file(file_path)
+
         try:
             dagbag = models.DagBag(file_path)
         except Exception:
@@ -1787,25 +2872,33 @@ class SchedulerJob(BaseJob):
         else:
             self.log.warning("No viable dags retrieved from %s", file_path)
             self.update_import_errors(session, dagbag)
+            self._write_serialized_dags(file_path, dagbag, session=session)
+            self._update_dag_parse_cache(file_path, file_hash, dagbag, [], [], [],
+                                         session=session)
             return []
 
         # Save individual DAGs in the ORM and update DagModel.last_scheduled_time
         for dag in dagbag.dags.values():
             dag.sync_to_db()
 
+        self._write_serialized_dags(file_path, dagbag, session=session)
+
         paused_dag_ids = [dag.dag_id for dag in dagbag.dags.values()
                           if dag.is_paused]
 
         # Pickle the DAGs (if necessary) and put them into a SimpleDag
+        all_simple_dags = []
         for dag_id in dagbag.dags:
             dag = dagbag.get_dag(dag_id)
             pickle_id = None
             if pickle_dags:
                 pickle_id = dag.pickle(session).id
 
+            simple_dag = SimpleDag(dag, pickle_id=pickle_id)
+            all_simple_dags.append(simple_dag)
             # Only return DAGs that are not paused
             if dag_id not in paused_dag_ids:
-                simple_dags.append(SimpleDag(dag, pickle_id=pickle_id))
+                simple_dags.append(simple_dag)
 
         if len(self.dag_ids) > 0:
             dags = [dag for dag in dagbag.dags.values()
@@ -1823,47 +2916,148 @@ class SchedulerJob(BaseJob):
 
         self._process_dags(dagbag, dags, ti_keys_to_schedule)
 
-        for ti_key in ti_keys_to_schedule:
-            dag = dagbag.dags[ti_key[0]]
-            task = dag.get_task(ti_key[1])
-            ti = models.TaskInstance(task, ti_key[2])
-
-            ti.refresh_from_db(session=session, lock_for_update=True)
-            # We can defer checking the task dependency checks to the worker themselves
-            # since they can be expensive to run in the scheduler.
-            dep_context = DepContext(deps=QUEUE_DEPS, ignore_task_deps=True)
-
-            # Only schedule tasks that have their dependencies met, e.g. to avoid
-            # a task that recently got it's state changed to RUNNING from somewhere
-            # other than the scheduler from getting it's state overwritten.
-            # TODO(aoen): It's not great that we have to check all the task instance
-            # dependencies twice; once to get the task scheduled, and again to actually
-            # run the task. We should try to come up with a way to only check them once.
-            if ti.are_dependencies_met(
-                    dep_context=dep_context,
-                    session=session,
-                    verbose=True):
-                # Task starts out in the scheduled state. All tasks in the
-                # scheduled state will be sent to the executor
-                ti.state = State.SCHEDULED
-
-            # Also save this task instance to the DB.
-            self.log.info("Creating / updating %s in ORM", ti)
-            session.merge(ti)
-            session.commit()
+        self._schedule_task_instances(dagbag, ti_keys_to_schedule, session=session)
 
         # Record import errors into the ORM
         try:
             self.update_import_errors(session, dagbag)
         except Exception:
             self.log.exception("Error logging import errors!")
-        try:
-            dagbag.kill_zombies()
-        except Exception:
-            self.log.exception("Error killing zombies!")
+        if zombies:
+            try:
+                dagbag.kill_zombies(zombies)
+            except Exception:
+                self.log.exception("Error killing zombies!")
+
+        self._update_dag_parse_cache(file_path, file_hash, dagbag, dags,
+                                     all_simple_dags, paused_dag_ids,
+                                     session=session)
 
         return simple_dags
 
+    @provide_session
+    def _write_serialized_dags(self, file_path, dagbag, session=None):
+        """
+        Stores the serialized representation of the DAGs found in a file for
+        the webserver and the API, if enabled, and removes the DAGs that are
+        no longer in the file.
+
+        :param file_path: the path to the Python file
+        :type file_path: unicode
+        :param dagbag: the DAGs of the file
+        :type dagbag: models.DagBag
+        """
+        if not self.store_serialized_dags:
+            return
+        # Subdags are stored along with their root DAG
+        root_dags = [dag for dag in dagbag.dags.values() if not dag.is_subdag]
+        for dag in root_dags:
+            try:
+                models.SerializedDagModel.write_dag(dag, session=session)
+            except Exception:
+                self.log.exception("Failed to store the serialized DAG %s", dag.dag_id)
+                session.rollback()
+        # Keep the last DAGs that could be loaded from a file that is broken
+        if file_path not in dagbag.import_errors:
+            models.SerializedDagModel.remove_stale_dags(
+                file_path,
+                [dag.dag_id for dag in root_dags if dag.full_filepath == file_path],
+                session=session)
+
+    @provide_session
+    def _process_file_from_cache(self, file_path, session=None):
+        """
+        Serves the SimpleDags of a file from the DAG parse cache, as long as
+        nothing needs to be scheduled for its DAGs.
+
+        :param file_path: the path to the Python file
+        :type file_path: unicode
+        :return: the SimpleDags of the DAGs that are not paused, or None if
+        the file needs to be processed
+        :rtype: list[SimpleDag]
+        """
+        entry = self.dag_parse_cache.get(file_path)
+        if entry is None:
+            return None
+        dag_ids = [simple_dag.dag_id for simple_dag in entry.simple_dags]
+        if dag_ids:
+            DM = models.DagModel
+            orm_dags = dict(
+                session.query(DM.dag_id, DM.is_paused)
+                .filter(DM.dag_id.in_(dag_ids))
+                .all())
+            paused_dag_ids = {dag_id for dag_id, is_paused in orm_dags.items()
+                              if is_paused}
+            # DAGs that were (un)paused or removed from the DB need processing
+            if len(orm_dags) != len(dag_ids) or paused_dag_ids != entry.paused_dag_ids:
+                return None
+            running_dag_runs = (
+                session.query(func.count(DagRun.dag_id))
+                .filter(DagRun.dag_id.in_(dag_ids),
+                        DagRun.state == State.RUNNING)
+                .scalar())
+            if running_dag_runs:
+                return None
+
+            # What DAG.sync_to_db() would have done for the unchanged DAGs
+            (session.query(DM)
+             .filter(DM.dag_id.in_(dag_ids))
+             .update({DM.is_active: True,
+                      DM.last_scheduler_run: datetime.utcnow()},
+                     synchronize_session=False))
+            session.commit()
+
+        self.log.info("Using the cached DAG(s) %s of %s", dag_ids, file_path)
+        Stats.incr('dag_parse_cache_hit', 1, 1)
+        return [simple_dag for simple_dag in entry.simple_dags
+                if simple_dag.dag_id not in entry.paused_dag_ids]
+
+    @provide_session
+    def _update_dag_parse_cache(self, file_path, file_hash, dagbag, dags,
+                                simple_dags, paused_dag_ids, session=None):
+        """
+        Stores the SimpleDags of a file in the DAG parse cache if nothing will
+        need to be scheduled for its DAGs until the next DagRun is due,
+        otherwise removes them from the cache.
+
+        :param file_path: the path to the Python file
+        :type file_path: unicode
+        :param file_hash: the hash of the file before it was executed
+        :type file_hash: unicode
+        :param dagbag: the DAGs of the file
+        :type dagbag: models.DagBag
+        :param dags: the DAGs that were processed
+        :type dags: list[DAG]
+        :param simple_dags: the SimpleDags of all the DAGs of the file
+        :type simple_dags: list[SimpleDag]
+        :param paused_dag_ids: the IDs of the DAGs that are paused
+        :type paused_dag_ids: list[unicode]
+        """
+        if self.dag_parse_cache is None or file_hash is None:
+            return
+
+        valid_until = datetime.max
+        cacheable = not dagbag.import_errors
+        for dag in dags:
+            next_dag_run_date = self._next_dag_run_dates.get(dag.dag_id)
+            if next_dag_run_date is None or any(task.sla for task in dag.tasks):
+                cacheable = False
+                break
+            valid_until = min(valid_until, next_dag_run_date)
+        if cacheable and dagbag.dags:
+            running_dag_runs = (
+                session.query(func.count(DagRun.dag_id))
+                .filter(DagRun.dag_id.in_(list(dagbag.dags.keys())),
+                        DagRun.state == State.RUNNING)
+                .scalar())
+            cacheable = running_dag_runs == 0
+
+        if cacheable:
+            self.dag_parse_cache.put(file_path, file_hash, get_local_module_paths(),
+                                     valid_until, simple_dags, paused_dag_ids)
+        else:
+            self.dag_parse_cache.invalidate(file_path)
+
     @provide_session
     def heartbeat_callback(self, session=None):
         Stats.gauge('scheduler_heartbeat', 1, 1)
@@ -2192,15 +3386,16 @@ class BackfillJob(BaseJob):
             self.log.debug("*** Clearing out not_ready list ***")
             ti_status.not_ready.clear()
 
+            tis_to_run_by_task_id = defaultdict(list)
+            for key, ti in ti_status.to_run.items():
+                tis_to_run_by_task_id[ti.task_id].append((key, ti))
+
             # we need to execute the tasks bottom to top
             # or leaf to root, as otherwise tasks might be
             # determined deadlocked while they are actually
             # waiting for their upstream to finish
             for task in self.dag.topological_sort():
-                for key, ti in list(ti_status.to_run.items()):
-                    if task.task_id != ti.task_id:
-                        continue
-
+                for key, ti in tis_to_run_by_task_id[task.task_id]:
                     ti.refresh_from_db()
 
                     task = self.dag.get_task(ti.task_id)
@@ -2493,6 +3688,8 @@ class LocalTaskJob(BaseJob):
         'polymorphic_identity': 'LocalTaskJob'
     }
 
+    supports_background_heartbeat = True
+
     def __init__(
             self,
             task_instance,
@@ -2542,6 +3739,9 @@ class LocalTaskJob(BaseJob):
 
         try:
             self.task_runner.start()
+            if self.heartbeat_thread is not None:
+                self.heartbeat_thread.register_task_instance(
+                    self.id, self.task_instance.key)
 
             last_heartbeat_time = time.time()
             heartbeat_time_limit = conf.getint('scheduler',
@@ -2557,7 +3757,7 @@ class LocalTaskJob(BaseJob):
                 # is a zombie
                 try:
                     self.heartbeat()
-                    last_heartbeat_time = time.time()
+                    last_heartbeat_time = self.get_latest_heartbeat_time()
                 except OperationalError:
                     Stats.incr('local_task_job_heartbeat_failure', 1, 1)
                     self.log.exception(
@@ -2592,8 +3792,15 @@ class LocalTaskJob(BaseJob):
             self.task_runner.terminate()
             return
 
-        self.task_instance.refresh_from_db()
         ti = self.task_instance
+        if self.heartbeat_thread is not None:
+            ti_state = self.heartbeat_thread.get_task_instance_state(self.id)
+            if ti_state is None:
+                # Not read by the thread since the task started yet
+                return
+            ti.state, ti.hostname, ti.pid = ti_state
+        else:
+            ti.refresh_from_db()
 
         fqdn = socket.getfqdn()
         same_hostname = fqdn == ti.hostname
@@ -0,0 +1,37 @@
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Add task_states_signature column to dag_run
+
+Revision ID: 3e8ad0b39aed
+Revises: d2ae31099d61
+Create Date: 2017-11-02 10:21:37.418862
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3e8ad0b39aed'
+down_revision = 'd2ae31099d61'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('dag_run', sa.Column('task_states_signature', sa.String(32)))
+
+
+def downgrade():
+    op.drop_column('dag_run', 'task_states_signature')
@@ -0,0 +1,43 @@
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Add scheduler_shard_lease table
+
+Revision ID: b8d3c1f2a9e4
+Revises: f239c968fdf1
+Create Date: 2017-11-14 10:21:37.204518
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b8d3c1f2a9e4'
+down_revision = 'f239c968fdf1'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('scheduler_shard_lease',
+                    sa.Column('shard_id', sa.Integer(), autoincrement=False, nullable=False),
+                    sa.Column('scheduler_id', sa.Integer(), nullable=True),
+                    sa.Column('hostname', sa.String(length=500), nullable=True),
+                    sa.Column('acquired_at', sa.DateTime(), nullable=True),
+                    sa.Column('latest_heartbeat', sa.DateTime(), nullable=True),
+                    sa.PrimaryKeyConstraint('shard_id'))
+
+
+def downgrade():
+    op.drop_table('scheduler_shard_lease')
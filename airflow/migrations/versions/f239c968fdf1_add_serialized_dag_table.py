@@ -0,0 +1,49 @@
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Add serialized_dag table
+
+Revision ID: f239c968fdf1
+Revises: 3e8ad0b39aed
+Create Date: 2017-11-09 14:02:51.113027
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'f239c968fdf1'
+down_revision = '3e8ad0b39aed'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+from alembic import context
+
+
+def upgrade():
+    if context.config.get_main_option('sqlalchemy.url').startswith('mysql'):
+        data_type = mysql.LONGTEXT
+    else:
+        data_type = sa.Text
+    op.create_table('serialized_dag',
+                    sa.Column('dag_id', sa.String(length=250), nullable=False),
+                    sa.Column('fileloc', sa.String(length=2000), nullable=False),
+                    sa.Column('data', data_type(), nullable=False),
+                    sa.Column('dag_hash', sa.String(length=40), nullable=False),
+                    sa.Column('last_updated', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('dag_id'))
+
+
+def downgrade():
+    op.drop_table('serialized_dag')
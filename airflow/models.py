@@ -23,14 +23,13 @@ install_aliases()
 from builtins import str
 from builtins import object, bytes
 import copy
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 from datetime import datetime, timedelta
 import dill
 import functools
 import getpass
 import imp
 import importlib
-import itertools
 import zipfile
 import jinja2
 import json
@@ -50,10 +49,10 @@ from urllib.parse import urlparse
 from sqlalchemy import (
     Column, Integer, String, DateTime, Text, Boolean, ForeignKey, PickleType,
     Index, Float, LargeBinary)
-from sqlalchemy import func, or_, and_
+from sqlalchemy import event, func, or_, and_, select
 from sqlalchemy.ext.declarative import declarative_base, declared_attr
 from sqlalchemy.dialects.mysql import LONGTEXT
-from sqlalchemy.orm import reconstructor, relationship, synonym
+from sqlalchemy.orm import attributes, reconstructor, relationship, synonym
 
 from croniter import croniter
 import six
@@ -63,18 +62,20 @@ from airflow.executors import GetDefaultExecutor, LocalExecutor
 from airflow import configuration
 from airflow.exceptions import AirflowException, AirflowSkipException, AirflowTaskTimeout
 from airflow.dag.base_dag import BaseDag, BaseDagBag
+from airflow.dag.graph_index import DagGraphIndex
 from airflow.ti_deps.deps.not_in_retry_period_dep import NotInRetryPeriodDep
 from airflow.ti_deps.deps.prev_dagrun_dep import PrevDagrunDep
 from airflow.ti_deps.deps.trigger_rule_dep import TriggerRuleDep
 from airflow.ti_deps.deps.task_concurrency_dep import TaskConcurrencyDep
 
 from airflow.ti_deps.dep_context import DepContext, QUEUE_DEPS, RUN_DEPS
+from airflow.utils.dag_processing import walk_ignoring
 from airflow.utils.dates import cron_presets, date_range as utils_date_range
 from airflow.utils.db import provide_session
 from airflow.utils.decorators import apply_defaults
 from airflow.utils.email import send_email
 from airflow.utils.helpers import (
-    as_tuple, is_container, is_in, validate_key, pprinttable)
+    as_tuple, is_container, validate_key, pprinttable)
 from airflow.utils.operator_resources import Resources
 from airflow.utils.state import State
 from airflow.utils.timeout import timeout
@@ -174,13 +175,19 @@ class DagBag(BaseDagBag, LoggingMixin):
     :param include_examples: whether to include the examples that ship
         with airflow or not
     :type include_examples: bool
+    :param store_serialized_dags: whether to read the DAGs stored in the
+        database by the scheduler instead of executing the DAG files, see
+        SerializedDagModel. The DAGs are then loaded on demand by get_dag(),
+        or all at once by collect_dags().
+    :type store_serialized_dags: bool
     """
 
     def __init__(
             self,
             dag_folder=None,
             executor=None,
-            include_examples=configuration.getboolean('core', 'LOAD_EXAMPLES')):
+            include_examples=configuration.getboolean('core', 'LOAD_EXAMPLES'),
+            store_serialized_dags=False):
 
         # do not use default arg in signature, to fix import cycle on plugin load
         if executor is None:
@@ -193,7 +200,11 @@ class DagBag(BaseDagBag, LoggingMixin):
         self.file_last_changed = {}
         self.executor = executor
         self.import_errors = {}
+        self.store_serialized_dags = store_serialized_dags
+        self.dagbag_stats = []
 
+        if store_serialized_dags:
+            return
         if include_examples:
             example_dag_folder = os.path.join(
                 os.path.dirname(__file__),
@@ -218,6 +229,9 @@ class DagBag(BaseDagBag, LoggingMixin):
             if dag.is_subdag:
                 root_dag_id = dag.parent_dag.dag_id
 
+        if self.store_serialized_dags:
+            return self._get_serialized_dag(dag_id)
+
         # If the dag corresponding to root_dag_id is absent or expired
         orm_dag = DagModel.get_current(root_dag_id)
         if orm_dag and (
@@ -238,6 +252,63 @@ class DagBag(BaseDagBag, LoggingMixin):
                 del self.dags[dag_id]
         return self.dags.get(dag_id)
 
+    def _get_serialized_dag(self, dag_id):
+        """
+        Gets the DAG out of the dictionary, and reads it again from the
+        database if it is absent or was stored again since it was read.
+        """
+        root_dag = self.dags.get(dag_id)
+        while root_dag is not None and root_dag.is_subdag:
+            root_dag = root_dag.parent_dag
+
+        if root_dag is not None:
+            last_updated = SerializedDagModel.get_last_updated(root_dag.dag_id)
+            if last_updated is None:
+                self._remove_dag(root_dag)
+            elif root_dag.last_loaded < last_updated:
+                self._remove_dag(root_dag)
+                row = SerializedDagModel.get(root_dag.dag_id)
+                if row is not None:
+                    self.bag_serialized_dag(row)
+        else:
+            # Subdags are stored with their root DAG, whose ID is a prefix of
+            # theirs
+            root_dag_id = dag_id
+            row = SerializedDagModel.get(root_dag_id)
+            while row is None and '.' in root_dag_id:
+                root_dag_id = root_dag_id.rsplit('.', 1)[0]
+                row = SerializedDagModel.get(root_dag_id)
+            if row is not None:
+                self.bag_serialized_dag(row)
+        return self.dags.get(dag_id)
+
+    def _remove_dag(self, dag):
+        """
+        Removes the DAG and its subdags from the bag.
+        """
+        self.dags.pop(dag.dag_id, None)
+        for subdag in dag.subdags:
+            self.dags.pop(subdag.dag_id, None)
+
+    def bag_serialized_dag(self, row):
+        """
+        Adds the DAG stored in the database into the bag, along with its
+        subdags.
+
+        :param row: the stored representation of the DAG
+        :type row: SerializedDagModel
+        """
+        try:
+            dag = row.dag
+        except Exception:
+            self.log.exception("Failed to deserialize the DAG %s", row.dag_id)
+            return
+        dag.last_loaded = row.last_updated
+        self.dags[dag.dag_id] = dag
+        for subdag in dag.subdags:
+            subdag.last_loaded = row.last_updated
+            self.dags[subdag.dag_id] = subdag
+
     def process_file(self, filepath, only_if_updated=True, safe_mode=True):
         """
         Given a path to a python module or zip file, this method imports
@@ -333,38 +404,34 @@ class DagBag(BaseDagBag, LoggingMixin):
         return found_dags
 
     @provide_session
-    def kill_zombies(self, session=None):
+    def kill_zombies(self, zombies, session=None):
         """
-        Fails tasks that haven't had a heartbeat in too long
+        Fails the zombie task instances of the DAGs in the bag, i.e. the tasks
+        that haven't had a heartbeat in too long, which are found by the
+        scheduler, see SchedulerJob.find_zombies.
+
+        :param zombies: the zombie task instances
+        :type zombies: list[SimpleTaskInstance]
         """
-        from airflow.jobs import LocalTaskJob as LJ
-        self.log.info("Finding 'running' jobs without a recent heartbeat")
         TI = TaskInstance
-        secs = configuration.getint('scheduler', 'scheduler_zombie_task_threshold')
-        limit_dttm = datetime.utcnow() - timedelta(seconds=secs)
-        self.log.info("Failing jobs without heartbeat after %s", limit_dttm)
-
-        tis = (
-            session.query(TI)
-            .join(LJ, TI.job_id == LJ.id)
-            .filter(TI.state == State.RUNNING)
-            .filter(
-                or_(
-                    LJ.state != State.RUNNING,
-                    LJ.latest_heartbeat < limit_dttm,
-                ))
-            .all()
-        )
-
-        for ti in tis:
-            if ti and ti.dag_id in self.dags:
-                dag = self.dags[ti.dag_id]
-                if ti.task_id in dag.task_ids:
-                    task = dag.get_task(ti.task_id)
-                    ti.task = task
-                    ti.handle_failure("{} killed as zombie".format(str(ti)))
-                    self.log.info('Marked zombie job %s as failed', ti)
-                    Stats.incr('zombies_killed')
+        for zombie in zombies:
+            dag = self.dags.get(zombie.dag_id)
+            if dag is None or not dag.has_task(zombie.task_id):
+                continue
+            ti = (
+                session.query(TI)
+                .filter(TI.dag_id == zombie.dag_id)
+                .filter(TI.task_id == zombie.task_id)
+                .filter(TI.execution_date == zombie.execution_date)
+                .first()
+            )
+            # The task may have finished since it was found
+            if ti is None or ti.state != State.RUNNING:
+                continue
+            ti.task = dag.get_task(ti.task_id)
+            ti.handle_failure("{} killed as zombie".format(str(ti)))
+            self.log.info('Marked zombie job %s as failed', ti)
+            Stats.incr('zombies_killed')
         session.commit()
 
     def bag_dag(self, dag, parent_dag, root_dag):
@@ -395,8 +462,8 @@ class DagBag(BaseDagBag, LoggingMixin):
 
         Note that if a .airflowignore file is found while processing,
         the directory, it will behaves much like a .gitignore does,
-        ignoring files that match any of the regex patterns specified
-        in the file.
+        ignoring files and directories that match any of the regex patterns
+        specified in the file, in its directory and the ones below it.
         """
         start_dttm = datetime.utcnow()
         dag_folder = dag_folder or self.dag_folder
@@ -405,41 +472,36 @@ class DagBag(BaseDagBag, LoggingMixin):
         stats = []
         FileLoadStat = namedtuple(
             'FileLoadStat', "file duration dag_num task_num dags")
-        if os.path.isfile(dag_folder):
+        if self.store_serialized_dags:
+            self.dags = {}
+            for row in SerializedDagModel.get_all():
+                self.bag_serialized_dag(row)
+        elif os.path.isfile(dag_folder):
             self.process_file(dag_folder, only_if_updated=only_if_updated)
         elif os.path.isdir(dag_folder):
-            patterns = []
-            for root, dirs, files in os.walk(dag_folder, followlinks=True):
-                ignore_file = [f for f in files if f == '.airflowignore']
-                if ignore_file:
-                    f = open(os.path.join(root, ignore_file[0]), 'r')
-                    patterns += [p for p in f.read().split('\n') if p]
-                    f.close()
-                for f in files:
+            for root, patterns, filepaths in walk_ignoring(dag_folder):
+                for filepath in filepaths:
                     try:
-                        filepath = os.path.join(root, f)
                         if not os.path.isfile(filepath):
                             continue
                         mod_name, file_ext = os.path.splitext(
                             os.path.split(filepath)[-1])
                         if file_ext != '.py' and not zipfile.is_zipfile(filepath):
                             continue
-                        if not any(
-                                [re.findall(p, filepath) for p in patterns]):
-                            ts = datetime.utcnow()
-                            found_dags = self.process_file(
-                                filepath, only_if_updated=only_if_updated)
-
-                            td = datetime.utcnow() - ts
-                            td = td.total_seconds() + (
-                                float(td.microseconds) / 1000000)
-                            stats.append(FileLoadStat(
-                                filepath.replace(dag_folder, ''),
-                                td,
-                                len(found_dags),
-                                sum([len(dag.tasks) for dag in found_dags]),
-                                str([dag.dag_id for dag in found_dags]),
-                            ))
+                        ts = datetime.utcnow()
+                        found_dags = self.process_file(
+                            filepath, only_if_updated=only_if_updated)
+
+                        td = datetime.utcnow() - ts
+                        td = td.total_seconds() + (
+                            float(td.microseconds) / 1000000)
+                        stats.append(FileLoadStat(
+                            filepath.replace(dag_folder, ''),
+                            td,
+                            len(found_dags),
+                            sum([len(dag.tasks) for dag in found_dags]),
+                            str([dag.dag_id for dag in found_dags]),
+                        ))
                     except Exception as e:
                         self.log.warning(e)
         Stats.gauge(
@@ -1057,6 +1119,9 @@ class TaskInstance(Base, LoggingMixin):
             ti = qry.with_for_update().first()
         else:
             ti = qry.first()
+        self._refresh_from_ti(ti)
+
+    def _refresh_from_ti(self, ti):
         if ti:
             self.state = ti.state
             self.start_date = ti.start_date
@@ -1070,6 +1135,40 @@ class TaskInstance(Base, LoggingMixin):
         else:
             self.state = None
 
+    @staticmethod
+    @provide_session
+    def refresh_many_from_db(task_instances, max_tis_per_query=None, session=None):
+        """
+        Refreshes task instances from the database like refresh_from_db, with
+        a single query for all of them, or one query per max_tis_per_query of
+        them
+
+        :param task_instances: the task instances to refresh
+        :type task_instances: list[TaskInstance]
+        :param max_tis_per_query: the maximum number of task instances to
+            query at once, 0 for no limit. Defaults to the
+            scheduler.max_tis_per_query setting.
+        :type max_tis_per_query: int
+        """
+        if not task_instances:
+            return
+        if max_tis_per_query is None:
+            max_tis_per_query = configuration.getint('scheduler', 'max_tis_per_query')
+        if max_tis_per_query == 0:
+            max_tis_per_query = len(task_instances)
+
+        TI = TaskInstance
+        tis_by_key = {}
+        for i in range(0, len(task_instances), max_tis_per_query):
+            filter_for_tis = ([and_(TI.dag_id == ti.dag_id,
+                                    TI.task_id == ti.task_id,
+                                    TI.execution_date == ti.execution_date)
+                               for ti in task_instances[i:i + max_tis_per_query]])
+            tis_by_key.update((ti.key, ti) for ti in
+                              session.query(TI).filter(or_(*filter_for_tis)))
+        for ti in task_instances:
+            ti._refresh_from_ti(tis_by_key.get(ti.key))
+
     @provide_session
     def clear_xcom_data(self, session=None):
         """
@@ -2213,9 +2312,12 @@ class BaseOperator(LoggingMixin):
         self.run_as_user = run_as_user
         self.task_concurrency = task_concurrency
 
-        # Private attributes
+        # Private attributes. The IDs of the relatives are kept in the order
+        # the dependencies were set, along with sets for the lookups.
         self._upstream_task_ids = []
         self._downstream_task_ids = []
+        self._upstream_task_id_set = set()
+        self._downstream_task_id_set = set()
 
         if not dag and _CONTEXT_MANAGER_DAG:
             dag = _CONTEXT_MANAGER_DAG
@@ -2385,10 +2487,9 @@ class BaseOperator(LoggingMixin):
 
     @property
     def priority_weight_total(self):
-        return sum([
-            t.priority_weight
-            for t in self.get_flat_relatives(upstream=False)
-        ]) + self.priority_weight
+        if not self._downstream_task_ids:
+            return self.priority_weight
+        return self.dag.graph_index.priority_weight_total(self.task_id)
 
     def pre_execute(self, context):
         """
@@ -2509,7 +2610,10 @@ class BaseOperator(LoggingMixin):
     @property
     def upstream_list(self):
         """@property: list of tasks directly upstream"""
-        return [self.dag.get_task(tid) for tid in self._upstream_task_ids]
+        if not self._upstream_task_ids:
+            return []
+        return list(self.dag.graph_index.get_direct_relatives(
+            self.task_id, upstream=True))
 
     @property
     def upstream_task_ids(self):
@@ -2518,7 +2622,10 @@ class BaseOperator(LoggingMixin):
     @property
     def downstream_list(self):
         """@property: list of tasks directly downstream"""
-        return [self.dag.get_task(tid) for tid in self._downstream_task_ids]
+        if not self._downstream_task_ids:
+            return []
+        return list(self.dag.graph_index.get_direct_relatives(
+            self.task_id, upstream=False))
 
     @property
     def downstream_task_ids(self):
@@ -2573,17 +2680,16 @@ class BaseOperator(LoggingMixin):
             TI.execution_date <= end_date,
         ).order_by(TI.execution_date).all()
 
-    def get_flat_relatives(self, upstream=False, l=None):
+    def get_flat_relatives(self, upstream=False):
         """
         Get a flat list of relatives, either upstream or downstream.
         """
-        if not l:
-            l = []
-        for t in self.get_direct_relatives(upstream):
-            if not is_in(t, l):
-                l.append(t)
-                t.get_flat_relatives(upstream, l)
-        return l
+        relative_ids = self._upstream_task_ids if upstream else self._downstream_task_ids
+        if not relative_ids:
+            return []
+        index = self.dag.graph_index
+        return [index.task_dict[tid]
+                for tid in index.get_flat_relative_ids(self.task_id, upstream)]
 
     def detect_downstream_cycle(self, task=None):
         """
@@ -2593,12 +2699,22 @@ class BaseOperator(LoggingMixin):
         """
         if not task:
             task = self
-        for t in self.get_direct_relatives():
-            if task is t:
+        # Not using downstream_list, as the graph index is outdated while
+        # dependencies are being set. Each task is visited once, so that DAGs
+        # with many paths between two tasks are walked in linear time.
+        task_dict = self.dag.task_dict
+        visited = set()
+        stack = list(self._downstream_task_ids)
+        while stack:
+            task_id = stack.pop()
+            if task_id == task.task_id:
                 msg = "Cycle detected in DAG. Faulty task: {0}".format(task)
                 raise AirflowException(msg)
-            else:
-                t.detect_downstream_cycle(task=task)
+            if task_id not in visited:
+                visited.add(task_id)
+                t = task_dict.get(task_id)
+                if t is not None:
+                    stack.extend(t._downstream_task_ids)
         return False
 
     def run(
@@ -2647,13 +2763,17 @@ class BaseOperator(LoggingMixin):
     def task_type(self):
         return self.__class__.__name__
 
-    def append_only_new(self, l, item):
-        if any([item is t for t in l]):
+    def _add_relative_id(self, task_id, upstream):
+        if upstream:
+            task_ids, task_id_set = self._upstream_task_ids, self._upstream_task_id_set
+        else:
+            task_ids, task_id_set = self._downstream_task_ids, self._downstream_task_id_set
+        if task_id in task_id_set:
             raise AirflowException(
-                'Dependency {self}, {item} already registered'
+                'Dependency {self}, {task_id} already registered'
                 ''.format(**locals()))
-        else:
-            l.append(item)
+        task_ids.append(task_id)
+        task_id_set.add(task_id)
 
     def _set_relatives(self, task_or_task_list, upstream=False):
         try:
@@ -2669,14 +2789,15 @@ class BaseOperator(LoggingMixin):
 
         # relationships can only be set if the tasks share a single DAG. Tasks
         # without a DAG are assigned to that DAG.
-        dags = set(t.dag for t in [self] + task_list if t.has_dag())
+        # Keyed by id() as hashing a DAG hashes the IDs of all its tasks
+        dags = {id(t.dag): t.dag for t in [self] + task_list if t.has_dag()}
 
         if len(dags) > 1:
             raise AirflowException(
                 'Tried to set relationships between tasks in '
-                'more than one DAG: {}'.format(dags))
+                'more than one DAG: {}'.format(list(dags.values())))
         elif len(dags) == 1:
-            dag = list(dags)[0]
+            dag = list(dags.values())[0]
         else:
             raise AirflowException(
                 "Tried to create relationships between tasks that don't have "
@@ -2686,16 +2807,18 @@ class BaseOperator(LoggingMixin):
         if dag and not self.has_dag():
             self.dag = dag
 
+        dag._graph_index = None
         for task in task_list:
             if dag and not task.has_dag():
                 task.dag = dag
             if upstream:
-                task.append_only_new(task._downstream_task_ids, self.task_id)
-                self.append_only_new(self._upstream_task_ids, task.task_id)
+                task._add_relative_id(self.task_id, upstream=False)
+                self._add_relative_id(task.task_id, upstream=True)
             else:
-                self.append_only_new(self._downstream_task_ids, task.task_id)
-                task.append_only_new(task._upstream_task_ids, self.task_id)
+                self._add_relative_id(task.task_id, upstream=False)
+                task._add_relative_id(self.task_id, upstream=True)
 
+        # Any cycle created by the new dependencies goes through self
         self.detect_downstream_cycle()
 
     def set_downstream(self, task_or_task_list):
@@ -2932,6 +3055,8 @@ class DAG(BaseDag, LoggingMixin):
         self.is_subdag = False  # DagBag.bag_dag() will set this to True if appropriate
 
         self.partial = False
+        # Built on demand, see graph_index
+        self._graph_index = None
 
         self._comps = {
             'dag_id',
@@ -3260,7 +3385,10 @@ class DAG(BaseDag, LoggingMixin):
         for task in self.tasks:
             if (isinstance(task, SubDagOperator) or
                 #TODO remove in Airflow 2.0
-                type(task).__name__ == 'SubDagOperator'):
+                type(task).__name__ == 'SubDagOperator' or
+                # SubDagOperators of deserialized DAGs
+                (type(task).__name__ == 'SerializedBaseOperator' and
+                 task.subdag is not None)):
                 l.append(task.subdag)
                 l += task.subdag.subdags
         return l
@@ -3319,56 +3447,40 @@ class DAG(BaseDag, LoggingMixin):
     def roots(self):
         return [t for t in self.tasks if not t.downstream_list]
 
+    @property
+    def graph_index(self):
+        """
+        The DagGraphIndex of the dependencies between the tasks, built on
+        demand and dropped whenever tasks or dependencies are added.
+
+        Note that the priority weights are cached in the index, changing the
+        priority_weight of a task afterwards requires to reset _graph_index.
+        """
+        # DAGs pickled before the index existed don't have the attribute
+        if getattr(self, '_graph_index', None) is None:
+            self._graph_index = DagGraphIndex(self.dag_id, self.task_dict)
+        return self._graph_index
+
     def topological_sort(self):
         """
         Sorts tasks in topographical order, such that a task comes after any of its
         upstream dependencies.
 
-        Heavily inspired by:
-        http://blog.jupo.org/2012/04/06/topological-sorting-acyclic-directed-graphs/
+        The order is computed with Kahn's algorithm, and cached until tasks or
+        dependencies are added, see graph_index.
 
         :return: list of tasks in topological order
         """
+        return self.graph_index.sorted_tasks
 
-        # copy the the tasks so we leave it unmodified
-        graph_unsorted = self.tasks[:]
-
-        graph_sorted = []
-
-        # special case
-        if len(self.tasks) == 0:
-            return tuple(graph_sorted)
-
-        # Run until the unsorted graph is empty.
-        while graph_unsorted:
-            # Go through each of the node/edges pairs in the unsorted
-            # graph. If a set of edges doesn't contain any nodes that
-            # haven't been resolved, that is, that are still in the
-            # unsorted graph, remove the pair from the unsorted graph,
-            # and append it to the sorted graph. Note here that by using
-            # using the items() method for iterating, a copy of the
-            # unsorted graph is used, allowing us to modify the unsorted
-            # graph as we move through it. We also keep a flag for
-            # checking that that graph is acyclic, which is true if any
-            # nodes are resolved during each pass through the graph. If
-            # not, we need to bail out as the graph therefore can't be
-            # sorted.
-            acyclic = False
-            for node in list(graph_unsorted):
-                for edge in node.upstream_list:
-                    if edge in graph_unsorted:
-                        break
-                # no edges in upstream tasks
-                else:
-                    acyclic = True
-                    graph_unsorted.remove(node)
-                    graph_sorted.append(node)
-
-            if not acyclic:
-                raise AirflowException("A cyclic dependency occurred in dag: {}"
-                                       .format(self.dag_id))
+    def topological_waves(self):
+        """
+        Groups the tasks in waves, such that the tasks of a wave only depend on
+        tasks of the previous waves and not on each other.
 
-        return tuple(graph_sorted)
+        :return: the waves, each one a list of tasks
+        """
+        return self.graph_index.waves
 
     @provide_session
     def set_dag_runs_state(
@@ -3541,9 +3653,13 @@ class DAG(BaseDag, LoggingMixin):
             # Removing upstream/downstream references to tasks that did not
             # made the cut
             t._upstream_task_ids = [
-                tid for tid in t._upstream_task_ids if tid in dag.task_ids]
+                tid for tid in t._upstream_task_ids if tid in dag.task_dict]
             t._downstream_task_ids = [
-                tid for tid in t._downstream_task_ids if tid in dag.task_ids]
+                tid for tid in t._downstream_task_ids if tid in dag.task_dict]
+            t._upstream_task_id_set = set(t._upstream_task_ids)
+            t._downstream_task_id_set = set(t._downstream_task_ids)
+
+        dag._graph_index = None
 
         if len(dag.tasks) < len(self.tasks):
             dag.partial = True
@@ -3628,6 +3744,7 @@ class DAG(BaseDag, LoggingMixin):
         elif task.end_date and self.end_date:
             task.end_date = min(task.end_date, self.end_date)
 
+        self._graph_index = None
         if task.task_id in self.task_dict:
             # TODO: raise an error in Airflow 2.0
             warnings.warn(
@@ -3768,9 +3885,6 @@ class DAG(BaseDag, LoggingMixin):
             state=state
         )
         session.add(run)
-
-        DagStat.set_dirty(dag_id=self.dag_id, session=session)
-
         session.commit()
 
         run.dag = self
@@ -4250,6 +4364,16 @@ class XCom(Base, LoggingMixin):
 
 
 class DagStat(Base):
+    """
+    Number of DagRuns of each DAG in each state, for the home page of the
+    webserver.
+
+    The counts are kept up to date as DagRuns are inserted, change state or
+    are deleted through the ORM, by adding the difference to the count of the
+    state in the same transaction, see apply_delta. The DAGs whose DagRuns
+    are changed in bulk are marked dirty instead, and their counts are
+    computed again from the DagRuns by update.
+    """
     __tablename__ = "dag_stats"
 
     dag_id = Column(String(ID_LEN), primary_key=True)
@@ -4263,6 +4387,24 @@ class DagStat(Base):
         self.count = count
         self.dirty = dirty
 
+    @staticmethod
+    def apply_delta(connection, dag_id, state, delta):
+        """
+        Adds delta to the count of DagRuns of the DAG in the state, with a
+        single UPDATE so that no lock is held beyond the row being updated.
+        The missing rows are created by update.
+
+        :param connection: the connection of the current transaction
+        :type connection: sqlalchemy.engine.Connection
+        """
+        if dag_id is None or state not in State.dag_states:
+            return
+        table = DagStat.__table__
+        connection.execute(
+            table.update()
+            .where(and_(table.c.dag_id == dag_id, table.c.state == state))
+            .values(count=table.c.count + delta))
+
     @staticmethod
     @provide_session
     def set_dirty(dag_id, session=None):
@@ -4271,16 +4413,17 @@ class DagStat(Base):
         :param session: database session
         :return:
         """
-        DagStat.create(dag_id=dag_id, session=session)
-
         try:
-            stats = session.query(DagStat).filter(
+            updated = session.query(DagStat).filter(
                 DagStat.dag_id == dag_id
-            ).with_for_update().all()
-
-            for stat in stats:
-                stat.dirty = True
+            ).update({DagStat.dirty: True}, synchronize_session=False)
             session.commit()
+            if not updated:
+                DagStat.create(dag_id=dag_id, session=session)
+                session.query(DagStat).filter(
+                    DagStat.dag_id == dag_id
+                ).update({DagStat.dirty: True}, synchronize_session=False)
+                session.commit()
         except Exception as e:
             session.rollback()
             log = LoggingMixin().log
@@ -4291,7 +4434,10 @@ class DagStat(Base):
     @provide_session
     def update(dag_ids=None, dirty_only=True, session=None):
         """
-        Updates the stats for dirty/out-of-sync dags
+        Updates the stats for dirty/out-of-sync dags, i.e. the dags marked
+        dirty and the given dags that have no stats yet. The counts are
+        computed by the database within a single UPDATE, without locking the
+        stats of the other dags.
 
         :param dag_ids: dag_ids to be updated
         :type dag_ids: list
@@ -4301,38 +4447,45 @@ class DagStat(Base):
         :type session: Session
         """
         try:
-            qry = session.query(DagStat)
+            ids = set()
             if dag_ids:
-                qry = qry.filter(DagStat.dag_id.in_(set(dag_ids)))
-            if dirty_only:
-                qry = qry.filter(DagStat.dirty == True)
-
-            qry = qry.with_for_update().all()
-
-            ids = set([dag_stat.dag_id for dag_stat in qry])
+                dag_ids = set(dag_ids)
+                existing_ids = set(
+                    dag_id for dag_id, in
+                    session.query(DagStat.dag_id)
+                    .filter(DagStat.dag_id.in_(dag_ids))
+                    .distinct())
+                for dag_id in dag_ids - existing_ids:
+                    DagStat.create(dag_id=dag_id, session=session)
+                ids = dag_ids - existing_ids
+
+            if dirty_only or not dag_ids:
+                qry = session.query(DagStat.dag_id).filter(DagStat.dirty == True)
+                if dag_ids:
+                    qry = qry.filter(DagStat.dag_id.in_(dag_ids))
+                elif not dirty_only:
+                    qry = session.query(DagStat.dag_id)
+                ids.update(dag_id for dag_id, in qry.distinct())
+            else:
+                ids.update(dag_ids)
 
             # avoid querying with an empty IN clause
             if len(ids) == 0:
                 session.commit()
                 return
 
-            dagstat_states = set(itertools.product(ids, State.dag_states))
-            qry = (
-                session.query(DagRun.dag_id, DagRun.state, func.count('*'))
-                .filter(DagRun.dag_id.in_(ids))
-                .group_by(DagRun.dag_id, DagRun.state)
+            stats = DagStat.__table__
+            runs = DagRun.__table__
+            count = (
+                select([func.count(runs.c.id)])
+                .where(and_(runs.c.dag_id == stats.c.dag_id,
+                            runs.c.state == stats.c.state))
+                .as_scalar()
             )
-
-            counts = {(dag_id, state): count for dag_id, state, count in qry}
-            for dag_id, state in dagstat_states:
-                count = 0
-                if (dag_id, state) in counts:
-                    count = counts[(dag_id, state)]
-
-                session.merge(
-                    DagStat(dag_id=dag_id, state=state, count=count, dirty=False)
-                )
-
+            session.execute(
+                stats.update()
+                .where(stats.c.dag_id.in_(ids))
+                .values(count=count, dirty=False))
             session.commit()
         except Exception as e:
             session.rollback()
@@ -4384,6 +4537,7 @@ class DagRun(Base, LoggingMixin):
     run_id = Column(String(ID_LEN))
     external_trigger = Column(Boolean, default=True)
     conf = Column(PickleType)
+    task_states_signature = Column(String(32))
 
     dag = None
 
@@ -4407,11 +4561,9 @@ class DagRun(Base, LoggingMixin):
     def set_state(self, state):
         if self._state != state:
             self._state = state
-            if self.dag_id is not None:
-                # something really weird goes on here: if you try to close the session
-                # dag runs will end up detached
-                session = settings.Session()
-                DagStat.set_dirty(self.dag_id, session=session)
+            # The state of the run has to be updated again, even if its task
+            # instances don't change
+            self.task_states_signature = None
 
     @declared_attr
     def state(self):
@@ -4518,6 +4670,56 @@ class DagRun(Base, LoggingMixin):
 
         return tis.all()
 
+    @staticmethod
+    @provide_session
+    def get_task_states_signatures(dag, dag_runs, session=None):
+        """
+        Returns a signature of the states of the task instances of each of the
+        given DagRuns, computed with a single grouped query. The signature
+        changes whenever a task instance of the run changes state, starts or
+        ends, or when the structure of the DAG changes, so a DagRun whose signature
+        is the same as when its state was last updated doesn't need to be
+        updated again.
+
+        :param dag: the DAG the DagRuns belong to
+        :type dag: DAG
+        :param dag_runs: the DagRuns to compute the signatures of
+        :type dag_runs: list[DagRun]
+        :return: a map from execution date to signature
+        :rtype: dict[datetime, unicode]
+        """
+        if not dag_runs:
+            return {}
+
+        TI = TaskInstance
+        qry = (
+            session
+            .query(TI.execution_date, TI.state, func.count('*'),
+                   func.max(TI.start_date), func.max(TI.end_date))
+            .filter(
+                TI.dag_id == dag.dag_id,
+                TI.execution_date.in_([dr.execution_date for dr in dag_runs]))
+            .group_by(TI.execution_date, TI.state)
+        )
+        state_counts = defaultdict(list)
+        for execution_date, state, count, start_date, end_date in qry:
+            state_counts[execution_date].append(
+                (str(state), count, str(start_date), str(end_date)))
+
+        # The outcome of updating the state also depends on the structure of
+        # the DAG
+        dag_structure = repr(sorted(
+            (t.task_id, t.trigger_rule, t.depends_on_past, t.task_concurrency,
+             sorted(t.upstream_task_ids))
+            for t in dag.tasks)).encode('utf-8')
+        signatures = {}
+        for dr in dag_runs:
+            signature = hashlib.md5(dag_structure)
+            signature.update(
+                repr(sorted(state_counts[dr.execution_date])).encode('utf-8'))
+            signatures[dr.execution_date] = signature.hexdigest()
+        return signatures
+
     @provide_session
     def get_task_instance(self, task_id, session=None):
         """
@@ -4590,29 +4792,27 @@ class DagRun(Base, LoggingMixin):
             else:
                 ti.task = dag.get_task(ti.task_id)
 
-        # pre-calculate
-        # db is faster
         start_dttm = datetime.utcnow()
-        unfinished_tasks = self.get_task_instances(
-            state=State.unfinished(),
-            session=session
-        )
+        unfinished_tasks = [t for t in tis if t.state in State.unfinished()]
         none_depends_on_past = all(not t.task.depends_on_past for t in unfinished_tasks)
         none_task_concurrency = all(t.task.task_concurrency is None for t in unfinished_tasks)
         # small speed up
         if unfinished_tasks and none_depends_on_past and none_task_concurrency:
-            # todo: this can actually get pretty slow: one task costs between 0.01-015s
+            # The upstream states are computed from the task instances loaded
+            # above, so checking the trigger rules does not hit the database
+            dep_context = DepContext(
+                flag_upstream_failed=True,
+                ignore_in_retry_period=True,
+                dag_run_tis=tis)
             no_dependencies_met = True
             for ut in unfinished_tasks:
                 # We need to flag upstream and check for changes because upstream
                 # failures can result in deadlock false positives
                 old_state = ut.state
                 deps_met = ut.are_dependencies_met(
-                    dep_context=DepContext(
-                        flag_upstream_failed=True,
-                        ignore_in_retry_period=True),
+                    dep_context=dep_context,
                     session=session)
-                if deps_met or old_state != ut.current_state(session=session):
+                if deps_met or old_state != ut.state:
                     no_dependencies_met = False
                     break
 
@@ -4729,6 +4929,37 @@ class DagRun(Base, LoggingMixin):
         return dagruns
 
 
+@event.listens_for(DagRun, 'after_insert')
+def _count_inserted_dag_run(mapper, connection, target):
+    DagStat.apply_delta(connection, target.dag_id, target._state, 1)
+
+
+@event.listens_for(DagRun, 'after_update')
+def _count_updated_dag_run(mapper, connection, target):
+    history = attributes.get_history(target, '_state')
+    if not history.added:
+        return
+    if not history.deleted:
+        # The previous state wasn't loaded, so the counts are recomputed
+        stats = DagStat.__table__
+        connection.execute(
+            stats.update()
+            .where(stats.c.dag_id == target.dag_id)
+            .values(dirty=True))
+        return
+    old_state, new_state = history.deleted[0], history.added[0]
+    if old_state != new_state:
+        DagStat.apply_delta(connection, target.dag_id, old_state, -1)
+        DagStat.apply_delta(connection, target.dag_id, new_state, 1)
+
+
+@event.listens_for(DagRun, 'after_delete')
+def _count_deleted_dag_run(mapper, connection, target):
+    history = attributes.get_history(target, '_state')
+    state = history.deleted[0] if history.deleted else target._state
+    DagStat.apply_delta(connection, target.dag_id, state, -1)
+
+
 class Pool(Base):
     __tablename__ = "slot_pool"
 
@@ -4780,9 +5011,14 @@ class Pool(Base):
         """
         Returns the number of slots open at the moment
         """
-        used_slots = self.used_slots(session=session)
-        queued_slots = self.queued_slots(session=session)
-        return self.slots - used_slots - queued_slots
+        used_and_queued_slots = (
+            session
+            .query(TaskInstance)
+            .filter(TaskInstance.pool == self.pool)
+            .filter(TaskInstance.state.in_([State.RUNNING, State.QUEUED]))
+            .count()
+        )
+        return self.slots - used_and_queued_slots
 
 
 class SlaMiss(Base):
@@ -4812,3 +5048,163 @@ class ImportError(Base):
     timestamp = Column(DateTime)
     filename = Column(String(1024))
     stacktrace = Column(Text)
+
+
+class SerializedDagModel(Base):
+    """
+    JSON-serialized representation of a DAG, stored by the scheduler when it
+    processes the DAG file, so that the webserver and the API can load the DAG
+    without executing the file. The subdags are stored along with their root
+    DAG. See airflow.dag.serialization.
+    """
+    __tablename__ = "serialized_dag"
+
+    dag_id = Column(String(ID_LEN), primary_key=True)
+    # The DAG file the DAG was found in
+    fileloc = Column(String(2000), nullable=False)
+    data = Column(LongText, nullable=False)
+    # SHA-1 of data, to skip the writes when the DAG didn't change
+    dag_hash = Column(String(40), nullable=False)
+    last_updated = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return "<SerializedDag: {self.dag_id}>".format(self=self)
+
+    @property
+    def dag(self):
+        """
+        :return: the deserialized DAG, whose tasks are SerializedBaseOperators
+        :rtype: DAG
+        """
+        from airflow.dag.serialization import deserialize_dag
+        return deserialize_dag(json.loads(self.data))
+
+    @classmethod
+    @provide_session
+    def write_dag(cls, dag, session=None):
+        """
+        Stores the serialized representation of a DAG and of its subdags.
+
+        :param dag: the root DAG to store
+        :type dag: DAG
+        :return: whether the stored representation changed
+        :rtype: bool
+        """
+        from airflow.dag.serialization import serialize_dag
+        data = json.dumps(serialize_dag(dag), sort_keys=True)
+        dag_hash = hashlib.sha1(data.encode('utf-8')).hexdigest()
+        stored = (
+            session.query(cls.dag_hash, cls.fileloc)
+            .filter(cls.dag_id == dag.dag_id)
+            .first())
+        if stored == (dag_hash, dag.full_filepath):
+            return False
+        session.merge(cls(
+            dag_id=dag.dag_id,
+            fileloc=dag.full_filepath,
+            data=data,
+            dag_hash=dag_hash,
+            last_updated=datetime.utcnow()))
+        session.commit()
+        return True
+
+    @classmethod
+    @provide_session
+    def get(cls, dag_id, session=None):
+        """
+        :return: the stored representation of a root DAG, or None
+        :rtype: SerializedDagModel
+        """
+        return session.query(cls).filter(cls.dag_id == dag_id).first()
+
+    @classmethod
+    @provide_session
+    def get_all(cls, session=None):
+        """
+        :return: the stored representations of all the root DAGs
+        :rtype: list[SerializedDagModel]
+        """
+        return session.query(cls).all()
+
+    @classmethod
+    @provide_session
+    def get_last_updated(cls, dag_id, session=None):
+        """
+        :return: when the representation of a root DAG was last stored, or
+            None if it isn't stored
+        :rtype: datetime
+        """
+        return (
+            session.query(cls.last_updated)
+            .filter(cls.dag_id == dag_id)
+            .scalar())
+
+    @classmethod
+    @provide_session
+    def remove_stale_dags(cls, fileloc, alive_dag_ids, session=None):
+        """
+        Removes the DAGs that are no longer defined in a DAG file.
+
+        :param fileloc: the DAG file
+        :type fileloc: unicode
+        :param alive_dag_ids: the IDs of the root DAGs still in the file
+        :type alive_dag_ids: list[unicode]
+        """
+        query = session.query(cls).filter(cls.fileloc == fileloc)
+        if alive_dag_ids:
+            query = query.filter(~cls.dag_id.in_(alive_dag_ids))
+        query.delete(synchronize_session=False)
+        session.commit()
+
+    @classmethod
+    @provide_session
+    def remove_deleted_dags(cls, dag_folder, alive_dag_filelocs, chunk_size=500,
+                            session=None):
+        """
+        Removes the DAGs of the DAG files that no longer exist.
+
+        :param dag_folder: the folder containing the DAG files
+        :type dag_folder: unicode
+        :param alive_dag_filelocs: the existing DAG files in the folder
+        :type alive_dag_filelocs: list[unicode]
+        :param chunk_size: the number of DAG files to delete the DAGs of with
+            each query
+        :type chunk_size: int
+        """
+        # The stored files are compared here rather than in the database, so
+        # that the query does not list every file of the folder
+        stored_filelocs = (
+            session
+            .query(cls.fileloc)
+            .filter(cls.fileloc.startswith(dag_folder))
+            .distinct()
+            .all())
+        deleted_filelocs = sorted(set(fileloc for fileloc, in stored_filelocs) -
+                                  set(alive_dag_filelocs))
+        for i in range(0, len(deleted_filelocs), chunk_size):
+            (session
+             .query(cls)
+             .filter(cls.fileloc.in_(deleted_filelocs[i:i + chunk_size]))
+             .delete(synchronize_session=False))
+        session.commit()
+
+
+class SchedulerShardLease(Base):
+    """
+    Lease of a shard of the DAG files by a scheduler, when several schedulers
+    run at the same time, see airflow.utils.scheduler_shards. A shard is
+    free when it has no owner or when its owner stopped renewing the lease.
+    """
+    __tablename__ = "scheduler_shard_lease"
+
+    shard_id = Column(Integer, primary_key=True, autoincrement=False)
+    # The ID of the SchedulerJob that owns the shard
+    scheduler_id = Column(Integer)
+    hostname = Column(String(500))
+    acquired_at = Column(DateTime)
+    # None once the owner released the shard
+    latest_heartbeat = Column(DateTime)
+
+    def __repr__(self):
+        return "<SchedulerShardLease: shard {} owned by {}>".format(
+            self.shard_id, self.scheduler_id)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import errno
+import getpass
+import os
+import signal
+import sys
+import threading
+
+import psutil
+
+from airflow.task_runner.base_task_runner import BaseTaskRunner
+from airflow.utils.db import configure_orm_after_fork
+from airflow.utils.helpers import kill_process_tree
+
+
+class ForkTaskRunner(BaseTaskRunner):
+    """
+    Runs the raw Airflow task in a process forked from the LocalTaskJob,
+    which already imported airflow and loaded the DAG, instead of a new
+    interpreter started through the Bash shell.
+
+    The forked process runs the same `airflow run --raw` command as the
+    BashTaskRunner, in-process, and its output is logged the same way.
+    Tasks that run as another user still go through the Bash shell, as
+    they need sudo.
+    """
+    def __init__(self, local_task_job):
+        super(ForkTaskRunner, self).__init__(local_task_job)
+        self._dag = self._task_instance.task.dag
+        self._return_code = None
+        self._forked = False
+
+    def start(self):
+        if self.run_as_user and (self.run_as_user != getpass.getuser()):
+            self.process = self.run_command(['bash', '-c'], join_args=True)
+            return
+
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(write_fd)
+            self.log.info('Running in process %s: %s', pid, self._command)
+            self.process = psutil.Process(pid)
+            self._forked = True
+            log_reader = threading.Thread(
+                target=self._read_task_logs,
+                args=(os.fdopen(read_fd, 'r'),),
+            )
+            log_reader.daemon = True
+            log_reader.start()
+            return
+
+        ret = 1
+        try:
+            os.close(read_fd)
+            os.dup2(write_fd, 1)
+            os.dup2(write_fd, 2)
+            os.close(write_fd)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            configure_orm_after_fork()
+
+            # Imported here as airflow.bin.cli depends on the task runners
+            from airflow.bin.cli import CLIFactory
+            args = CLIFactory.get_parser().parse_args(self._command[1:])
+            args.func(args, dag=self._dag)
+            ret = 0
+        except Exception:
+            self.log.exception("Failed to run %s", self._command)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(ret)
+
+    def return_code(self):
+        if not self._forked:
+            return self.process.poll()
+        if self._return_code is None:
+            try:
+                pid, status = os.waitpid(self.process.pid, os.WNOHANG)
+            except OSError as e:
+                if e.errno != errno.ECHILD:
+                    raise
+                # Already reaped by terminate, after being sent SIGTERM
+                self._return_code = -signal.SIGTERM
+            else:
+                if pid:
+                    if os.WIFSIGNALED(status):
+                        self._return_code = -os.WTERMSIG(status)
+                    else:
+                        self._return_code = os.WEXITSTATUS(status)
+        return self._return_code
+
+    def terminate(self):
+        if self._forked and self.return_code() is not None:
+            return
+        if self.process and psutil.pid_exists(self.process.pid):
+            kill_process_tree(self.log, self.process.pid)
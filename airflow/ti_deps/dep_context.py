@@ -57,6 +57,10 @@ class DepContext(object):
     :type ignore_task_deps: boolean
     :param ignore_ti_state: Ignore the task instance's previous failure/success
     :type ignore_ti_state: boolean
+    :param dag_run_tis: All the task instances of the DagRun the evaluated task
+        instances belong to. When given, upstream states are computed from these in
+        memory instead of being queried from the database for every task instance.
+    :type dag_run_tis: list(TaskInstance)
     """
     def __init__(
             self,
@@ -66,7 +70,8 @@ class DepContext(object):
             ignore_depends_on_past=False,
             ignore_in_retry_period=False,
             ignore_task_deps=False,
-            ignore_ti_state=False):
+            ignore_ti_state=False,
+            dag_run_tis=None):
         self.deps = deps or set()
         self.flag_upstream_failed = flag_upstream_failed
         self.ignore_all_deps = ignore_all_deps
@@ -74,6 +79,9 @@ class DepContext(object):
         self.ignore_in_retry_period = ignore_in_retry_period
         self.ignore_task_deps = ignore_task_deps
         self.ignore_ti_state = ignore_ti_state
+        self.dag_run_tis = None
+        if dag_run_tis is not None:
+            self.dag_run_tis = {ti.task_id: ti for ti in dag_run_tis}
 
 # In order to be able to get queued a task must have one of these states
 QUEUEABLE_STATES = {
@@ -11,6 +11,8 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from collections import Counter
+
 from sqlalchemy import case, func
 
 import airflow
@@ -43,33 +45,34 @@ class TriggerRuleDep(BaseTIDep):
             yield self._passing_status(reason="The task had a dummy trigger rule set.")
             return
 
-        # TODO(unknown): this query becomes quite expensive with dags that have many
-        # tasks. It should be refactored to let the task report to the dag run and get the
-        # aggregates from there.
-        qry = (
-            session
-            .query(
-                func.coalesce(func.sum(
-                    case([(TI.state == State.SUCCESS, 1)], else_=0)), 0),
-                func.coalesce(func.sum(
-                    case([(TI.state == State.SKIPPED, 1)], else_=0)), 0),
-                func.coalesce(func.sum(
-                    case([(TI.state == State.FAILED, 1)], else_=0)), 0),
-                func.coalesce(func.sum(
-                    case([(TI.state == State.UPSTREAM_FAILED, 1)], else_=0)), 0),
-                func.count(TI.task_id),
-            )
-            .filter(
-                TI.dag_id == ti.dag_id,
-                TI.task_id.in_(ti.task.upstream_task_ids),
-                TI.execution_date == ti.execution_date,
-                TI.state.in_([
-                    State.SUCCESS, State.FAILED,
-                    State.UPSTREAM_FAILED, State.SKIPPED]),
+        if dep_context.dag_run_tis is not None:
+            successes, skipped, failed, upstream_failed, done = \
+                self._count_upstream_states(ti, dep_context.dag_run_tis)
+        else:
+            qry = (
+                session
+                .query(
+                    func.coalesce(func.sum(
+                        case([(TI.state == State.SUCCESS, 1)], else_=0)), 0),
+                    func.coalesce(func.sum(
+                        case([(TI.state == State.SKIPPED, 1)], else_=0)), 0),
+                    func.coalesce(func.sum(
+                        case([(TI.state == State.FAILED, 1)], else_=0)), 0),
+                    func.coalesce(func.sum(
+                        case([(TI.state == State.UPSTREAM_FAILED, 1)], else_=0)), 0),
+                    func.count(TI.task_id),
+                )
+                .filter(
+                    TI.dag_id == ti.dag_id,
+                    TI.task_id.in_(ti.task.upstream_task_ids),
+                    TI.execution_date == ti.execution_date,
+                    TI.state.in_([
+                        State.SUCCESS, State.FAILED,
+                        State.UPSTREAM_FAILED, State.SKIPPED]),
+                )
             )
-        )
+            successes, skipped, failed, upstream_failed, done = qry.first()
 
-        successes, skipped, failed, upstream_failed, done = qry.first()
         for dep_status in self._evaluate_trigger_rule(
                 ti=ti,
                 successes=successes,
@@ -81,6 +84,32 @@ class TriggerRuleDep(BaseTIDep):
                 session=session):
             yield dep_status
 
+    @staticmethod
+    def _count_upstream_states(ti, dag_run_tis):
+        """
+        Counts the upstream task instances of the given task instance per
+        finished state, using the task instances of its DagRun that are
+        already in memory.
+
+        :param ti: the task instance to count the upstream states of
+        :type ti: TaskInstance
+        :param dag_run_tis: the task instances of the DagRun keyed by task ID
+        :type dag_run_tis: dict[unicode, TaskInstance]
+        :return: the number of successful, skipped, failed, upstream_failed and
+            completed upstream task instances
+        :rtype: tuple[int]
+        """
+        counter = Counter(
+            dag_run_tis[task_id].state
+            for task_id in ti.task.upstream_task_ids
+            if task_id in dag_run_tis)
+        successes = counter[State.SUCCESS]
+        skipped = counter[State.SKIPPED]
+        failed = counter[State.FAILED]
+        upstream_failed = counter[State.UPSTREAM_FAILED]
+        done = successes + skipped + failed + upstream_failed
+        return successes, skipped, failed, upstream_failed, done
+
     @provide_session
     def _evaluate_trigger_rule(
             self,
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+
+from airflow.utils.dag_processing import might_contain_dag, walk_dag_folder
+from airflow.utils.log.logging_mixin import LoggingMixin
+
+
+class Inotify(object):
+    """
+    Minimal wrapper around the Linux inotify API, see inotify(7).
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+                  IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF |
+                  IN_MOVE_SELF)
+
+    _EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self):
+        """
+        :raises OSError: if inotify is not available on this platform
+        """
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError(errno.ENOSYS, "Could not find the C library")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not supported by the C library")
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+
+    def fileno(self):
+        return self._fd
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        """
+        :return: the watch descriptor of the path
+        :rtype: int
+        :raises OSError: if the path could not be watched, e.g. because the
+        limit of watches of the user was reached
+        """
+        wd = self._libc.inotify_add_watch(
+            self._fd, path.encode(sys.getfilesystemencoding()), mask)
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), path)
+        return wd
+
+    def read_events(self):
+        """
+        Reads the pending events without blocking.
+
+        :return: the events as (watch descriptor, mask, name) tuples
+        :rtype: list[(int, int, unicode)]
+        """
+        events = []
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return events
+                raise
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self._EVENT_HEADER.unpack_from(data, offset)
+                offset += self._EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((wd, mask, name.decode(sys.getfilesystemencoding())))
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class DagFolderWatcher(LoggingMixin):
+    """
+    Keeps track of the files in a DAG folder that could contain DAG
+    definitions without reading every file again each time the folder is
+    listed.
+
+    The verdict of the safe mode heuristic is cached per file and only
+    computed again when the modification time or the size of the file
+    changes. In 'inotify' mode, the files that change between two full scans
+    are picked up from inotify events and are the only ones examined again.
+    In 'poll' mode, or when inotify is not available, changes are only
+    picked up by the full scans.
+    """
+
+    POLL = 'poll'
+    INOTIFY = 'inotify'
+
+    def __init__(self, directory, mode=POLL, safe_mode=True):
+        """
+        :param directory: the DAG folder, or a single DAG file
+        :type directory: unicode
+        :param mode: 'inotify' or 'poll'
+        :type mode: unicode
+        :param safe_mode: whether to use a heuristic to determine whether a
+        file contains Airflow DAG definitions
+        :type safe_mode: bool
+        """
+        self.directory = directory
+        self.safe_mode = safe_mode
+        self._file_paths = set()
+        # Map from each traversed directory to its .airflowignore patterns
+        self._patterns_by_directory = {}
+        self._cache = {}
+        self._inotify = None
+        # Map from watch descriptor to the watched directory
+        self._watched_directories = {}
+
+        if mode == self.INOTIFY and directory is not None and os.path.isdir(directory):
+            try:
+                self._inotify = Inotify()
+            except OSError as e:
+                self.log.warning("Falling back to polling %s as inotify is not "
+                                 "available: %s", directory, e)
+        elif mode not in (self.POLL, self.INOTIFY):
+            self.log.warning("Unknown DAG folder watcher mode %s, polling %s",
+                             mode, directory)
+
+    @property
+    def file_paths(self):
+        """
+        :return: the paths to the files that could contain DAG definitions
+        :rtype: list[unicode]
+        """
+        return sorted(self._file_paths)
+
+    def get_wait_handles(self):
+        """
+        :return: handles that become ready for reading when files changed
+        :rtype: list
+        """
+        return [self._inotify] if self._inotify is not None else []
+
+    def check(self, full_scan=False):
+        """
+        Updates the files that could contain DAG definitions.
+
+        :param full_scan: whether to traverse the whole folder, otherwise
+        only the files that inotify reported as changed are examined
+        :type full_scan: bool
+        :return: whether the files that could contain DAG definitions changed
+        :rtype: bool
+        """
+        if self._inotify is not None and not full_scan:
+            previous_file_paths = set(self._file_paths)
+            full_scan = self._process_events()
+            if not full_scan:
+                return self._file_paths != previous_file_paths
+        if full_scan:
+            return self._scan()
+        return False
+
+    def _scan(self):
+        if self._inotify is not None:
+            # Drain the pending events as the scan picks up their changes
+            self._inotify.read_events()
+        file_paths, self._patterns_by_directory = walk_dag_folder(
+            self.directory, self.safe_mode, self._cache)
+        if self._inotify is not None:
+            self._watch(self._patterns_by_directory.keys())
+        file_paths = set(file_paths)
+        changed = file_paths != self._file_paths
+        self._file_paths = file_paths
+        return changed
+
+    def _watch(self, directories):
+        watched_directories = {}
+        for directory in directories:
+            try:
+                wd = self._inotify.add_watch(directory)
+                watched_directories[wd] = directory
+            except OSError as e:
+                self.log.warning("Falling back to polling %s as %s could not "
+                                 "be watched: %s", self.directory, directory, e)
+                self.close()
+                return
+        self._watched_directories = watched_directories
+
+    def _process_events(self):
+        """
+        Examines the files that changed since the last call.
+
+        :return: whether a full scan is needed
+        :rtype: bool
+        """
+        changed_file_paths = set()
+        for wd, mask, name in self._inotify.read_events():
+            if mask & (Inotify.IN_Q_OVERFLOW | Inotify.IN_ISDIR |
+                       Inotify.IN_DELETE_SELF | Inotify.IN_MOVE_SELF):
+                # Events were lost or the directory tree changed
+                return True
+            if mask & Inotify.IN_IGNORED:
+                self._watched_directories.pop(wd, None)
+                continue
+            if wd not in self._watched_directories or not name:
+                continue
+            if name == '.airflowignore':
+                return True
+            changed_file_paths.add(os.path.join(self._watched_directories[wd], name))
+
+        for file_path in changed_file_paths:
+            self._file_paths.discard(file_path)
+            try:
+                if not os.path.isfile(file_path):
+                    self._cache.pop(file_path, None)
+                    continue
+                patterns = self._patterns_by_directory.get(
+                    os.path.dirname(file_path))
+                if patterns is None or any(p.search(file_path) for p in patterns):
+                    continue
+                if might_contain_dag(file_path, self.safe_mode, self._cache):
+                    self._file_paths.add(file_path)
+            except Exception:
+                self.log.exception("Error while examining %s", file_path)
+        return False
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+            self._watched_directories = {}
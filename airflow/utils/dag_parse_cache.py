@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from airflow import settings
+from airflow.utils.log.logging_mixin import LoggingMixin
+
+DagParseCacheEntry = namedtuple(
+    'DagParseCacheEntry',
+    'file_path file_hash dependencies created_at valid_until simple_dags paused_dag_ids')
+
+
+def hash_file(file_path):
+    """
+    :return: the SHA-1 hex digest of the content of the file, or None if it
+    could not be read
+    :rtype: unicode
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
+def get_local_module_paths(dags_folder=None):
+    """
+    :return: the source files of the modules loaded from the DAGs folder,
+    except the DAG files themselves, i.e. the local modules the DAG files
+    may import
+    :rtype: list[unicode]
+    """
+    dags_folder = os.path.join(dags_folder or settings.DAGS_FOLDER, '')
+    paths = set()
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, '__file__', None)
+        # DagBag loads the DAG files under modules named unusual_prefix_*
+        if not path or name.startswith('unusual_prefix_'):
+            continue
+        path = os.path.abspath(path)
+        if not path.startswith(dags_folder):
+            continue
+        root, ext = os.path.splitext(path)
+        if ext in ('.pyc', '.pyo'):
+            path = root + '.py'
+        paths.add(path)
+    return sorted(paths)
+
+
+class DagParseCache(LoggingMixin):
+    """
+    On-disk cache of the SimpleDags found in DAG files, so that the DAG files
+    whose DAGs have nothing to be scheduled don't have to be executed again.
+
+    An entry is served only as long as the content of the DAG file and of the
+    local modules loaded along with it are unchanged, the entry is younger
+    than max_age seconds and its valid_until date has not passed.
+    """
+
+    def __init__(self, cache_dir, max_age):
+        """
+        :param cache_dir: the directory to store the entries in
+        :type cache_dir: unicode
+        :param max_age: number of seconds after which the files are executed
+        again even if they did not change, e.g. for DAGs that are generated
+        from external data
+        :type max_age: int
+        """
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+
+    def _entry_path(self, file_path):
+        return os.path.join(
+            self.cache_dir,
+            hashlib.sha1(file_path.encode('utf-8')).hexdigest() + '.pickle')
+
+    def get(self, file_path):
+        """
+        :param file_path: the path to the DAG file
+        :type file_path: unicode
+        :return: the entry of the file, or None if there is no valid entry
+        :rtype: DagParseCacheEntry
+        """
+        entry_path = self._entry_path(file_path)
+        try:
+            with open(entry_path, 'rb') as f:
+                entry = pickle.load(f)
+        except (IOError, OSError):
+            return None
+        except Exception:
+            self.log.warning("Ignoring unreadable DAG parse cache entry %s", entry_path)
+            return None
+
+        now = datetime.utcnow()
+        if (entry.file_path != file_path or
+                now >= entry.valid_until or
+                now - entry.created_at > timedelta(seconds=self.max_age)):
+            return None
+        if hash_file(file_path) != entry.file_hash:
+            return None
+        for dependency_path, dependency_hash in entry.dependencies.items():
+            if hash_file(dependency_path) != dependency_hash:
+                return None
+        return entry
+
+    def put(self, file_path, file_hash, dependencies, valid_until, simple_dags,
+            paused_dag_ids):
+        """
+        Store the entry of a DAG file.
+
+        :param file_path: the path to the DAG file
+        :type file_path: unicode
+        :param file_hash: the hash of the content of the file when it was
+        executed
+        :type file_hash: unicode
+        :param dependencies: the paths to the local modules loaded along with
+        the file
+        :type dependencies: list[unicode]
+        :param valid_until: when the entry expires
+        :type valid_until: datetime
+        :param simple_dags: the SimpleDags of all the DAGs in the file
+        :type simple_dags: list[SimpleDag]
+        :param paused_dag_ids: the IDs of the DAGs that were paused
+        :type paused_dag_ids: set[unicode]
+        """
+        entry = DagParseCacheEntry(
+            file_path=file_path,
+            file_hash=file_hash,
+            dependencies={path: hash_file(path) for path in dependencies},
+            created_at=datetime.utcnow(),
+            valid_until=valid_until,
+            simple_dags=simple_dags,
+            paused_dag_ids=set(paused_dag_ids))
+        try:
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                if not os.path.isdir(self.cache_dir):
+                    raise
+            # Write to a temporary file first so that readers never see a
+            # partially written entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_path, self._entry_path(file_path))
+        except (IOError, OSError):
+            self.log.exception("Could not write the DAG parse cache entry of %s",
+                               file_path)
+
+    def invalidate(self, file_path):
+        """
+        Remove the entry of a DAG file.
+        """
+        try:
+            os.remove(self._entry_path(file_path))
+        except (IOError, OSError):
+            pass
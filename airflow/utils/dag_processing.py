@@ -116,6 +116,50 @@ class SimpleDag(BaseDag):
             return None
 
 
+class SimpleTaskInstance(object):
+    """
+    A simplified representation of a task instance, used to pass the zombie
+    task instances found by the scheduler to the processor of their DAG file.
+    """
+
+    def __init__(self, dag_id, task_id, execution_date):
+        """
+        :param dag_id: the DAG ID
+        :type dag_id: unicode
+        :param task_id: the task ID
+        :type task_id: unicode
+        :param execution_date: the execution date
+        :type execution_date: datetime
+        """
+        self._dag_id = dag_id
+        self._task_id = task_id
+        self._execution_date = execution_date
+
+    @property
+    def dag_id(self):
+        return self._dag_id
+
+    @property
+    def task_id(self):
+        return self._task_id
+
+    @property
+    def execution_date(self):
+        return self._execution_date
+
+    @property
+    def key(self):
+        """
+        :return: the same key as TaskInstance.key
+        :rtype: tuple
+        """
+        return self._dag_id, self._task_id, self._execution_date
+
+    def __repr__(self):
+        return "<SimpleTaskInstance: {}.{} {}>".format(
+            self._dag_id, self._task_id, self._execution_date)
+
+
 class SimpleDagBag(BaseDagBag):
     """
     A collection of SimpleDag objects with some convenience methods.
@@ -155,7 +199,48 @@ class SimpleDagBag(BaseDagBag):
         return self.dag_id_to_simple_dag[dag_id]
 
 
-def list_py_file_paths(directory, safe_mode=True):
+def might_contain_dag(file_path, safe_mode=True, cache=None):
+    """
+    Checks whether a file is a Python file or a zip file that could contain
+    Airflow DAG definitions.
+
+    :param file_path: the path to the file
+    :type file_path: unicode
+    :param safe_mode: whether to use a heuristic to determine whether a file
+    contains Airflow DAG definitions
+    :type safe_mode: bool
+    :param cache: if specified, verdicts are stored in and read from this
+    dict keyed by file path, and are reused as long as the modification time
+    and size of the file do not change
+    :type cache: dict[unicode, (float, int, bool)]
+    :return: whether the file could contain DAG definitions
+    :rtype: bool
+    """
+    stat = os.stat(file_path)
+    if cache is not None:
+        cached = cache.get(file_path)
+        if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2]
+
+    mod_name, file_ext = os.path.splitext(os.path.split(file_path)[-1])
+    is_zipfile = file_ext != '.py' and zipfile.is_zipfile(file_path)
+    if file_ext != '.py' and not is_zipfile:
+        result = False
+    elif safe_mode and not is_zipfile:
+        # Heuristic that guesses whether a Python file contains an
+        # Airflow DAG definition.
+        with open(file_path, 'rb') as f:
+            content = f.read()
+            result = all([s in content for s in (b'DAG', b'airflow')])
+    else:
+        result = True
+
+    if cache is not None:
+        cache[file_path] = (stat.st_mtime, stat.st_size, result)
+    return result
+
+
+def list_py_file_paths(directory, safe_mode=True, cache=None):
     """
     Traverse a directory and look for Python files.
 
@@ -163,51 +248,126 @@ def list_py_file_paths(directory, safe_mode=True):
     :type directory: unicode
     :param safe_mode: whether to use a heuristic to determine whether a file
     contains Airflow DAG definitions
+    :param cache: if specified, the results of might_contain_dag() are
+    cached in this dict so that unchanged files are not read again
+    :type cache: dict[unicode, (float, int, bool)]
     :return: a list of paths to Python files in the specified directory
     :rtype: list[unicode]
     """
+    file_paths, _ = walk_dag_folder(directory, safe_mode, cache)
+    return file_paths
+
+
+# Map from the path of an .airflowignore file to its modification time and
+# size, and its compiled patterns
+_ignore_file_cache = {}
+
+
+def read_ignore_patterns(ignore_file_path):
+    """
+    Reads and compiles the patterns of an .airflowignore file. The result is
+    cached until the modification time or the size of the file changes.
+
+    :param ignore_file_path: the path to the .airflowignore file
+    :type ignore_file_path: unicode
+    :return: the compiled patterns, empty if the file does not exist
+    :rtype: list[_sre.SRE_Pattern]
+    """
+    try:
+        stat = os.stat(ignore_file_path)
+    except OSError:
+        _ignore_file_cache.pop(ignore_file_path, None)
+        return []
+    cached = _ignore_file_cache.get(ignore_file_path)
+    if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+        return cached[2]
+
+    patterns = []
+    with open(ignore_file_path, 'r') as f:
+        for line in f.read().split('\n'):
+            if not line:
+                continue
+            try:
+                patterns.append(re.compile(line))
+            except re.error:
+                log = LoggingMixin().log
+                log.warning("Ignoring invalid pattern %s in %s", line, ignore_file_path)
+    _ignore_file_cache[ignore_file_path] = (stat.st_mtime, stat.st_size, patterns)
+    return patterns
+
+
+def walk_ignoring(directory):
+    """
+    Traverse a directory like os.walk(), skipping the files and the
+    directories matching the patterns of the .airflowignore files. The
+    patterns of an .airflowignore file apply to the paths in its directory
+    and in the directories below it.
+
+    :param directory: the directory to traverse
+    :type directory: unicode
+    :return: for each directory that is not ignored, the directory, the
+    patterns that apply to it and the paths to the files in it that are not
+    ignored
+    :rtype: iterator[(unicode, list[_sre.SRE_Pattern], list[unicode])]
+    """
+    patterns_by_directory = {directory: []}
+    for root, dirs, files in os.walk(directory, followlinks=True):
+        patterns = patterns_by_directory.pop(root, [])
+        if '.airflowignore' in files:
+            patterns = patterns + read_ignore_patterns(
+                os.path.join(root, '.airflowignore'))
+
+        # Prune the ignored directories so that they are not traversed
+        kept_dirs = []
+        for d in dirs:
+            path = os.path.join(root, d)
+            if not any(p.search(path) for p in patterns):
+                kept_dirs.append(d)
+                patterns_by_directory[path] = patterns
+        dirs[:] = kept_dirs
+
+        file_paths = [os.path.join(root, f) for f in files]
+        if patterns:
+            file_paths = [file_path for file_path in file_paths
+                          if not any(p.search(file_path) for p in patterns)]
+        yield root, patterns, file_paths
+
+
+def walk_dag_folder(directory, safe_mode=True, cache=None):
+    """
+    Traverse a directory and look for Python files, see list_py_file_paths().
+
+    :return: the paths to Python files in the specified directory, and the
+    .airflowignore patterns that apply to each directory that was traversed
+    :rtype: (list[unicode], dict[unicode, list[_sre.SRE_Pattern]])
+    """
     file_paths = []
+    patterns_by_directory = {}
+    examined_file_paths = set()
     if directory is None:
-        return []
+        return [], {}
     elif os.path.isfile(directory):
-        return [directory]
+        return [directory], {}
     elif os.path.isdir(directory):
-        patterns = []
-        for root, dirs, files in os.walk(directory, followlinks=True):
-            ignore_file = [f for f in files if f == '.airflowignore']
-            if ignore_file:
-                f = open(os.path.join(root, ignore_file[0]), 'r')
-                patterns += [p for p in f.read().split('\n') if p]
-                f.close()
-            for f in files:
+        for root, patterns, candidate_file_paths in walk_ignoring(directory):
+            patterns_by_directory[root] = patterns
+            for file_path in candidate_file_paths:
                 try:
-                    file_path = os.path.join(root, f)
                     if not os.path.isfile(file_path):
                         continue
-                    mod_name, file_ext = os.path.splitext(
-                        os.path.split(file_path)[-1])
-                    if file_ext != '.py' and not zipfile.is_zipfile(file_path):
-                        continue
-                    if any([re.findall(p, file_path) for p in patterns]):
-                        continue
-
-                    # Heuristic that guesses whether a Python file contains an
-                    # Airflow DAG definition.
-                    might_contain_dag = True
-                    if safe_mode and not zipfile.is_zipfile(file_path):
-                        with open(file_path, 'rb') as f:
-                            content = f.read()
-                            might_contain_dag = all(
-                                [s in content for s in (b'DAG', b'airflow')])
-
-                    if not might_contain_dag:
+                    examined_file_paths.add(file_path)
+                    if not might_contain_dag(file_path, safe_mode, cache):
                         continue
 
                     file_paths.append(file_path)
                 except Exception:
                     log = LoggingMixin().log
-                    log.exception("Error while examining %s", f)
-    return file_paths
+                    log.exception("Error while examining %s", file_path)
+    if cache is not None:
+        # Forget the files that are gone
+        for file_path in set(cache) - examined_file_paths:
+            del cache[file_path]
+    return file_paths, patterns_by_directory
 
 
 class AbstractDagFileProcessor(object):
@@ -285,6 +445,15 @@ class AbstractDagFileProcessor(object):
         """
         raise NotImplementedError()
 
+    @property
+    def wait_handles(self):
+        """
+        :return: handles that become ready for reading when the processor may
+        be done, so that the caller can wait on them instead of polling
+        :rtype: list
+        """
+        return []
+
 
 class DagFileProcessorManager(LoggingMixin):
     """
@@ -322,8 +491,9 @@ class DagFileProcessorManager(LoggingMixin):
         :type max_runs: int
         :type process_file_interval: float
         :param processor_factory: function that creates processors for DAG
-        definition files. Arguments are (dag_definition_path)
-        :type processor_factory: (unicode, unicode) -> (AbstractDagFileProcessor)
+        definition files. Arguments are (dag_definition_path, zombies), see
+        add_zombies()
+        :type processor_factory: (unicode, list[SimpleTaskInstance]) -> (AbstractDagFileProcessor)
 
         """
         self._file_paths = file_paths
@@ -341,6 +511,9 @@ class DagFileProcessorManager(LoggingMixin):
         self._last_finish_time = {}
         # Map from file path to the number of runs
         self._run_count = defaultdict(int)
+        # Map from file path to the zombie task instances to fail the next
+        # time the file is processed, by key
+        self._zombies = defaultdict(dict)
         # Scheduler heartbeat key.
         self._heart_beat_key = 'heart-beat'
 
@@ -421,8 +594,12 @@ class DagFileProcessorManager(LoggingMixin):
         :return: None
         """
         self._file_paths = new_file_paths
+        new_file_paths = set(new_file_paths)
         self._file_path_queue = [x for x in self._file_path_queue
                                  if x in new_file_paths]
+        for file_path in list(self._zombies):
+            if file_path not in new_file_paths:
+                del self._zombies[file_path]
         # Stop processors that are working on deleted files
         filtered_processors = {}
         for file_path, processor in self._processors.items():
@@ -433,6 +610,30 @@ class DagFileProcessorManager(LoggingMixin):
                 processor.terminate()
         self._processors = filtered_processors
 
+    def add_zombies(self, zombies):
+        """
+        Hands zombie task instances to the processors of their DAG files,
+        which fail them and run their callbacks. The files are processed
+        ahead of the other files, even if they were processed recently.
+
+        :param zombies: the zombie task instances by file path
+        :type zombies: dict[unicode, list[SimpleTaskInstance]]
+        """
+        for file_path, simple_tis in zombies.items():
+            if file_path not in self._file_paths:
+                self.log.warning(
+                    "Not failing the zombies %s as %s is not a known DAG file",
+                    simple_tis, file_path)
+                continue
+            self._zombies[file_path].update(
+                (simple_ti.key, simple_ti) for simple_ti in simple_tis)
+            if (file_path in self._processors or
+                    self._run_count[file_path] == self._max_runs):
+                continue
+            if file_path in self._file_path_queue:
+                self._file_path_queue.remove(file_path)
+            self._file_path_queue.insert(0, file_path)
+
     def processing_count(self):
         """
         :return: the number of files currently being processed
@@ -440,6 +641,17 @@ class DagFileProcessorManager(LoggingMixin):
         """
         return len(self._processors)
 
+    def get_wait_handles(self):
+        """
+        :return: handles that become ready for reading when one of the
+        processors may be done
+        :rtype: list
+        """
+        handles = []
+        for processor in self._processors.values():
+            handles.extend(processor.wait_handles)
+        return handles
+
     def wait_until_finished(self):
         """
         Sleeps until all the processors are done.
@@ -529,7 +741,8 @@ class DagFileProcessorManager(LoggingMixin):
         while (self._parallelism - len(self._processors) > 0 and
                        len(self._file_path_queue) > 0):
             file_path = self._file_path_queue.pop(0)
-            processor = self._processor_factory(file_path)
+            zombies = list(self._zombies.pop(file_path, {}).values())
+            processor = self._processor_factory(file_path, zombies)
 
             processor.start()
             self.log.info(
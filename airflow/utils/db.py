@@ -56,6 +56,20 @@ def provide_session(func):
     return wrapper
 
 
+# The engines inherited by the forked processes, which are never closed so
+# that the connections they pooled aren't closed under the parent process
+_inherited_engines = []
+
+
+def configure_orm_after_fork():
+    """
+    Gives a forked process its own connections to the metadata database,
+    leaving the connections pooled by the parent process alone.
+    """
+    _inherited_engines.append(settings.engine)
+    settings.configure_orm(disable_connection_pool=True)
+
+
 def pessimistic_connection_handling():
     @event.listens_for(Pool, "checkout")
     def ping_connection(dbapi_connection, connection_record, connection_proxy):
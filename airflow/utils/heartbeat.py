@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from airflow import settings
+from airflow.settings import Stats
+from airflow.utils.log.logging_mixin import LoggingMixin
+from airflow.utils.state import State
+
+
+class HeartbeatThread(threading.Thread, LoggingMixin):
+    """
+    Heartbeats all the jobs running in a process from a background thread,
+    so that the jobs don't have to wait for the database in their loop.
+
+    On every beat, the latest_heartbeat of all the registered jobs is updated
+    with a single UPDATE, which skips the jobs that were shut down externally.
+    As long as the number of rows updated matches the number of jobs, no
+    other query is needed; otherwise the jobs that were shut down are looked
+    up and flagged, and each job kills itself from its own thread the next
+    time it calls BaseJob.heartbeat.
+
+    In the same transaction, the state of the task instances run by the jobs
+    is read with a single query, so that the jobs check it without going to
+    the database from their own thread. The jobs wait for the beats of the
+    thread instead of sleeping to keep their heart rate.
+
+    There is one thread per process, see get.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, heartrate):
+        """
+        :param heartrate: number of seconds between two beats
+        :type heartrate: float
+        """
+        super(HeartbeatThread, self).__init__(name='HeartbeatThread')
+        self.daemon = True
+        self.heartrate = heartrate
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._beat_condition = threading.Condition(self._lock)
+        self._beat_number = 0
+        self._job_ids = set()
+        self._shut_down_ids = set()
+        # The key of the task instance run by each job, and its (state,
+        # hostname, pid) as read on the latest beat
+        self._ti_keys = {}
+        self._ti_states = {}
+        # time.time() of the latest beat that reached the database, for each
+        # job
+        self._latest_beats = {}
+
+    @classmethod
+    def get(cls, heartrate):
+        """
+        :return: the heartbeat thread of the current process, started on
+            first use. A forked process gets its own thread, as threads don't
+            survive forks.
+        :rtype: HeartbeatThread
+        """
+        with cls._instance_lock:
+            instance = cls._instance
+            if instance is None or instance.pid != os.getpid():
+                instance = cls(heartrate)
+                instance.start()
+                cls._instance = instance
+            return instance
+
+    def register(self, job_id):
+        with self._lock:
+            self._job_ids.add(job_id)
+            self._latest_beats[job_id] = time.time()
+
+    def register_task_instance(self, job_id, key):
+        """
+        Reads the state of the task instance run by the job on every beat,
+        from the next one on.
+
+        :param job_id: the ID of a registered job
+        :type job_id: int
+        :param key: the key of the task instance
+        :type key: tuple
+        """
+        with self._lock:
+            self._ti_keys[job_id] = key
+            self._ti_states.pop(job_id, None)
+
+    def unregister(self, job_id):
+        with self._lock:
+            self._job_ids.discard(job_id)
+            self._shut_down_ids.discard(job_id)
+            self._latest_beats.pop(job_id, None)
+            self._ti_keys.pop(job_id, None)
+            self._ti_states.pop(job_id, None)
+
+    def is_shut_down(self, job_id):
+        """
+        :return: whether the job was shut down externally
+        :rtype: bool
+        """
+        with self._lock:
+            return job_id in self._shut_down_ids
+
+    def get_task_instance_state(self, job_id):
+        """
+        :return: the (state, hostname, pid) of the task instance of the job,
+            as read on the latest beat, or None if it wasn't read yet
+        :rtype: tuple
+        """
+        with self._lock:
+            return self._ti_states.get(job_id)
+
+    def wait_for_beat(self, timeout):
+        """
+        Waits until the next beat is over, successful or not.
+
+        :param timeout: the maximum number of seconds to wait
+        :type timeout: float
+        :return: whether a beat happened before the timeout
+        :rtype: bool
+        """
+        deadline = time.time() + timeout
+        with self._beat_condition:
+            beat_number = self._beat_number
+            while self._beat_number == beat_number:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._beat_condition.wait(remaining)
+            return True
+
+    def get_latest_beat(self, job_id):
+        """
+        :return: the time.time() of the latest heartbeat of the job that
+            reached the database
+        :rtype: float
+        """
+        with self._lock:
+            return self._latest_beats.get(job_id)
+
+    def beat(self):
+        """
+        Updates the latest_heartbeat of all the registered jobs at once.
+        """
+        # Imported here as airflow.jobs depends on this module
+        from airflow.jobs import BaseJob
+        from airflow.models import TaskInstance as TI
+
+        with self._lock:
+            job_ids = self._job_ids - self._shut_down_ids
+            ti_keys = dict((job_id, self._ti_keys[job_id])
+                           for job_id in job_ids if job_id in self._ti_keys)
+        if not job_ids:
+            return
+
+        job = BaseJob.__table__
+        session = settings.Session()
+        try:
+            result = session.execute(
+                job.update()
+                .where(and_(job.c.id.in_(job_ids),
+                            or_(job.c.state == None,  # noqa: E711
+                                job.c.state != State.SHUTDOWN)))
+                .values(latest_heartbeat=datetime.utcnow()))
+            shut_down_ids = set()
+            if result.rowcount < len(job_ids):
+                shut_down_ids = set(
+                    job_id for job_id, in
+                    session.query(BaseJob.id)
+                    .filter(BaseJob.id.in_(job_ids))
+                    .filter(BaseJob.state == State.SHUTDOWN))
+            ti_states = {}
+            if ti_keys:
+                filter_for_tis = ([and_(TI.dag_id == dag_id,
+                                        TI.task_id == task_id,
+                                        TI.execution_date == execution_date)
+                                   for dag_id, task_id, execution_date
+                                   in ti_keys.values()])
+                ti_states = dict(
+                    ((dag_id, task_id, execution_date), (state, hostname, pid))
+                    for dag_id, task_id, execution_date, state, hostname, pid
+                    in session.query(TI.dag_id, TI.task_id, TI.execution_date,
+                                     TI.state, TI.hostname, TI.pid)
+                    .filter(or_(*filter_for_tis)))
+            session.commit()
+        finally:
+            session.close()
+
+        now = time.time()
+        with self._lock:
+            for job_id in job_ids & self._job_ids:
+                if job_id in shut_down_ids:
+                    self.log.info("Job %s was shut down externally", job_id)
+                    self._shut_down_ids.add(job_id)
+                else:
+                    self._latest_beats[job_id] = now
+                if job_id in ti_keys and self._ti_keys.get(job_id) == ti_keys[job_id]:
+                    # A task instance that is gone reads as having no state
+                    self._ti_states[job_id] = ti_states.get(
+                        ti_keys[job_id], (None, None, None))
+        Stats.gauge('heartbeat_thread_jobs', len(job_ids))
+
+    def run(self):
+        while not self._stop_event.wait(self.heartrate):
+            try:
+                self.beat()
+            except Exception:
+                Stats.incr('heartbeat_thread_failure', 1, 1)
+                self.log.exception("Exception while heartbeating jobs")
+            with self._beat_condition:
+                self._beat_number += 1
+                self._beat_condition.notify_all()
+
+    def stop(self):
+        self._stop_event.set()
@@ -22,13 +22,16 @@ import psutil
 from builtins import input
 from past.builtins import basestring
 from datetime import datetime
+import errno
 import getpass
 import imp
 import os
 import re
+import select
 import signal
 import subprocess
 import sys
+import time
 import warnings
 
 from airflow import configuration
@@ -183,6 +186,32 @@ def pprinttable(rows):
     return s
 
 
+def wait_for_handles(handles, timeout):
+    """
+    Blocks until at least one of the given handles is ready for reading, or
+    until the timeout has passed.
+
+    :param handles: file descriptors or objects with a fileno() method, e.g.
+    multiprocessing connections
+    :type handles: list
+    :param timeout: maximum number of seconds to wait
+    :type timeout: float
+    :return: whether one of the handles is ready for reading
+    :rtype: bool
+    """
+    if not handles:
+        time.sleep(timeout)
+        return False
+    while True:
+        try:
+            readable, _, _ = select.select(handles, [], [], timeout)
+            return len(readable) > 0
+        except (OSError, select.error) as e:
+            # Retry when interrupted by a signal, e.g. SIGCHLD
+            if e.args[0] != errno.EINTR:
+                raise
+
+
 def kill_using_shell(logger, pid, signal=signal.SIGTERM):
     try:
         process = psutil.Process(pid)
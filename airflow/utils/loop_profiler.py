@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import time
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from tabulate import tabulate
+
+from airflow import settings
+from airflow.settings import Stats
+from airflow.utils.log.logging_mixin import LoggingMixin
+
+
+class LoopProfiler(LoggingMixin):
+    """
+    Measures the time spent and the number of SQL queries sent to the
+    metadata database in each phase of a loop, e.g. the scheduler loop.
+
+    Every measurement is sent to the stats backend as ``<name>.<phase>``
+    (timing, in milliseconds) and ``<name>.<phase>.queries`` (gauge). The
+    measurements of the last ``history_size`` loops are also kept in memory
+    so that a report can be produced on demand.
+    """
+
+    TOTAL = 'total'
+
+    def __init__(self, name, history_size=100, engine=None):
+        """
+        :param name: prefix of the stats sent to the stats backend
+        :type name: unicode
+        :param history_size: number of loops to keep in the report
+        :type history_size: int
+        :param engine: the engine to count queries of, defaults to the
+        metadata database engine
+        :type engine: sqlalchemy.engine.Engine
+        """
+        self.name = name
+        self.history = deque(maxlen=history_size)
+        self._engine = engine
+        self._query_count = 0
+        self._current_loop = None
+        self._loop_start_time = None
+        self._loop_start_query_count = None
+
+    def _count_query(self, *args, **kwargs):
+        self._query_count += 1
+
+    def start(self):
+        """
+        Starts counting the queries sent to the database.
+        """
+        if self._engine is None:
+            self._engine = settings.engine
+        event.listen(self._engine, 'before_cursor_execute', self._count_query)
+
+    def stop(self):
+        """
+        Stops counting the queries sent to the database.
+        """
+        if self._engine is not None and event.contains(
+                self._engine, 'before_cursor_execute', self._count_query):
+            event.remove(self._engine, 'before_cursor_execute', self._count_query)
+
+    def start_loop(self):
+        """
+        Marks the beginning of an iteration of the loop.
+        """
+        self._current_loop = OrderedDict()
+        self._loop_start_time = time.time()
+        self._loop_start_query_count = self._query_count
+
+    def end_loop(self):
+        """
+        Marks the end of an iteration of the loop and records it in the
+        report.
+        """
+        if self._current_loop is None:
+            return
+        self._record(self.TOTAL,
+                     time.time() - self._loop_start_time,
+                     self._query_count - self._loop_start_query_count)
+        self.history.append(self._current_loop)
+        self._current_loop = None
+
+    @contextmanager
+    def phase(self, phase_name):
+        """
+        Measures the block of code run in the context as the given phase of
+        the current iteration.
+
+        :param phase_name: name of the phase
+        :type phase_name: unicode
+        """
+        start_time = time.time()
+        start_query_count = self._query_count
+        try:
+            yield
+        finally:
+            self._record(phase_name,
+                         time.time() - start_time,
+                         self._query_count - start_query_count)
+
+    def _record(self, phase_name, duration, queries):
+        Stats.timing('{}.{}'.format(self.name, phase_name), duration * 1000)
+        Stats.gauge('{}.{}.queries'.format(self.name, phase_name), queries)
+        if self._current_loop is not None:
+            previous_duration, previous_queries = self._current_loop.get(
+                phase_name, (0, 0))
+            self._current_loop[phase_name] = (previous_duration + duration,
+                                              previous_queries + queries)
+
+    def report(self):
+        """
+        :return: a table with the average and maximum duration and number of
+        queries of each phase over the loops in the history
+        :rtype: unicode
+        """
+        phases = OrderedDict()
+        for loop in self.history:
+            for phase_name, measurement in loop.items():
+                phases.setdefault(phase_name, []).append(measurement)
+        # Always show the total last
+        if self.TOTAL in phases:
+            phases[self.TOTAL] = phases.pop(self.TOTAL)
+
+        rows = []
+        for phase_name, measurements in phases.items():
+            durations = [duration for duration, _ in measurements]
+            queries = [query_count for _, query_count in measurements]
+            rows.append((phase_name,
+                         len(measurements),
+                         sum(durations) / len(durations),
+                         max(durations),
+                         sum(queries) / len(queries),
+                         max(queries)))
+
+        headers = ["Phase", "Loops", "Avg Time (s)", "Max Time (s)",
+                   "Avg Queries", "Max Queries"]
+        return tabulate(rows, headers=headers, floatfmt=".3f")
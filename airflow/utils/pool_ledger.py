@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import defaultdict
+
+from sqlalchemy import func
+
+from airflow.models import Pool, TaskInstance
+from airflow.utils.db import provide_session
+from airflow.utils.log.logging_mixin import LoggingMixin
+from airflow.utils.state import State
+
+
+class PoolLedger(LoggingMixin):
+    """
+    Keeps track of the slots in use in every pool from within the scheduler
+    process, so that scheduling decisions do not have to count the running
+    and queued task instances of a pool every time.
+
+    The ledger is seeded from a single grouped query, updated as the
+    scheduler queues task instances and as the executor reports them as
+    finished, and reconciled with the database every
+    ``reconcile_interval`` scheduling loops to correct any drift (e.g. task
+    instances that were cleared or marked from the UI).
+
+    Only the task instances queued since the last reconciliation are
+    released when they finish: the others are not in the ledger anymore if
+    they finished before the reconciliation counted the slots in use.
+    """
+
+    def __init__(self, reconcile_interval):
+        """
+        :param reconcile_interval: number of scheduling loops between two
+        reconciliations with the database. 0 or 1 reconcile on every loop.
+        :type reconcile_interval: int
+        """
+        self.reconcile_interval = reconcile_interval
+        self._pool_slots = {}
+        self._used_slots = defaultdict(int)
+        # The pools of the task instances queued since the last reconciliation
+        self._taken_slots = {}
+        self._loops_until_reconcile = 0
+
+    @provide_session
+    def reconcile(self, session=None):
+        """
+        Reloads the pool sizes and the number of running and queued task
+        instances in every pool from the database.
+        """
+        self._pool_slots = {
+            pool: slots for pool, slots in session.query(Pool.pool, Pool.slots)
+        }
+
+        TI = TaskInstance
+        used_slots_query = (
+            session
+            .query(TI.pool, func.count('*'))
+            .filter(TI.state.in_([State.RUNNING, State.QUEUED]))
+            .group_by(TI.pool)
+        ).all()
+        self._used_slots = defaultdict(int)
+        for pool, count in used_slots_query:
+            self._used_slots[pool] = count
+        self._taken_slots = {}
+
+        self._loops_until_reconcile = self.reconcile_interval
+
+    @provide_session
+    def refresh(self, session=None):
+        """
+        To be called once per scheduling loop. Reconciles the ledger with the
+        database if it was never seeded, was invalidated, or once every
+        ``reconcile_interval`` calls.
+        """
+        if self._loops_until_reconcile <= 0:
+            self.log.debug("Reconciling the pool ledger with the database")
+            self.reconcile(session=session)
+        self._loops_until_reconcile -= 1
+
+    def invalidate(self):
+        """
+        Forces a reconciliation with the database on the next refresh, e.g.
+        after task instances were moved out of the queued state in bulk.
+        """
+        self._loops_until_reconcile = 0
+
+    def has_pool(self, pool):
+        """
+        :param pool: name of the pool
+        :type pool: unicode
+        :return: whether the pool existed when the ledger was last reconciled
+        :rtype: bool
+        """
+        return pool in self._pool_slots
+
+    def open_slots(self, pool):
+        """
+        :param pool: name of the pool
+        :type pool: unicode
+        :return: the number of slots open in the given pool
+        :rtype: int
+        """
+        return self._pool_slots.get(pool, 0) - self._used_slots[pool]
+
+    def used_slots(self, pool):
+        """
+        :param pool: name of the pool
+        :type pool: unicode
+        :return: the number of running and queued task instances in the pool
+        :rtype: int
+        """
+        return self._used_slots[pool]
+
+    def take_slots(self, pool, key):
+        """
+        Records that a task instance was queued in the given pool.
+
+        :param pool: name of the pool
+        :type pool: unicode
+        :param key: the key of the task instance
+        :type key: tuple
+        """
+        if pool and key not in self._taken_slots:
+            self._taken_slots[key] = pool
+            self._used_slots[pool] += 1
+
+    def release_slots(self, key):
+        """
+        Records that a task instance finished running. Its slot is only
+        released if it was queued since the last reconciliation.
+
+        :param key: the key of the task instance
+        :type key: tuple
+        """
+        pool = self._taken_slots.pop(key, None)
+        if pool:
+            self._used_slots[pool] = max(0, self._used_slots[pool] - 1)
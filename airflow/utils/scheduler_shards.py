@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import socket
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from airflow.models import SchedulerShardLease
+from airflow.settings import Stats
+from airflow.utils.db import provide_session
+from airflow.utils.log.logging_mixin import LoggingMixin
+from airflow.utils.state import State
+
+
+def get_shard(file_path, dag_folder, num_shards):
+    """
+    :return: the shard of a DAG file, which only depends on its path relative
+    to the DAGs folder so that all the schedulers agree on it
+    :rtype: int
+    """
+    relative_path = os.path.relpath(file_path, dag_folder)
+    return (zlib.crc32(relative_path.encode('utf-8')) & 0xffffffff) % num_shards
+
+
+class ShardLeaseManager(LoggingMixin):
+    """
+    Splits the DAG files between the schedulers running at the same time.
+
+    The files are hashed into num_shards shards, and each scheduler leases
+    its fair share of the shards, i.e. the number of shards divided by the
+    number of live schedulers, rounded up, through the scheduler_shard_lease
+    table. The leases are renewed on every heartbeat and expire after
+    lease_timeout seconds, so that the shards of a scheduler that died are
+    taken over by the others. A scheduler that holds more than its fair
+    share, e.g. because another scheduler started, releases the extra
+    shards.
+
+    The lease rows are locked while they are updated, so that two schedulers
+    never own the same shard according to the database.
+    """
+
+    def __init__(self, scheduler_id, num_shards, lease_timeout):
+        """
+        :param scheduler_id: the ID of the SchedulerJob
+        :type scheduler_id: int
+        :param num_shards: the number of shards to split the files in
+        :type num_shards: int
+        :param lease_timeout: number of seconds after which a lease that
+        wasn't renewed expires
+        :type lease_timeout: int
+        """
+        self.scheduler_id = scheduler_id
+        self.num_shards = num_shards
+        self.lease_timeout = lease_timeout
+        self.hostname = socket.getfqdn()
+        # The shards owned after the last heartbeat
+        self.shards = set()
+
+    def _create_missing_leases(self, session):
+        existing = set(shard_id for shard_id, in
+                       session.query(SchedulerShardLease.shard_id))
+        missing = [shard_id for shard_id in range(self.num_shards)
+                   if shard_id not in existing]
+        if not missing:
+            return
+        for shard_id in missing:
+            session.add(SchedulerShardLease(shard_id=shard_id))
+        try:
+            session.commit()
+        except IntegrityError:
+            # Another scheduler created them at the same time
+            session.rollback()
+
+    def _get_live_scheduler_ids(self, expire_before, session):
+        # Imported here as airflow.jobs depends on this module
+        from airflow.jobs import SchedulerJob
+        live_scheduler_ids = set(
+            job_id for job_id, in
+            session.query(SchedulerJob.id)
+            .filter(SchedulerJob.state == State.RUNNING)
+            .filter(SchedulerJob.latest_heartbeat >= expire_before))
+        live_scheduler_ids.add(self.scheduler_id)
+        return live_scheduler_ids
+
+    @provide_session
+    def heartbeat(self, session=None):
+        """
+        Renews the leases of the scheduler, releases the shards above its fair
+        share and claims free shards up to its fair share.
+
+        :return: the shards that were claimed and that need their orphaned
+        task instances reset, as their previous owner died or shut down
+        :rtype: set[int]
+        """
+        self._create_missing_leases(session)
+
+        now = datetime.utcnow()
+        expire_before = now - timedelta(seconds=self.lease_timeout)
+        live_scheduler_ids = self._get_live_scheduler_ids(expire_before, session)
+        fair_share = -(-self.num_shards // len(live_scheduler_ids))
+
+        leases = (
+            session
+            .query(SchedulerShardLease)
+            .filter(SchedulerShardLease.shard_id < self.num_shards)
+            .order_by(SchedulerShardLease.shard_id)
+            .with_for_update()
+            .all())
+        owned = [lease for lease in leases
+                 if lease.scheduler_id == self.scheduler_id and
+                 lease.latest_heartbeat is not None]
+
+        # Release the shards above the fair share, keeping the owner so that
+        # the next owner knows who may still run their task instances
+        for lease in owned[fair_share:]:
+            self.log.info("Releasing shard %s", lease.shard_id)
+            lease.latest_heartbeat = None
+        owned = owned[:fair_share]
+
+        orphaned_shards = set()
+        for lease in leases:
+            if len(owned) >= fair_share:
+                break
+            if lease in owned:
+                continue
+            if lease.latest_heartbeat is None:
+                # Released by its owner, which may still run the task
+                # instances it queued unless it shut down since
+                orphaned = lease.scheduler_id not in live_scheduler_ids
+            elif lease.latest_heartbeat < expire_before:
+                orphaned = True
+                self.log.warning("The lease of scheduler %s on shard %s expired",
+                                 lease.scheduler_id, lease.shard_id)
+            else:
+                continue
+            self.log.info("Claiming shard %s", lease.shard_id)
+            lease.scheduler_id = self.scheduler_id
+            lease.hostname = self.hostname
+            lease.acquired_at = now
+            if orphaned:
+                orphaned_shards.add(lease.shard_id)
+            owned.append(lease)
+
+        for lease in owned:
+            lease.latest_heartbeat = now
+        session.commit()
+
+        self.shards = set(lease.shard_id for lease in owned)
+        Stats.gauge('scheduler_shards_owned', len(self.shards))
+        return orphaned_shards
+
+    @provide_session
+    def release(self, session=None):
+        """
+        Releases all the shards of the scheduler when it shuts down, so that
+        the other schedulers take them over without waiting for the leases to
+        expire.
+        """
+        (session
+         .query(SchedulerShardLease)
+         .filter(SchedulerShardLease.scheduler_id == self.scheduler_id)
+         .update({SchedulerShardLease.scheduler_id: None,
+                  SchedulerShardLease.latest_heartbeat: None},
+                 synchronize_session=False))
+        session.commit()
+        self.shards = set()
+
+    def owns(self, file_path, dag_folder):
+        """
+        :return: whether the scheduler owns the shard of the DAG file
+        :rtype: bool
+        """
+        return get_shard(file_path, dag_folder, self.num_shards) in self.shards
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import heapq
+import itertools
+from collections import defaultdict
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+
+class TaskQueue(MutableMapping):
+    """
+    The tasks queued in an executor, by task instance key, as
+    (command, priority, queue, task_instance) tuples.
+
+    On top of the mapping, the tasks are kept in a heap ordered by priority,
+    highest first, and in one heap per queue, so that the tasks with the
+    highest priority are popped in O(log n) each, overall or within a queue.
+    Tasks with the same priority are popped in the order they were queued.
+
+    The heaps are updated lazily: a task that is removed or replaced through
+    the mapping stays in the heaps until it reaches their top, where it is
+    recognised and skipped as its entry is no longer the current one.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        # The number of the current entry of each task in the heaps
+        self._entry_numbers = {}
+        self._heap = []
+        self._queue_heaps = defaultdict(list)
+        self._counter = itertools.count()
+
+    def __getitem__(self, key):
+        return self._tasks[key]
+
+    def __setitem__(self, key, task):
+        command, priority, queue, task_instance = task
+        number = next(self._counter)
+        self._tasks[key] = task
+        self._entry_numbers[key] = number
+        entry = (-priority, number, key)
+        heapq.heappush(self._heap, entry)
+        heapq.heappush(self._queue_heaps[queue], entry)
+        self._compact()
+
+    def __delitem__(self, key):
+        del self._tasks[key]
+        del self._entry_numbers[key]
+
+    def __iter__(self):
+        return iter(self._tasks)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __contains__(self, key):
+        return key in self._tasks
+
+    def clear(self):
+        self._tasks.clear()
+        self._entry_numbers.clear()
+        self._heap = []
+        self._queue_heaps.clear()
+
+    def _is_current(self, entry):
+        _, number, key = entry
+        return self._entry_numbers.get(key) == number
+
+    def _compact(self):
+        """
+        Drops the removed tasks from the heaps once they make up most of
+        them, so that the heaps don't grow without bound.
+        """
+        num_entries = len(self._heap) + sum(
+            len(heap) for heap in self._queue_heaps.values())
+        if num_entries <= 4 * len(self._tasks) + 64:
+            return
+        self._heap = [entry for entry in self._heap if self._is_current(entry)]
+        heapq.heapify(self._heap)
+        for queue in list(self._queue_heaps):
+            heap = [entry for entry in self._queue_heaps[queue]
+                    if self._is_current(entry)]
+            if heap:
+                heapq.heapify(heap)
+                self._queue_heaps[queue] = heap
+            else:
+                del self._queue_heaps[queue]
+
+    def pop_highest(self, count, queue=None):
+        """
+        Removes the tasks with the highest priority from the queue.
+
+        :param count: the maximum number of tasks to remove
+        :type count: int
+        :param queue: if specified, only remove tasks of this queue
+        :type queue: unicode
+        :return: the (key, task) pairs removed, highest priority first
+        :rtype: list[tuple]
+        """
+        heap = self._heap if queue is None else self._queue_heaps.get(queue, [])
+        popped = []
+        while heap and len(popped) < count:
+            entry = heapq.heappop(heap)
+            if not self._is_current(entry):
+                continue
+            key = entry[2]
+            popped.append((key, self._tasks[key]))
+            del self[key]
+        return popped
@@ -274,7 +274,10 @@ def notify_owner(f):
         if request.args.get('confirmed') == "true":
             dag_id = request.args.get('dag_id')
             task_id = request.args.get('task_id')
-            dagbag = models.DagBag(settings.DAGS_FOLDER)
+            dagbag = models.DagBag(
+                settings.DAGS_FOLDER,
+                store_serialized_dags=configuration.getboolean(
+                    'core', 'store_serialized_dags'))
             dag = dagbag.get_dag(dag_id)
             task = dag.get_task(task_id)
 
@@ -63,6 +63,7 @@ from airflow import configuration as conf
 from airflow import models
 from airflow import settings
 from airflow.api.common.experimental.mark_tasks import set_dag_run_state
+from airflow.dag.serialization import SerializedBaseOperator
 from airflow.exceptions import AirflowException
 from airflow.settings import Session
 from airflow.models import XCom, DagRun
@@ -83,7 +84,13 @@ from airflow.www.validators import GreaterEqualThan
 QUERY_LIMIT = 100000
 CHART_LIMIT = 200000
 
-dagbag = models.DagBag(settings.DAGS_FOLDER)
+STORE_SERIALIZED_DAGS = conf.getboolean('core', 'store_serialized_dags')
+
+dagbag = models.DagBag(settings.DAGS_FOLDER,
+                       store_serialized_dags=STORE_SERIALIZED_DAGS)
+if STORE_SERIALIZED_DAGS:
+    # Read the DAGs stored by the scheduler instead of executing the DAG files
+    dagbag.collect_dags()
 
 login_required = airflow.login.login_required
 current_user = airflow.login.current_user
@@ -261,7 +268,8 @@ def recurse_tasks(tasks, task_ids, dag_ids, task_id_to_dag):
         for task in tasks:
             recurse_tasks(task, task_ids, dag_ids, task_id_to_dag)
         return
-    if isinstance(tasks, SubDagOperator):
+    if (isinstance(tasks, SubDagOperator) or
+            (isinstance(tasks, SerializedBaseOperator) and tasks.subdag)):
         subtasks = tasks.subdag.tasks
         dag_ids.append(tasks.subdag.dag_id)
         for subtask in subtasks:
@@ -273,6 +281,16 @@ def recurse_tasks(tasks, task_ids, dag_ids, task_id_to_dag):
         task_id_to_dag[tasks.task_id] = tasks.dag
 
 
+def get_operator_legend(dag):
+    """
+    :return: the names and colors of the types of the tasks of the DAG
+    :rtype: list[dict]
+    """
+    colors = {task.task_type: (task.ui_color, task.ui_fgcolor) for task in dag.tasks}
+    return [{'name': name, 'ui_color': ui_color, 'ui_fgcolor': ui_fgcolor}
+            for name, (ui_color, ui_fgcolor) in sorted(colors.items())]
+
+
 def get_chart_height(dag):
     """
     TODO(aoen): See [AIRFLOW-1263] We use the number of tasks in the DAG as a heuristic to
@@ -668,7 +686,7 @@ class Airflow(BaseView):
             flash("Error rendering template: " + str(e), "error")
         title = "Rendered Template"
         html_dict = {}
-        for template_field in task.__class__.template_fields:
+        for template_field in task.template_fields:
             content = getattr(task, template_field)
             if template_field in attr_renderer:
                 html_dict[template_field] = attr_renderer[template_field](content)
@@ -1249,10 +1267,7 @@ class Airflow(BaseView):
                                              'num_runs': num_runs})
         return self.render(
             'airflow/tree.html',
-            operators=sorted(
-                list(set([op.__class__ for op in dag.tasks])),
-                key=lambda x: x.__name__
-            ),
+            operators=get_operator_legend(dag),
             root=root,
             form=form,
             dag=dag, data=data, blur=blur)
@@ -1360,10 +1375,7 @@ class Airflow(BaseView):
             state_token=state_token(dr_state),
             doc_md=doc_md,
             arrange=arrange,
-            operators=sorted(
-                list(set([op.__class__ for op in dag.tasks])),
-                key=lambda x: x.__name__
-            ),
+            operators=get_operator_legend(dag),
             blur=blur,
             root=root or '',
             task_instances=json.dumps(task_instances, indent=2),
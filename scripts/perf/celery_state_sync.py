@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures how long CeleryExecutor.sync takes to get the states of NUM_TASKS
+in-flight tasks, one task at a time and with bulk_state_sync.
+
+The result backend is a fake in-memory key-value store that waits
+ROUND_TRIP_LATENCY seconds on every request, standing for the network
+round trip to Redis or Memcached. No broker or worker is needed.
+
+    $ python scripts/perf/celery_state_sync.py
+"""
+
+import time
+
+from celery import states as celery_states
+from celery.backends.base import KeyValueStoreBackend
+from celery.result import AsyncResult
+
+from airflow.executors.celery_executor import (
+    app, BulkStateFetcher, CeleryExecutor)
+
+NUM_TASKS = 5000
+ROUND_TRIP_LATENCY = 0.0005
+# The share of the tasks in each state when the executor syncs
+STATES = [
+    (celery_states.PENDING, 0.2),
+    (celery_states.STARTED, 0.7),
+    (celery_states.SUCCESS, 0.05),
+    (celery_states.FAILURE, 0.05),
+]
+
+
+class FakeKeyValueBackend(KeyValueStoreBackend):
+    """
+    In-memory result backend counting its round trips.
+    """
+    def __init__(self, *args, **kwargs):
+        super(FakeKeyValueBackend, self).__init__(*args, **kwargs)
+        self.store = {}
+        self.round_trips = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        time.sleep(ROUND_TRIP_LATENCY)
+
+    def get(self, key):
+        self._round_trip()
+        return self.store.get(key)
+
+    def mget(self, keys):
+        self._round_trip()
+        return [self.store.get(key) for key in keys]
+
+    def set(self, key, value):
+        self.store[key] = value
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+
+def make_executor(backend, bulk):
+    executor = CeleryExecutor()
+    executor.start()
+    executor.bulk_state_fetcher = BulkStateFetcher(backend) if bulk else None
+    i = 0
+    for state, share in STATES:
+        for _ in range(int(NUM_TASKS * share)):
+            key = ('perf_celery_state_sync', 'task_{}'.format(i), i)
+            task_id = 'perf-celery-state-sync-{}'.format(i)
+            if state != celery_states.PENDING:
+                backend.store_result(task_id, None, state)
+            executor.tasks[key] = AsyncResult(task_id, backend=backend, app=app)
+            executor.last_state[key] = celery_states.PENDING
+            executor.running[key] = 'command'
+            i += 1
+    return executor
+
+
+def main():
+    for bulk in (False, True):
+        backend = FakeKeyValueBackend(app=app)
+        executor = make_executor(backend, bulk)
+        backend.round_trips = 0
+        num_tasks = len(executor.tasks)
+        start = time.time()
+        executor.sync()
+        duration = time.time() - start
+        print("{:<10} {} tasks: {:.3f}s, {} backend round trips, "
+              "{} tasks left in flight".format(
+                  'bulk' if bulk else 'per task', num_tasks, duration,
+                  backend.round_trips, len(executor.tasks)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures how long it takes to set the dependencies of synthetic DAGs of
+various shapes, i.e. the part of parsing a DAG file spent in
+BaseOperator._set_relatives. The tasks are created beforehand and are not
+part of the measurements.
+
+Each shape is built with the dependencies set from the first tasks to the
+last ones (a >> b >> c) and from the last tasks to the first ones
+(c << b << a), as the cost of cycle detection depends on the number of
+tasks already downstream.
+
+    $ python scripts/perf/dag_construction.py
+"""
+
+from datetime import datetime
+import time
+
+from airflow.models import DAG
+from airflow.operators.dummy_operator import DummyOperator
+
+# deep: a chain of DEPTH tasks
+DEPTH = 1000
+# wide: a task, WIDTH tasks downstream of it, and a task downstream of those
+WIDTH = 3000
+# diamonds: NUM_DIAMONDS diamonds in a row, i.e. each task has two tasks
+# downstream of it, which have the same task downstream of them
+NUM_DIAMONDS = 16
+# layers: NUM_LAYERS layers of LAYER_WIDTH tasks, each task being upstream of
+# all the tasks of the next layer
+NUM_LAYERS = 30
+LAYER_WIDTH = 10
+
+
+def make_tasks(dag, count, prefix='task'):
+    return [DummyOperator(task_id='{}_{}'.format(prefix, i), dag=dag)
+            for i in range(count)]
+
+
+def layered(layers):
+    """
+    :return: the calls setting each task of a layer upstream of all the tasks
+        of the next layer, from the first layer to the last one
+    """
+    return [(task.set_downstream, downstream_layer)
+            for upstream_layer, downstream_layer in zip(layers, layers[1:])
+            for task in upstream_layer]
+
+
+def deep(dag):
+    return layered([[task] for task in make_tasks(dag, DEPTH)])
+
+
+def wide(dag):
+    first, last = make_tasks(dag, 2, 'end')
+    tasks = make_tasks(dag, WIDTH)
+    return [(first.set_downstream, tasks), (last.set_upstream, tasks)]
+
+
+def diamonds(dag):
+    # A diamond is a layer of 1 task followed by a layer of 2 tasks
+    layers = []
+    for i in range(NUM_DIAMONDS):
+        layers.append(make_tasks(dag, 1, 'join_{}'.format(i)))
+        layers.append(make_tasks(dag, 2, 'fork_{}'.format(i)))
+    layers.append(make_tasks(dag, 1, 'join_last'))
+    return layered(layers)
+
+
+def layers(dag):
+    return layered([make_tasks(dag, LAYER_WIDTH, 'layer_{}'.format(i))
+                    for i in range(NUM_LAYERS)])
+
+
+SHAPES = [
+    ('deep ({} tasks)'.format(DEPTH), deep),
+    ('wide ({} tasks)'.format(WIDTH + 2), wide),
+    ('diamonds ({} tasks)'.format(NUM_DIAMONDS * 3 + 1), diamonds),
+    ('layers ({}x{} tasks)'.format(NUM_LAYERS, LAYER_WIDTH), layers),
+]
+
+
+def main():
+    for name, shape in SHAPES:
+        for reverse in (False, True):
+            dag = DAG('perf_dag_construction', start_date=datetime(2017, 1, 1))
+            calls = shape(dag)
+            if reverse:
+                calls.reverse()
+            start = time.time()
+            try:
+                for set_relatives, tasks in calls:
+                    set_relatives(tasks)
+                result = "{:.3f}s".format(time.time() - start)
+            except Exception as e:
+                result = "failed after {:.3f}s: {}".format(
+                    time.time() - start, e.__class__.__name__)
+            print("{:<24} {:<8} {}".format(
+                name, 'reverse' if reverse else 'forward', result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures how many DAG files per second the scheduler parses, with a new
+process per file (DagFileProcessor) and with a pool of long-lived workers
+(PooledDagFileProcessor).
+
+NUM_FILES synthetic DAG files are written to a temporary folder and each one
+is processed NUM_ROUNDS times with PARALLELISM files in flight at once.
+
+Point the metadata DB at a scratch database before running. With sqlite, set
+PARALLELISM to 1, e.g.:
+
+    $ AIRFLOW__CORE__SQL_ALCHEMY_CONN=sqlite:////tmp/perf.db airflow initdb
+    $ AIRFLOW__CORE__SQL_ALCHEMY_CONN=sqlite:////tmp/perf.db PARALLELISM=1 \\
+        python scripts/perf/dag_parsing_throughput.py
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from airflow.jobs import (DagFileProcessor, DagParsingWorkerPool,
+                          PooledDagFileProcessor)
+
+NUM_FILES = 200
+NUM_ROUNDS = 2
+PARALLELISM = int(os.environ.get('PARALLELISM', 8))
+# Only parse the files, don't schedule the DAGs
+DAG_ID_WHITE_LIST = ['perf_dag_parsing_no_such_dag']
+PRELOAD_MODULES = ['airflow.operators.bash_operator',
+                   'airflow.operators.python_operator']
+
+DAG_FILE = """
+from datetime import datetime
+
+from airflow.models import DAG
+from airflow.operators.bash_operator import BashOperator
+from airflow.operators.python_operator import PythonOperator
+
+dag = DAG('perf_dag_parsing_{i}', start_date=datetime(2100, 1, 1))
+for j in range(10):
+    BashOperator(task_id='bash_{{}}'.format(j), bash_command='true', dag=dag)
+    PythonOperator(task_id='python_{{}}'.format(j), python_callable=len, dag=dag)
+"""
+
+
+def process_all(file_paths, processor_factory):
+    """
+    Processes the files with at most PARALLELISM processors at once and
+    returns the number of seconds it took.
+    """
+    start = time.time()
+    queue = list(file_paths)
+    running = []
+    while queue or running:
+        while queue and len(running) < PARALLELISM:
+            processor = processor_factory(queue.pop())
+            processor.start()
+            running.append(processor)
+        running = [p for p in running if not p.done]
+        time.sleep(0.001)
+    return time.time() - start
+
+
+def main():
+    dag_folder = tempfile.mkdtemp()
+    try:
+        file_paths = []
+        for i in range(NUM_FILES):
+            file_path = os.path.join(dag_folder, 'perf_dag_{}.py'.format(i))
+            with open(file_path, 'w') as f:
+                f.write(DAG_FILE.format(i=i))
+            file_paths.append(file_path)
+        file_paths *= NUM_ROUNDS
+
+        duration = process_all(
+            file_paths,
+            lambda file_path: DagFileProcessor(file_path, False, DAG_ID_WHITE_LIST))
+        print("Process per file: {:.1f} files/s".format(len(file_paths) / duration))
+
+        worker_pool = DagParsingWorkerPool(PARALLELISM, False, DAG_ID_WHITE_LIST,
+                                           100, 1024, PRELOAD_MODULES)
+        worker_pool.start()
+        try:
+            duration = process_all(
+                file_paths,
+                lambda file_path: PooledDagFileProcessor(file_path, worker_pool))
+        finally:
+            worker_pool.terminate()
+        print("Worker pool: {:.1f} files/s".format(len(file_paths) / duration))
+    finally:
+        shutil.rmtree(dag_folder)
+
+
+if __name__ == '__main__':
+    main()
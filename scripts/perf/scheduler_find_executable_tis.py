@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures the number of SQL queries and the wall time spent per scheduling
+pass in SchedulerJob._find_executable_task_instances.
+
+A synthetic dataset of NUM_DAGS DAGs with TASKS_PER_DAG tasks each is
+written to the metadata DB (one task instance per task, spread over
+NUM_POOLS pools), the scheduling pass is run NUM_LOOPS times, and the
+synthetic rows are removed again.
+
+Point the metadata DB at a scratch database before running, e.g.:
+
+    $ AIRFLOW__CORE__SQL_ALCHEMY_CONN=sqlite:////tmp/perf.db airflow initdb
+    $ AIRFLOW__CORE__SQL_ALCHEMY_CONN=sqlite:////tmp/perf.db \\
+        python scripts/perf/scheduler_find_executable_tis.py
+"""
+
+from datetime import datetime
+import logging
+import time
+
+from sqlalchemy import event
+
+from airflow import settings
+from airflow.jobs import SchedulerJob
+from airflow.models import DAG, Pool, TaskInstance
+from airflow.operators.dummy_operator import DummyOperator
+from airflow.utils.dag_processing import SimpleDag, SimpleDagBag
+from airflow.utils.state import State
+
+DAG_ID_PREFIX = 'perf_find_executable_tis_'
+NUM_DAGS = 1000
+TASKS_PER_DAG = 50
+NUM_POOLS = 10
+POOL_SLOTS = 5000
+NUM_LOOPS = 3
+EXECUTION_DATE = datetime(2017, 1, 1)
+
+
+class QueryCounter(object):
+    """
+    Counts the statements sent to the metadata DB while active.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _before_cursor_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute',
+                     self._before_cursor_execute)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.engine, 'before_cursor_execute',
+                     self._before_cursor_execute)
+
+
+def pool_name(i):
+    return '{}pool_{}'.format(DAG_ID_PREFIX, i % NUM_POOLS)
+
+
+def build_simple_dag_bag():
+    simple_dags = []
+    for i in range(NUM_DAGS):
+        dag = DAG(DAG_ID_PREFIX + str(i), start_date=EXECUTION_DATE,
+                  concurrency=16)
+        for j in range(TASKS_PER_DAG):
+            DummyOperator(task_id='task_{}'.format(j), dag=dag,
+                          task_concurrency=4 if j % 10 == 0 else None)
+        simple_dags.append(SimpleDag(dag))
+    return SimpleDagBag(simple_dags)
+
+
+def populate(session):
+    for i in range(NUM_POOLS):
+        session.add(Pool(pool=pool_name(i), slots=POOL_SLOTS))
+    rows = []
+    for i in range(NUM_DAGS):
+        for j in range(TASKS_PER_DAG):
+            # roughly one in ten task instances is already running
+            state = State.RUNNING if j % 10 == 1 else State.SCHEDULED
+            rows.append({
+                'dag_id': DAG_ID_PREFIX + str(i),
+                'task_id': 'task_{}'.format(j),
+                'execution_date': EXECUTION_DATE,
+                'state': state,
+                'pool': pool_name(i),
+                'priority_weight': 1,
+                'try_number': 0,
+            })
+    session.bulk_insert_mappings(TaskInstance, rows)
+    session.commit()
+
+
+def clear(session):
+    TI = TaskInstance
+    (session.query(TI)
+        .filter(TI.dag_id.like(DAG_ID_PREFIX + '%'))
+        .delete(synchronize_session=False))
+    (session.query(Pool)
+        .filter(Pool.pool.like(DAG_ID_PREFIX + '%'))
+        .delete(synchronize_session=False))
+    session.commit()
+
+
+def main():
+    logging.getLogger('airflow').setLevel(logging.WARNING)
+    session = settings.Session()
+    clear(session)
+
+    print('Building {} DAGs with {} tasks each'.format(NUM_DAGS, TASKS_PER_DAG))
+    simple_dag_bag = build_simple_dag_bag()
+    populate(session)
+
+    job = SchedulerJob()
+    job.log.setLevel(logging.WARNING)
+    try:
+        for loop in range(NUM_LOOPS):
+            with QueryCounter(settings.engine) as counter:
+                start = time.time()
+                tis = job._find_executable_task_instances(
+                    simple_dag_bag, states=(State.SCHEDULED,), session=session)
+                elapsed = time.time() - start
+            print('loop {}: {} executable task instances, {} queries, {:.3f}s'
+                  .format(loop, len(tis), counter.count, elapsed))
+            session.rollback()
+    finally:
+        clear(session)
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
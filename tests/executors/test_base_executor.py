@@ -14,7 +14,12 @@
 
 import unittest
 
+import mock
+
+from airflow import settings
 from airflow.executors.base_executor import BaseExecutor
+from airflow.models import DAG, TaskInstance
+from airflow.operators.dummy_operator import DummyOperator
 from airflow.utils.state import State
 
 from datetime import datetime
@@ -38,3 +43,34 @@ class BaseExecutorTest(unittest.TestCase):
         self.assertEqual(len(executor.get_event_buffer()), 2)
         self.assertEqual(len(executor.event_buffer), 0)
 
+    def test_heartbeat_dispatches_batch(self):
+        dag = DAG('test_heartbeat_dispatches_batch', start_date=datetime(2017, 1, 1))
+        tasks = [DummyOperator(task_id='task_{}'.format(i), dag=dag, owner='airflow')
+                 for i in range(3)]
+        session = settings.Session()
+        tis = [TaskInstance(task, datetime(2017, 1, 1)) for task in tasks]
+        for ti in tis:
+            ti.state = State.QUEUED
+            session.merge(ti)
+        session.commit()
+
+        executor = BaseExecutor(parallelism=2)
+        for priority, ti in enumerate(tis):
+            executor.queue_command(ti, 'command', priority=priority, queue='queue')
+        # Another job started running the task with the highest priority
+        session.query(TaskInstance).filter(
+            TaskInstance.task_id == 'task_2').update({'state': State.RUNNING})
+        session.commit()
+
+        with mock.patch.object(executor, 'execute_async_batch') as execute_async_batch:
+            executor.heartbeat()
+        execute_async_batch.assert_called_once_with(
+            [(tis[1].key, 'command', 'queue')])
+        self.assertEqual([tis[1].key], list(executor.running))
+        self.assertEqual([tis[0].key], list(executor.queued_tasks))
+        self.assertEqual(State.RUNNING, tis[2].state)
+
+        session.query(TaskInstance).filter(
+            TaskInstance.dag_id == dag.dag_id).delete()
+        session.commit()
+        session.close()
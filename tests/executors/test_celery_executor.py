@@ -11,18 +11,49 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import unittest
+import os
+import shutil
 import sys
+import tempfile
+import unittest
+
+import mock
 
 from airflow.executors.celery_executor import app
-from airflow.executors.celery_executor import CeleryExecutor
+from airflow.executors.celery_executor import BulkStateFetcher, CeleryExecutor
 from airflow.utils.state import State
+from celery import states as celery_states
+from celery.backends.base import KeyValueStoreBackend
+from celery.backends.database import DatabaseBackend
 from celery.contrib.testing.worker import start_worker
+from celery.result import AsyncResult
 
 # leave this it is used by the test worker
 import celery.contrib.testing.tasks
 
 
+class InMemoryBackend(KeyValueStoreBackend):
+    def __init__(self, *args, **kwargs):
+        super(InMemoryBackend, self).__init__(*args, **kwargs)
+        self.store = {}
+        self.get_calls = 0
+        self.mget_calls = 0
+
+    def get(self, key):
+        self.get_calls += 1
+        return self.store.get(key)
+
+    def mget(self, keys):
+        self.mget_calls += 1
+        return [self.store.get(key) for key in keys]
+
+    def set(self, key, value):
+        self.store[key] = value
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+
 class CeleryExecutorTest(unittest.TestCase):
 
     def test_celery_integration(self):
@@ -50,6 +81,81 @@ class CeleryExecutorTest(unittest.TestCase):
         self.assertNotIn('success', executor.tasks)
         self.assertNotIn('fail', executor.tasks)
 
+    def _check_bulk_state_fetcher(self, backend):
+        backend.store_result('success-id', None, celery_states.SUCCESS)
+        backend.store_result('fail-id', None, celery_states.FAILURE)
+        results = [AsyncResult(task_id, backend=backend, app=app)
+                   for task_id in ('success-id', 'fail-id', 'pending-id')]
+        backend.get_calls = 0
+
+        self.assertEqual({
+            'success-id': celery_states.SUCCESS,
+            'fail-id': celery_states.FAILURE,
+            'pending-id': celery_states.PENDING,
+        }, BulkStateFetcher(backend).get_many(results))
+
+    def test_bulk_state_fetcher_kv_backend(self):
+        backend = InMemoryBackend(app=app)
+        self._check_bulk_state_fetcher(backend)
+        self.assertEqual(0, backend.get_calls)
+        self.assertEqual(1, backend.mget_calls)
+
+    def test_bulk_state_fetcher_db_backend(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            url = 'sqlite:///' + os.path.join(tmp_dir, 'results.db')
+            self._check_bulk_state_fetcher(DatabaseBackend(url=url, app=app))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_sync_in_bulk(self):
+        backend = InMemoryBackend(app=app)
+        backend.store_result('success-id', None, celery_states.SUCCESS)
+        executor = CeleryExecutor()
+        executor.start()
+        executor.bulk_state_fetcher = BulkStateFetcher(backend)
+        for key in ('success', 'pending'):
+            executor.tasks[key] = AsyncResult(key + '-id', backend=backend, app=app)
+            executor.last_state[key] = celery_states.PENDING
+            executor.running[key] = True
+        backend.get_calls = 0
+
+        executor.sync()
+
+        self.assertEqual(0, backend.get_calls)
+        self.assertEqual(1, backend.mget_calls)
+        self.assertEqual({'success': State.SUCCESS}, executor.event_buffer)
+        self.assertEqual(['pending'], list(executor.tasks))
+        self.assertEqual(['pending'], list(executor.last_state))
+
+    @mock.patch('airflow.executors.celery_executor.app.producer_or_acquire')
+    @mock.patch('airflow.executors.celery_executor.execute_command.apply_async')
+    def test_execute_async_batch(self, apply_async, producer_or_acquire):
+        def send(args, queue, producer):
+            if args == ['fail']:
+                raise IOError("Broker unavailable")
+            return AsyncResult(args[0] + '-id', app=app)
+        apply_async.side_effect = send
+
+        executor = CeleryExecutor()
+        executor.start()
+        commands = ['command_{}'.format(i) for i in range(10)] + ['fail']
+        for command in commands:
+            executor.running[command] = command
+
+        executor.execute_async_batch(
+            [(command, command, 'queue') for command in commands])
+
+        self.assertEqual(len(commands), apply_async.call_count)
+        self.assertEqual(min(executor.send_task_parallelism, len(commands)),
+                         producer_or_acquire.call_count)
+        self.assertEqual({'fail': State.FAILED}, executor.event_buffer)
+        self.assertEqual(sorted(commands[:-1]), sorted(executor.tasks))
+        for command, async_result in executor.tasks.items():
+            self.assertEqual(command + '-id', async_result.task_id)
+        executor.tasks.clear()
+        executor.end()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import mock
+
+from airflow.executors.local_executor import LocalExecutor
+from airflow.utils.state import State
+
+
+class LocalExecutorTest(unittest.TestCase):
+
+    def _run_commands(self, commands, fork_tasks):
+        executor = LocalExecutor(parallelism=2)
+        with mock.patch('airflow.executors.local_executor.configuration.getboolean',
+                        return_value=fork_tasks):
+            executor.start()
+        for key, command in commands.items():
+            executor.running[key] = command
+            executor.execute_async(key=key, command=command)
+        executor.end()
+        return executor.event_buffer
+
+    def test_execution(self):
+        commands = {'success': 'true', 'fail': 'exit 1'}
+        self.assertEqual({'success': State.SUCCESS, 'fail': State.FAILED},
+                         self._run_commands(commands, fork_tasks=False))
+
+    def test_execution_in_fork(self):
+        commands = {
+            'success': 'airflow version',
+            'fail': 'airflow no_such_command',
+            'bash': 'true',
+        }
+        self.assertEqual(
+            {'success': State.SUCCESS, 'fail': State.FAILED, 'bash': State.SUCCESS},
+            self._run_commands(commands, fork_tasks=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
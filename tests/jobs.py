@@ -24,6 +24,7 @@ import os
 import shutil
 import six
 import socket
+import signal
 import threading
 import time
 import unittest
@@ -33,14 +34,17 @@ from airflow import AirflowException, settings, models
 from airflow.bin import cli
 from airflow.executors import BaseExecutor, SequentialExecutor
 from airflow.jobs import BackfillJob, SchedulerJob, LocalTaskJob
+from airflow.jobs import DagParsingWorkerPool, PooledDagFileProcessor
 from airflow.models import DAG, DagModel, DagBag, DagRun, Pool, TaskInstance as TI
 from airflow.operators.dummy_operator import DummyOperator
 from airflow.operators.bash_operator import BashOperator
 from airflow.task_runner.base_task_runner import BaseTaskRunner
+from airflow.task_runner.fork_task_runner import ForkTaskRunner
 from airflow.utils.dates import days_ago
 from airflow.utils.db import provide_session
 from airflow.utils.state import State
 from airflow.utils.timeout import timeout
+from airflow.utils.dag_parse_cache import DagParseCache
 from airflow.utils.dag_processing import SimpleDag, SimpleDagBag, list_py_file_paths
 
 from mock import Mock, patch
@@ -778,6 +782,20 @@ class LocalTaskJobTest(unittest.TestCase):
         Test that ensures that mark_success in the UI doesn't cause
         the task to fail, and that the task exits
         """
+        self._test_mark_success_no_kill()
+
+    def test_mark_success_no_kill_background_heartbeat(self):
+        """
+        Test that the task exits once marked success in the UI when the
+        job reads the state of its task instance from the heartbeat thread
+        """
+        configuration.set('scheduler', 'background_heartbeat', 'True')
+        try:
+            self._test_mark_success_no_kill()
+        finally:
+            configuration.set('scheduler', 'background_heartbeat', 'False')
+
+    def _test_mark_success_no_kill(self):
         dagbag = models.DagBag(
             dag_folder=TEST_DAG_FOLDER,
             include_examples=False,
@@ -788,6 +806,8 @@ class LocalTaskJobTest(unittest.TestCase):
         session = settings.Session()
 
         dag.clear()
+        session.query(DagRun).filter(DagRun.dag_id == dag.dag_id).delete()
+        session.commit()
         dr = dag.create_dagrun(run_id="test",
                                state=State.RUNNING,
                                execution_date=DEFAULT_DATE,
@@ -850,6 +870,84 @@ class LocalTaskJobTest(unittest.TestCase):
 
         session.close()
 
+    @patch('airflow.jobs.get_task_runner', ForkTaskRunner)
+    def test_localtaskjob_fork_task_runner(self):
+        dagbag = models.DagBag(
+            dag_folder=TEST_DAG_FOLDER,
+            include_examples=False,
+        )
+        dag = dagbag.dags.get('test_example_bash_operator')
+        task = dag.get_task('runme_0')
+
+        session = settings.Session()
+        dag.clear()
+        dag.create_dagrun(run_id="test",
+                          state=State.RUNNING,
+                          execution_date=DEFAULT_DATE,
+                          start_date=DEFAULT_DATE,
+                          session=session)
+        session.close()
+
+        ti = TI(task=task, execution_date=DEFAULT_DATE)
+        job1 = LocalTaskJob(task_instance=ti, ignore_ti_state=True,
+                            executor=SequentialExecutor())
+        job1.run()
+
+        self.assertEqual(0, job1.task_runner.return_code())
+        ti.refresh_from_db()
+        self.assertEqual(State.SUCCESS, ti.state)
+
+        session = settings.Session()
+        session.query(DagRun).filter(DagRun.dag_id == dag.dag_id).delete()
+        session.commit()
+        session.close()
+
+    @patch('airflow.jobs.get_task_runner', ForkTaskRunner)
+    def test_localtaskjob_fork_task_runner_mark_success(self):
+        """
+        Test that the task forked by the ForkTaskRunner is killed when the
+        task instance is marked successful externally
+        """
+        dagbag = models.DagBag(
+            dag_folder=TEST_DAG_FOLDER,
+            include_examples=False,
+        )
+        dag = dagbag.dags.get('test_mark_success')
+        task = dag.get_task('task1')
+
+        session = settings.Session()
+
+        dag.clear()
+        dag.create_dagrun(run_id="test",
+                          state=State.RUNNING,
+                          execution_date=DEFAULT_DATE,
+                          start_date=DEFAULT_DATE,
+                          session=session)
+        ti = TI(task=task, execution_date=DEFAULT_DATE)
+        ti.refresh_from_db()
+        job1 = LocalTaskJob(task_instance=ti, ignore_ti_state=True)
+        process = multiprocessing.Process(target=job1.run)
+        process.start()
+        ti.refresh_from_db()
+        for i in range(0, 50):
+            if ti.state == State.RUNNING:
+                break
+            time.sleep(0.1)
+            ti.refresh_from_db()
+        self.assertEqual(State.RUNNING, ti.state)
+        ti.state = State.SUCCESS
+        session.merge(ti)
+        session.commit()
+
+        process.join(timeout=5)
+        self.assertFalse(process.is_alive())
+        ti.refresh_from_db()
+        self.assertEqual(State.SUCCESS, ti.state)
+
+        session.query(DagRun).filter(DagRun.dag_id == dag.dag_id).delete()
+        session.commit()
+        session.close()
+
 
 class SchedulerJobTest(unittest.TestCase):
     # These defaults make the test faster to run
@@ -884,6 +982,177 @@ class SchedulerJobTest(unittest.TestCase):
     def _make_simple_dag_bag(self, dags):
         return SimpleDagBag([SimpleDag(dag) for dag in dags])
 
+    def test_process_file_dag_parse_cache(self):
+        dag_id = 'test_process_file_dag_parse_cache'
+        dag_folder = mkdtemp()
+        file_path = os.path.join(dag_folder, 'dag.py')
+        dag_file = (
+            "from datetime import datetime\n"
+            "from airflow.models import DAG\n"
+            "from airflow.operators.dummy_operator import DummyOperator\n"
+            "dag = DAG('{}', start_date=datetime(2100, 1, 1))\n"
+            "DummyOperator(task_id='{}', dag=dag)\n")
+        with open(file_path, 'w') as f:
+            f.write(dag_file.format(dag_id, 'dummy'))
+
+        scheduler = SchedulerJob(**self.default_scheduler_args)
+        scheduler.dag_parse_cache = DagParseCache(os.path.join(dag_folder, 'cache'), 300)
+        real_dag_bag = models.DagBag
+        try:
+            with patch.object(models, 'DagBag', side_effect=lambda path: real_dag_bag(
+                    path, include_examples=False)) as dag_bag:
+                simple_dags = scheduler.process_file(file_path)
+                self.assertEqual([dag_id], [d.dag_id for d in simple_dags])
+                self.assertEqual(1, dag_bag.call_count)
+
+                # The next DagRun is not due before 2100, the file is not
+                # executed again
+                simple_dags = scheduler.process_file(file_path)
+                self.assertEqual([dag_id], [d.dag_id for d in simple_dags])
+                self.assertEqual(['dummy'], simple_dags[0].task_ids)
+                self.assertEqual(1, dag_bag.call_count)
+
+                with open(file_path, 'w') as f:
+                    f.write(dag_file.format(dag_id, 'dummy_changed'))
+                simple_dags = scheduler.process_file(file_path)
+                self.assertEqual(['dummy_changed'], simple_dags[0].task_ids)
+                self.assertEqual(2, dag_bag.call_count)
+
+                # Pausing the DAG invalidates the entry
+                session = settings.Session()
+                session.query(DagModel).filter(DagModel.dag_id == dag_id).update(
+                    {DagModel.is_paused: True})
+                session.commit()
+                session.close()
+                self.assertEqual([], scheduler.process_file(file_path))
+                self.assertEqual(3, dag_bag.call_count)
+                self.assertEqual([], scheduler.process_file(file_path))
+                self.assertEqual(3, dag_bag.call_count)
+        finally:
+            session = settings.Session()
+            session.query(DagModel).filter(DagModel.dag_id == dag_id).delete()
+            session.commit()
+            session.close()
+            shutil.rmtree(dag_folder)
+
+    def test_process_file_store_serialized_dags(self):
+        dag_id = 'test_process_file_store_serialized_dags'
+        dag_folder = mkdtemp()
+        file_path = os.path.join(dag_folder, 'dag.py')
+        dag_file = (
+            "from datetime import datetime\n"
+            "from airflow.models import DAG\n"
+            "from airflow.operators.dummy_operator import DummyOperator\n"
+            "dag = DAG('{}', start_date=datetime(2100, 1, 1))\n"
+            "DummyOperator(task_id='dummy', dag=dag)\n")
+        with open(file_path, 'w') as f:
+            f.write(dag_file.format(dag_id))
+
+        scheduler = SchedulerJob(**self.default_scheduler_args)
+        scheduler.store_serialized_dags = True
+        real_dag_bag = models.DagBag
+        try:
+            with patch.object(models, 'DagBag', side_effect=lambda path: real_dag_bag(
+                    path, include_examples=False)):
+                scheduler.process_file(file_path)
+                row = models.SerializedDagModel.get(dag_id)
+                self.assertEqual(file_path, row.fileloc)
+                self.assertEqual(['dummy'], row.dag.task_ids)
+
+                # A broken file keeps its last DAGs
+                with open(file_path, 'w') as f:
+                    f.write("from airflow.models import DAG\nraise Exception()\n")
+                scheduler.process_file(file_path)
+                self.assertIsNotNone(models.SerializedDagModel.get(dag_id))
+
+                # The DAGs removed from the file are removed
+                with open(file_path, 'w') as f:
+                    f.write(dag_file.format(dag_id + '_renamed'))
+                scheduler.process_file(file_path)
+                self.assertIsNone(models.SerializedDagModel.get(dag_id))
+                self.assertIsNotNone(models.SerializedDagModel.get(dag_id + '_renamed'))
+
+                # And so are the DAGs of the deleted files
+                models.SerializedDagModel.remove_deleted_dags(dag_folder, [])
+                self.assertIsNone(models.SerializedDagModel.get(dag_id + '_renamed'))
+        finally:
+            shutil.rmtree(dag_folder)
+
+    def test_find_and_kill_zombies(self):
+        dag = DAG(dag_id='test_find_and_kill_zombies', start_date=DEFAULT_DATE)
+        task = DummyOperator(task_id='dummy', dag=dag, owner='airflow')
+        dag.fileloc = '/dags/test_find_and_kill_zombies.py'
+
+        session = settings.Session()
+        session.merge(DagModel(dag_id=dag.dag_id, fileloc=dag.fileloc))
+        ti = TI(task=task, execution_date=DEFAULT_DATE)
+        job = LocalTaskJob(task_instance=ti)
+        job.state = State.RUNNING
+        job.latest_heartbeat = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        session.add(job)
+        session.commit()
+        ti.job_id = job.id
+        ti.state = State.RUNNING
+        ti.start_date = job.latest_heartbeat
+        session.merge(ti)
+        session.commit()
+
+        scheduler = SchedulerJob(**self.default_scheduler_args)
+        zombies = scheduler.find_zombies()
+        self.assertEqual([dag.fileloc], list(zombies))
+        self.assertEqual([ti.key], [zombie.key for zombie in zombies[dag.fileloc]])
+
+        # The file the DAG was last processed from takes precedence
+        scheduler._dag_file_paths[dag.dag_id] = '/dags/processed.py'
+        self.assertEqual(['/dags/processed.py'], list(scheduler.find_zombies()))
+
+        dagbag = DagBag(include_examples=False)
+        dagbag.bag_dag(dag, parent_dag=dag, root_dag=dag)
+        dagbag.kill_zombies(zombies[dag.fileloc])
+        ti.refresh_from_db()
+        self.assertEqual(State.FAILED, ti.state)
+        self.assertEqual({}, scheduler.find_zombies())
+        session.close()
+
+    def test_dag_parsing_worker_pool(self):
+        file_path = os.path.join(TEST_DAGS_FOLDER, 'test_scheduler_dags.py')
+        worker_pool = DagParsingWorkerPool(
+            size=1,
+            pickle_dags=False,
+            dag_id_white_list=[],
+            max_files_per_worker=2,
+            max_memory_mb_per_worker=1024,
+            preload_modules=['airflow.operators.dummy_operator'])
+        worker_pool.start()
+        try:
+            pids = []
+            for _ in range(3):
+                processor = PooledDagFileProcessor(file_path, worker_pool)
+                processor.start()
+                pids.append(processor.pid)
+                while not processor.done:
+                    time.sleep(0.1)
+                self.assertEqual(0, processor.exit_code)
+                self.assertIn('test_start_date_scheduling',
+                              [simple_dag.dag_id for simple_dag in processor.result])
+            # The worker is reused, then replaced after max_files_per_worker files
+            self.assertEqual(pids[0], pids[1])
+            self.assertNotEqual(pids[1], pids[2])
+
+            # A worker that dies without a result has its file sent to
+            # another worker
+            processor = PooledDagFileProcessor(file_path, worker_pool)
+            processor.start()
+            killed_pid = processor.pid
+            os.kill(killed_pid, signal.SIGKILL)
+            while not processor.done:
+                time.sleep(0.1)
+            self.assertEqual(0, processor.exit_code)
+            self.assertIn('test_start_date_scheduling',
+                          [simple_dag.dag_id for simple_dag in processor.result])
+        finally:
+            worker_pool.terminate()
+
     def test_process_executor_events(self):
         dag_id = "test_process_executor_events"
         dag_id2 = "test_process_executor_events_2"
@@ -929,6 +1198,50 @@ class SchedulerJobTest(unittest.TestCase):
         ti1.refresh_from_db()
         self.assertEqual(ti1.state, State.SUCCESS)
 
+    def test_process_executor_events_after_pool_ledger_reconciled(self):
+        dag_id = "test_process_executor_events_after_pool_ledger_reconciled"
+        pool = 'test_process_executor_events_pool'
+        dag = DAG(dag_id=dag_id, start_date=DEFAULT_DATE)
+        task1 = DummyOperator(dag=dag, task_id='dummy1', pool=pool)
+        task2 = DummyOperator(dag=dag, task_id='dummy2', pool=pool)
+        dagbag = self._make_simple_dag_bag([dag])
+
+        scheduler = SchedulerJob(**self.default_scheduler_args)
+        executor = TestExecutor()
+        scheduler.executor = executor
+        session = settings.Session()
+        session.merge(Pool(pool=pool, slots=2))
+        ti1 = TI(task1, DEFAULT_DATE)
+        ti2 = TI(task2, DEFAULT_DATE)
+        ti1.state = State.SCHEDULED
+        ti2.state = State.SCHEDULED
+        session.merge(ti1)
+        session.merge(ti2)
+        session.commit()
+
+        try:
+            scheduler.pool_ledger.refresh(session=session)
+            scheduler._change_state_for_executable_task_instances(
+                [ti1, ti2], [State.SCHEDULED], session)
+            self.assertEqual(2, scheduler.pool_ledger.used_slots(pool))
+
+            # The task instance finishes and the ledger is reconciled before
+            # the executor reports it
+            ti1.state = State.SUCCESS
+            session.merge(ti1)
+            session.commit()
+            scheduler.pool_ledger.reconcile(session=session)
+            self.assertEqual(1, scheduler.pool_ledger.used_slots(pool))
+
+            executor.event_buffer[ti1.key] = State.SUCCESS
+            scheduler._process_executor_events(simple_dag_bag=dagbag)
+            self.assertEqual(1, scheduler.pool_ledger.used_slots(pool))
+        finally:
+            session.query(Pool).filter(Pool.pool == pool).delete()
+            session.query(TI).filter(TI.dag_id == dag_id).delete()
+            session.commit()
+            session.close()
+
     def test_execute_task_instances_is_paused_wont_execute(self):
         dag_id = 'SchedulerJobTest.test_execute_task_instances_is_paused_wont_execute'
         task_id_1 = 'dummy_task'
@@ -1155,6 +1468,67 @@ class SchedulerJobTest(unittest.TestCase):
 
         self.assertEqual(0, len(res))
 
+    def test_find_executable_task_instances_concurrency_removed_task(self):
+        dag_id = 'SchedulerJobTest.test_find_executable_task_instances_concurrency_removed_task'
+        dag = DAG(dag_id=dag_id, start_date=DEFAULT_DATE, concurrency=1)
+        task1 = DummyOperator(dag=dag, task_id='dummy')
+        removed_task = DummyOperator(dag=dag, task_id='removed')
+
+        scheduler = SchedulerJob(**self.default_scheduler_args)
+        session = settings.Session()
+
+        dr1 = scheduler.create_dag_run(dag)
+
+        ti1 = TI(task1, dr1.execution_date)
+        ti_removed = TI(removed_task, dr1.execution_date)
+        ti1.state = State.SCHEDULED
+        ti_removed.state = State.RUNNING
+        session.merge(ti1)
+        session.merge(ti_removed)
+        session.commit()
+
+        # The running task instance of the removed task doesn't count
+        # towards the concurrency of the DAG
+        dag.task_dict.pop(removed_task.task_id)
+        dagbag = self._make_simple_dag_bag([dag])
+        res = scheduler._find_executable_task_instances(
+            dagbag,
+            states=[State.SCHEDULED],
+            session=session)
+
+        self.assertEqual([ti1.key], [ti.key for ti in res])
+
+    def test_find_executable_task_instances_concurrency_across_pools(self):
+        dag_id = 'SchedulerJobTest.test_find_executable_task_instances_concurrency_across_pools'
+        dag = DAG(dag_id=dag_id, start_date=DEFAULT_DATE, concurrency=1)
+        task1 = DummyOperator(dag=dag, task_id='dummy', pool='concurrency_a')
+        task2 = DummyOperator(dag=dag, task_id='dummydummy', pool='concurrency_b')
+        dagbag = self._make_simple_dag_bag([dag])
+
+        scheduler = SchedulerJob(**self.default_scheduler_args)
+        session = settings.Session()
+
+        dr1 = scheduler.create_dag_run(dag)
+
+        ti1 = TI(task1, dr1.execution_date)
+        ti2 = TI(task2, dr1.execution_date)
+        ti1.state = State.SCHEDULED
+        ti2.state = State.SCHEDULED
+        session.merge(ti1)
+        session.merge(ti2)
+        session.add(models.Pool(pool='concurrency_a', slots=10, description='haha'))
+        session.add(models.Pool(pool='concurrency_b', slots=10, description='haha'))
+        session.commit()
+
+        res = scheduler._find_executable_task_instances(
+            dagbag,
+            states=[State.SCHEDULED],
+            session=session)
+
+        # the DAG concurrency limit holds even though the tasks sit in
+        # different pools
+        self.assertEqual(1, len(res))
+
     def test_find_executable_task_instances_task_concurrency(self):
         dag_id = 'SchedulerJobTest.test_find_executable_task_instances_task_concurrency'
         task_id_1 = 'dummy'
@@ -1257,7 +1631,7 @@ class SchedulerJobTest(unittest.TestCase):
         dag_id = 'SchedulerJobTest.test_change_state_for__no_tis_with_state'
         task_id_1 = 'dummy'
         dag = DAG(dag_id=dag_id, start_date=DEFAULT_DATE, concurrency=2)
-        task1 = DummyOperator(dag=dag, task_id=task_id_1)
+        task1 = DummyOperator(dag=dag, task_id=task_id_1, pool='test_pool')
         dagbag = self._make_simple_dag_bag([dag])
 
         scheduler = SchedulerJob(**self.default_scheduler_args)
@@ -1284,12 +1658,13 @@ class SchedulerJobTest(unittest.TestCase):
             [State.RUNNING],
             session)
         self.assertEqual(0, len(res))
+        self.assertEqual(0, scheduler.pool_ledger.used_slots('test_pool'))
 
     def test_change_state_for_executable_task_instances_none_state(self):
         dag_id = 'SchedulerJobTest.test_change_state_for__none_state'
         task_id_1 = 'dummy'
         dag = DAG(dag_id=dag_id, start_date=DEFAULT_DATE, concurrency=2)
-        task1 = DummyOperator(dag=dag, task_id=task_id_1)
+        task1 = DummyOperator(dag=dag, task_id=task_id_1, pool='test_pool')
         dagbag = self._make_simple_dag_bag([dag])
 
         scheduler = SchedulerJob(**self.default_scheduler_args)
@@ -1316,6 +1691,8 @@ class SchedulerJobTest(unittest.TestCase):
             [State.NONE, State.SCHEDULED],
             session)
         self.assertEqual(2, len(res))
+        # Only the TIs set to queued take a slot
+        self.assertEqual(2, scheduler.pool_ledger.used_slots('test_pool'))
         ti1.refresh_from_db()
         ti3.refresh_from_db()
         self.assertEqual(State.QUEUED, ti1.state)
@@ -1566,7 +1943,10 @@ class SchedulerJobTest(unittest.TestCase):
         executor = TestExecutor()
         scheduler.executor = executor
 
-        scheduler._execute_helper(processor_manager=processor)
+        with mock.patch('airflow.jobs.DagFolderWatcher.close') as close_watcher:
+            scheduler._execute_helper(processor_manager=processor)
+        # The watcher created by _execute_helper is closed on exit
+        close_watcher.assert_called_once_with()
 
         ti = dr.get_task_instance(task_id=op1.task_id, session=session)
         self.assertEqual(ti.state, State.NONE)
@@ -1828,6 +2208,112 @@ class SchedulerJobTest(unittest.TestCase):
             (dag.dag_id, dag_task1.task_id, DEFAULT_DATE)
         )
 
+    def test_scheduler_process_task_instances_unchanged_dag_run(self):
+        """
+        Test that the state of a DagRun is only updated again once its task
+        instances changed.
+        """
+        dag = DAG(
+            dag_id='test_scheduler_process_task_instances_unchanged_dag_run',
+            start_date=DEFAULT_DATE)
+        DummyOperator(task_id='dummy', dag=dag, owner='airflow')
+
+        session = settings.Session()
+        orm_dag = DagModel(dag_id=dag.dag_id)
+        session.merge(orm_dag)
+        session.commit()
+
+        scheduler = SchedulerJob()
+        dag.clear()
+        dr = scheduler.create_dag_run(dag)
+        self.assertIsNotNone(dr)
+
+        with mock.patch.object(DagRun, 'update_state', autospec=True,
+                               side_effect=DagRun.update_state) as update_state:
+            scheduler._process_task_instances(dag, queue=[])
+            self.assertEqual(1, update_state.call_count)
+            scheduler._process_task_instances(dag, queue=[])
+            self.assertEqual(1, update_state.call_count)
+
+            ti = dr.get_task_instance('dummy', session=session)
+            ti.set_state(State.RUNNING, session)
+            scheduler._process_task_instances(dag, queue=[])
+            self.assertEqual(2, update_state.call_count)
+        session.close()
+
+    def test_scheduler_process_task_instances_dag_run_set_running(self):
+        """
+        Test that the state of a finished DagRun that is set back to RUNNING
+        is updated again, even if its task instances didn't change.
+        """
+        dag = DAG(
+            dag_id='test_scheduler_process_task_instances_dag_run_set_running',
+            start_date=DEFAULT_DATE)
+        DummyOperator(task_id='dummy', dag=dag, owner='airflow')
+
+        session = settings.Session()
+        orm_dag = DagModel(dag_id=dag.dag_id)
+        session.merge(orm_dag)
+        session.commit()
+
+        scheduler = SchedulerJob()
+        dag.clear()
+        dr = scheduler.create_dag_run(dag)
+        self.assertIsNotNone(dr)
+        ti = dr.get_task_instance('dummy', session=session)
+        ti.set_state(State.SUCCESS, session)
+
+        scheduler._process_task_instances(dag, queue=[])
+        dr = DagRun.find(dag_id=dag.dag_id, session=session)[0]
+        self.assertEqual(State.SUCCESS, dr.state)
+
+        dr.state = State.RUNNING
+        session.commit()
+        scheduler._process_task_instances(dag, queue=[])
+        session.expire_all()
+        dr = DagRun.find(dag_id=dag.dag_id, session=session)[0]
+        self.assertEqual(State.SUCCESS, dr.state)
+        session.close()
+
+    def test_scheduler_schedule_task_instances(self):
+        """
+        Test that _schedule_task_instances sets the task instances of a
+        DagRun to SCHEDULED in bulk, creating the missing ones.
+        """
+        dag = DAG(
+            dag_id='test_scheduler_schedule_task_instances',
+            start_date=DEFAULT_DATE)
+        for task_id in ('dummy1', 'dummy2', 'dummy3'):
+            DummyOperator(task_id=task_id, dag=dag, owner='airflow')
+
+        session = settings.Session()
+        orm_dag = DagModel(dag_id=dag.dag_id)
+        session.merge(orm_dag)
+        session.commit()
+
+        scheduler = SchedulerJob()
+        dag.clear()
+        dr = scheduler.create_dag_run(dag)
+        self.assertIsNotNone(dr)
+
+        running_ti = dr.get_task_instance('dummy2', session=session)
+        running_ti.state = State.RUNNING
+        missing_ti = dr.get_task_instance('dummy3', session=session)
+        session.delete(missing_ti)
+        session.commit()
+
+        dagbag = mock.Mock(dags={dag.dag_id: dag})
+        ti_keys = [(dag.dag_id, task_id, dr.execution_date)
+                   for task_id in ('dummy1', 'dummy2', 'dummy3')]
+        scheduler._schedule_task_instances(dagbag, ti_keys, session=session)
+
+        states = {ti.task_id: ti.state
+                  for ti in dr.get_task_instances(session=session)}
+        self.assertEqual(states, {'dummy1': State.SCHEDULED,
+                                  'dummy2': State.RUNNING,
+                                  'dummy3': State.SCHEDULED})
+        session.close()
+
     def test_scheduler_do_not_schedule_removed_task(self):
         dag = DAG(
             dag_id='test_scheduler_do_not_schedule_removed_task',
@@ -2294,6 +2780,56 @@ class SchedulerJobTest(unittest.TestCase):
 
         sla_callback.assert_not_called()
 
+    @mock.patch('airflow.jobs.send_email')
+    def test_scheduler_manage_slas_for_dags(self, mock_send_email):
+        """
+        Test that the SLA misses of several DAGs are recorded and that their
+        common recipients get a single email
+        """
+        session = settings.Session()
+        session.query(models.SlaMiss).filter(
+            models.SlaMiss.dag_id.like('test_sla_miss_batch_%')).delete(
+                synchronize_session=False)
+        test_start_date = days_ago(3)
+        dags = []
+        for dag_id in ('test_sla_miss_batch_1', 'test_sla_miss_batch_2'):
+            dag = DAG(dag_id=dag_id,
+                      default_args={'start_date': test_start_date,
+                                    'sla': datetime.timedelta(seconds=1)})
+            task = DummyOperator(task_id='dummy', dag=dag, owner='airflow',
+                                 email='owner@example.com')
+            DummyOperator(task_id='no_sla', dag=dag, owner='airflow', sla=None)
+            session.merge(models.TaskInstance(task=task,
+                                              execution_date=test_start_date,
+                                              state='success'))
+            dags.append(dag)
+        session.commit()
+
+        scheduler = SchedulerJob(num_runs=1, **self.default_scheduler_args)
+        scheduler.manage_slas_for_dags(dags, session=session)
+
+        SlaMiss = models.SlaMiss
+        for dag in dags:
+            slas = (session.query(SlaMiss)
+                    .filter(SlaMiss.dag_id == dag.dag_id)
+                    .all())
+            # The runs of the two days following the successful run
+            self.assertEqual(
+                [test_start_date + datetime.timedelta(days=1),
+                 test_start_date + datetime.timedelta(days=2)],
+                sorted(sla.execution_date for sla in slas))
+            self.assertTrue(all(sla.task_id == 'dummy' for sla in slas))
+            self.assertTrue(all(sla.email_sent and sla.notification_sent
+                                for sla in slas))
+        mock_send_email.assert_called_once()
+        self.assertEqual(['owner@example.com'], mock_send_email.call_args[0][0])
+
+        # The misses are only recorded and notified once
+        scheduler.manage_slas_for_dags(dags, session=session)
+        mock_send_email.assert_called_once()
+        self.assertEqual(4, session.query(SlaMiss).filter(
+            SlaMiss.dag_id.in_([dag.dag_id for dag in dags])).count())
+
     def test_retry_still_in_executor(self):
         """
         Checks if the scheduler does not put a task in limbo, when a task is retried
@@ -199,6 +199,80 @@ class DagTest(unittest.TestCase):
 
         self.assertEquals(tuple(), dag.topological_sort())
 
+    def test_dag_graph_index(self):
+        dag = DAG('dag', start_date=DEFAULT_DATE)
+
+        # A -> (B u C) -> D
+        with dag:
+            op1 = DummyOperator(task_id='A', priority_weight=1)
+            op2 = DummyOperator(task_id='B', priority_weight=2)
+            op3 = DummyOperator(task_id='C', priority_weight=3)
+            op4 = DummyOperator(task_id='D', priority_weight=4)
+            op1.set_downstream([op2, op3])
+            op4.set_upstream([op2, op3])
+
+        # D is only counted once
+        self.assertEqual(10, op1.priority_weight_total)
+        self.assertEqual(6, op2.priority_weight_total)
+        self.assertEqual(4, op4.priority_weight_total)
+        self.assertEqual(['A', 'B', 'C', 'D'], dag.graph_index.topological_order)
+        self.assertEqual([op1, op2, op3], op4.get_flat_relatives(upstream=True))
+        self.assertEqual([op2, op3, op4], op1.get_flat_relatives(upstream=False))
+        self.assertEqual([op2, op3], op4.upstream_list)
+
+        # Adding tasks and dependencies invalidates the index
+        index = dag.graph_index
+        self.assertIs(index, dag.graph_index)
+        op5 = DummyOperator(task_id='E', priority_weight=5, dag=dag)
+        self.assertIsNot(index, dag.graph_index)
+        op4.set_downstream(op5)
+        self.assertEqual(15, op1.priority_weight_total)
+        self.assertEqual([op5], op4.downstream_list)
+
+    def test_topological_waves(self):
+        dag = DAG('dag', start_date=DEFAULT_DATE)
+
+        # A -> B -> D, A -> C, E
+        with dag:
+            op1 = DummyOperator(task_id='A')
+            op2 = DummyOperator(task_id='B')
+            op3 = DummyOperator(task_id='C')
+            op4 = DummyOperator(task_id='D')
+            op5 = DummyOperator(task_id='E')
+            op1.set_downstream([op2, op3])
+            op2.set_downstream(op4)
+
+        self.assertEqual(((op1, op5), (op2, op3), (op4,)), dag.topological_waves())
+
+        # The sort is cached until dependencies are added
+        sorted_tasks = dag.topological_sort()
+        self.assertIs(sorted_tasks, dag.topological_sort())
+        op4.set_downstream(op5)
+        self.assertIsNot(sorted_tasks, dag.topological_sort())
+        self.assertEqual(((op1,), (op2, op3), (op4,), (op5,)),
+                         dag.topological_waves())
+
+    def test_cycle_detection_diamonds(self):
+        """
+        Test that cycles are detected without walking every path of DAGs
+        made of many diamonds
+        """
+        dag = DAG('dag', start_date=DEFAULT_DATE)
+        joins = [DummyOperator(task_id='join_{}'.format(i), dag=dag)
+                 for i in range(100)]
+        # Set from the last diamond to the first one, so that each new
+        # dependency has 2^i paths downstream of it
+        for i in reversed(range(len(joins) - 1)):
+            forks = [DummyOperator(task_id='fork_{}_{}'.format(i, j), dag=dag)
+                     for j in range(2)]
+            joins[i].set_downstream(forks)
+            joins[i + 1].set_upstream(forks)
+
+        with self.assertRaisesRegexp(AirflowException, 'Cycle detected'):
+            joins[-1].set_downstream(joins[0])
+        with self.assertRaisesRegexp(AirflowException, 'already registered'):
+            joins[0].set_downstream(dag.get_task('fork_0_0'))
+
     def test_get_num_task_instances(self):
         test_dag_id = 'test_get_num_task_instances_dag'
         test_task_id = 'task_1'
@@ -342,6 +416,38 @@ class DagStatTest(unittest.TestCase):
         for stat in res:
             self.assertFalse(stat.dirty)
 
+    def test_dagstats_follow_dag_runs(self):
+        dag_id = 'test_dagstats_follow_dag_runs'
+        DagStat.create(dag_id=dag_id)
+        dag = DAG(dag_id, start_date=DEFAULT_DATE)
+        DummyOperator(task_id='A', dag=dag, owner='airflow')
+
+        session = settings.Session()
+
+        def counts():
+            session.expire_all()
+            return {stat.state: stat.count for stat in session.query(DagStat)
+                    .filter(DagStat.dag_id == dag_id)}
+
+        dr = dag.create_dagrun(
+            run_id='manual__1',
+            execution_date=DEFAULT_DATE,
+            state=State.RUNNING,
+            session=session)
+        self.assertEqual(1, counts()[State.RUNNING])
+
+        dr.set_state(State.SUCCESS)
+        session.merge(dr)
+        session.commit()
+        self.assertEqual(
+            {State.RUNNING: 0, State.SUCCESS: 1, State.FAILED: 0}, counts())
+
+        session.delete(session.merge(dr))
+        session.commit()
+        self.assertEqual(
+            {State.RUNNING: 0, State.SUCCESS: 0, State.FAILED: 0}, counts())
+        session.close()
+
 class DagRunTest(unittest.TestCase):
 
     def create_dag_run(self, dag, state=State.RUNNING, task_states=None, execution_date=None):
@@ -517,6 +623,44 @@ class DagRunTest(unittest.TestCase):
         dr.update_state()
         self.assertEqual(dr.state, State.FAILED)
 
+    def test_dagrun_task_states_signatures(self):
+        session = settings.Session()
+        dag = DAG(
+            'test_dagrun_task_states_signatures',
+            start_date=DEFAULT_DATE,
+            default_args={'owner': 'owner1'})
+
+        with dag:
+            op1 = DummyOperator(task_id='A')
+            op2 = DummyOperator(task_id='B')
+            op2.set_upstream(op1)
+
+        dag.clear()
+        dr1 = self.create_dag_run(dag, execution_date=DEFAULT_DATE)
+        dr2 = self.create_dag_run(
+            dag, execution_date=DEFAULT_DATE + datetime.timedelta(days=1))
+
+        signatures = models.DagRun.get_task_states_signatures(dag, [dr1, dr2])
+        self.assertEqual(
+            signatures,
+            models.DagRun.get_task_states_signatures(dag, [dr1, dr2]))
+
+        ti_op1 = dr1.get_task_instance(task_id=op1.task_id)
+        ti_op1.set_state(state=State.SUCCESS, session=session)
+        new_signatures = models.DagRun.get_task_states_signatures(dag, [dr1, dr2])
+        self.assertNotEqual(signatures[dr1.execution_date],
+                            new_signatures[dr1.execution_date])
+        self.assertEqual(signatures[dr2.execution_date],
+                         new_signatures[dr2.execution_date])
+
+        # changing the structure of the DAG changes the signatures as well
+        op2.trigger_rule = TriggerRule.ALL_DONE
+        self.assertNotEqual(
+            new_signatures[dr2.execution_date],
+            models.DagRun.get_task_states_signatures(
+                dag, [dr2])[dr2.execution_date])
+        session.close()
+
     def test_dagrun_no_deadlock(self):
         session = settings.Session()
         dag = DAG('test_dagrun_no_deadlock',
@@ -700,6 +844,112 @@ class DagBagTest(unittest.TestCase):
                 dag.fileloc.endswith('airflow/example_dags/' + path))
 
 
+class SerializedDagModelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.example_dagbag = models.DagBag(include_examples=True)
+        session = settings.Session()
+        session.query(models.SerializedDagModel).delete()
+        session.commit()
+        session.close()
+
+    tearDown = setUp
+
+    def test_serialize_dag(self):
+        """
+        Test that the deserialized DAGs have the attributes, the tasks and
+        the subdags of the original DAGs
+        """
+        from airflow.dag.serialization import (SerializedBaseOperator,
+                                               deserialize_dag, serialize_dag)
+        dag = self.example_dagbag.get_dag('example_subdag_operator')
+        deserialized_dag = deserialize_dag(serialize_dag(dag))
+
+        self.assertEqual(dag.dag_id, deserialized_dag.dag_id)
+        self.assertEqual(dag.fileloc, deserialized_dag.fileloc)
+        self.assertEqual(dag.start_date, deserialized_dag.start_date)
+        self.assertEqual(dag._schedule_interval, deserialized_dag._schedule_interval)
+        self.assertEqual(sorted(dag.task_ids), sorted(deserialized_dag.task_ids))
+        for task in dag.tasks:
+            deserialized_task = deserialized_dag.get_task(task.task_id)
+            self.assertIsInstance(deserialized_task, SerializedBaseOperator)
+            self.assertEqual(task.task_type, deserialized_task.task_type)
+            self.assertEqual(task.ui_color, deserialized_task.ui_color)
+            self.assertEqual(task.owner, deserialized_task.owner)
+            self.assertEqual(task.retry_delay, deserialized_task.retry_delay)
+            self.assertEqual(sorted(task.upstream_task_ids),
+                             sorted(deserialized_task.upstream_task_ids))
+            self.assertEqual(sorted(task.downstream_task_ids),
+                             sorted(deserialized_task.downstream_task_ids))
+        self.assertEqual(sorted(subdag.dag_id for subdag in dag.subdags),
+                         sorted(subdag.dag_id for subdag in deserialized_dag.subdags))
+        subdag = deserialized_dag.get_task('section-1').subdag
+        self.assertTrue(subdag.is_subdag)
+        self.assertIs(deserialized_dag, subdag.parent_dag)
+
+        # The template fields keep their values
+        dag = self.example_dagbag.get_dag('example_bash_operator')
+        deserialized_task = deserialize_dag(serialize_dag(dag)).get_task('also_run_this')
+        self.assertEqual(('bash_command', 'env'), tuple(deserialized_task.template_fields))
+        self.assertEqual(dag.get_task('also_run_this').bash_command,
+                         deserialized_task.bash_command)
+        with self.assertRaises(AirflowException):
+            deserialized_task.execute({})
+
+    def test_write_dag(self):
+        """
+        Test that the DAGs are only stored again when they changed
+        """
+        dag = self.example_dagbag.get_dag('example_bash_operator')
+        self.assertTrue(models.SerializedDagModel.write_dag(dag))
+        self.assertFalse(models.SerializedDagModel.write_dag(dag))
+        dag.get_task('run_after_loop').bash_command = 'echo changed'
+        self.assertTrue(models.SerializedDagModel.write_dag(dag))
+
+        models.SerializedDagModel.remove_stale_dags(dag.full_filepath, [dag.dag_id])
+        self.assertIsNotNone(models.SerializedDagModel.get(dag.dag_id))
+        models.SerializedDagModel.remove_deleted_dags(
+            os.path.dirname(dag.full_filepath), [dag.full_filepath])
+        self.assertIsNotNone(models.SerializedDagModel.get(dag.dag_id))
+        models.SerializedDagModel.remove_stale_dags(dag.full_filepath, [])
+        self.assertIsNone(models.SerializedDagModel.get(dag.dag_id))
+
+        self.assertTrue(models.SerializedDagModel.write_dag(dag))
+        models.SerializedDagModel.remove_deleted_dags(
+            os.path.dirname(dag.full_filepath), ['/no/such/dag.py'], chunk_size=1)
+        self.assertIsNone(models.SerializedDagModel.get(dag.dag_id))
+
+    def test_dagbag_store_serialized_dags(self):
+        """
+        Test that a DagBag reading the stored DAGs loads them on demand,
+        subdags included, and reads them again when they are stored again
+        """
+        for dag_id in ['example_bash_operator', 'example_subdag_operator']:
+            models.SerializedDagModel.write_dag(self.example_dagbag.get_dag(dag_id))
+
+        with patch.object(models.DagBag, 'process_file') as process_file:
+            dagbag = models.DagBag(include_examples=True, store_serialized_dags=True)
+            self.assertEqual(0, dagbag.size())
+
+            subdag = dagbag.get_dag('example_subdag_operator.section-1')
+            self.assertIsNotNone(subdag)
+            self.assertTrue(subdag.is_subdag)
+            self.assertEqual(['example_subdag_operator',
+                              'example_subdag_operator.section-1',
+                              'example_subdag_operator.section-2'],
+                             sorted(dagbag.dags))
+            self.assertIsNone(dagbag.get_dag('example_branch_operator'))
+
+            dag = dagbag.get_dag('example_bash_operator')
+            self.assertIs(dag, dagbag.get_dag('example_bash_operator'))
+            dag.last_loaded = datetime.datetime(2000, 1, 1)
+            self.assertIsNot(dag, dagbag.get_dag('example_bash_operator'))
+
+            dagbag.collect_dags()
+            self.assertEqual(4, dagbag.size())
+        process_file.assert_not_called()
+
+
 class TaskInstanceTest(unittest.TestCase):
 
     def test_set_task_dates(self):
@@ -1282,6 +1532,32 @@ class TaskInstanceTest(unittest.TestCase):
         self.assertEquals(1, ti2.get_num_running_task_instances(session=session))
         self.assertEquals(1, ti3.get_num_running_task_instances(session=session))
 
+    def test_refresh_many_from_db(self):
+        session = settings.Session()
+
+        dag = models.DAG(dag_id='test_refresh_many_from_db')
+        task = DummyOperator(task_id='task', dag=dag, start_date=DEFAULT_DATE)
+        tis = [TI(task=task, execution_date=DEFAULT_DATE + datetime.timedelta(days=i))
+               for i in range(5)]
+        for ti in tis[:4]:
+            ti.state = State.RUNNING
+            session.merge(ti)
+        session.commit()
+
+        tis_to_refresh = [TI(task=task, execution_date=ti.execution_date)
+                          for ti in tis]
+        with patch.object(session, 'query', wraps=session.query) as query:
+            TI.refresh_many_from_db(tis_to_refresh, max_tis_per_query=2,
+                                    session=session)
+            # The task instances are queried 2 at a time
+            self.assertEqual(3, query.call_count)
+        self.assertEqual([State.RUNNING] * 4 + [None],
+                         [ti.state for ti in tis_to_refresh])
+
+        session.query(TI).filter(TI.dag_id == dag.dag_id).delete()
+        session.commit()
+        session.close()
+
 
 class ClearTasksTest(unittest.TestCase):
     def test_clear_task_instances(self):
@@ -250,3 +250,23 @@ class TriggerRuleDepTest(unittest.TestCase):
 
         self.assertEqual(len(dep_statuses), 1)
         self.assertFalse(dep_statuses[0].passed)
+
+    def test_count_upstream_states(self):
+        """
+        Upstream states are counted from the task instances of the DagRun
+        """
+        ti = self._get_task_instance(
+            upstream_task_ids=['success', 'skipped', 'failed', 'upstream_failed',
+                               'running', 'missing'])
+        dag_run_tis = {}
+        for task_id, state in (('success', State.SUCCESS),
+                               ('skipped', State.SKIPPED),
+                               ('failed', State.FAILED),
+                               ('upstream_failed', State.UPSTREAM_FAILED),
+                               ('running', State.RUNNING),
+                               ('not_upstream', State.SUCCESS)):
+            dag_run_tis[task_id] = self._get_task_instance(state=state)
+
+        self.assertEqual(
+            (1, 1, 1, 1, 4),
+            TriggerRuleDep._count_upstream_states(ti, dag_run_tis))
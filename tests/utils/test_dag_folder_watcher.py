@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch
+
+from airflow.utils import dag_processing
+from airflow.utils.dag_folder_watcher import DagFolderWatcher, Inotify
+from airflow.utils.helpers import wait_for_handles
+
+DAG_CONTENT = "from airflow import DAG\n"
+
+
+def inotify_available():
+    try:
+        Inotify().close()
+        return True
+    except OSError:
+        return False
+
+
+class TestDagFolderWatcher(unittest.TestCase):
+    def setUp(self):
+        self.dag_folder = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.dag_folder, 'subdir'))
+        self.dag_file = self._write('dag.py', DAG_CONTENT)
+        self._write('not_a_dag.py', "print('hello')\n")
+        self._write('subdir/README.md', "docs\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.dag_folder)
+
+    def _write(self, name, content):
+        file_path = os.path.join(self.dag_folder, name)
+        with open(file_path, 'w') as f:
+            f.write(content)
+        return file_path
+
+    def test_poll(self):
+        watcher = DagFolderWatcher(self.dag_folder, DagFolderWatcher.POLL)
+        self.assertTrue(watcher.check(full_scan=True))
+        self.assertEqual([self.dag_file], watcher.file_paths)
+        self.assertEqual([], watcher.get_wait_handles())
+
+        # Unchanged files are not read again
+        with patch.object(dag_processing.zipfile, 'is_zipfile') as is_zipfile, \
+                patch.object(dag_processing, 'open', create=True) as mock_open:
+            self.assertFalse(watcher.check(full_scan=True))
+        is_zipfile.assert_not_called()
+        mock_open.assert_not_called()
+
+        # Changes are only picked up by the full scans
+        new_dag_file = self._write('subdir/new_dag.py', DAG_CONTENT)
+        self._write('not_a_dag.py', "print('hello')\n" + DAG_CONTENT)
+        os.remove(self.dag_file)
+        self.assertFalse(watcher.check())
+        self.assertTrue(watcher.check(full_scan=True))
+        self.assertEqual(sorted([new_dag_file,
+                                 os.path.join(self.dag_folder, 'not_a_dag.py')]),
+                         watcher.file_paths)
+
+    @unittest.skipUnless(inotify_available(), "inotify is not available")
+    def test_inotify(self):
+        watcher = DagFolderWatcher(self.dag_folder, DagFolderWatcher.INOTIFY)
+        try:
+            self.assertTrue(watcher.check(full_scan=True))
+            self.assertEqual([self.dag_file], watcher.file_paths)
+            self.assertFalse(watcher.check())
+
+            new_dag_file = self._write('subdir/new_dag.py', DAG_CONTENT)
+            self.assertTrue(wait_for_handles(watcher.get_wait_handles(), 5))
+            self.assertTrue(watcher.check())
+            self.assertEqual(sorted([self.dag_file, new_dag_file]), watcher.file_paths)
+
+            # A file no longer passing the safe mode heuristic is dropped
+            self._write('dag.py', "print('hello')\n")
+            self.assertTrue(watcher.check())
+            self.assertEqual([new_dag_file], watcher.file_paths)
+
+            # Changes to the directory tree are picked up by a full scan
+            os.mkdir(os.path.join(self.dag_folder, 'other'))
+            other_dag_file = self._write('other/dag.py', DAG_CONTENT)
+            self.assertTrue(watcher.check())
+            self.assertEqual(sorted([new_dag_file, other_dag_file]), watcher.file_paths)
+        finally:
+            watcher.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
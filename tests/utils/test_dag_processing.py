@@ -12,11 +12,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import shutil
+import tempfile
 import unittest
+from datetime import datetime
 
-from mock import MagicMock
+from mock import MagicMock, patch
 
-from airflow.utils.dag_processing import DagFileProcessorManager
+from airflow.utils import dag_processing
+from airflow.utils.dag_processing import (DagFileProcessorManager, SimpleTaskInstance,
+                                          list_py_file_paths)
 
 
 class TestDagFileProcessorManager(unittest.TestCase):
@@ -49,3 +55,76 @@ class TestDagFileProcessorManager(unittest.TestCase):
 
         manager.set_file_paths(['abc.txt'])
         self.assertDictEqual(manager._processors, {'abc.txt': mock_processor})
+
+    def test_add_zombies(self):
+        processor_factory = MagicMock()
+        manager = DagFileProcessorManager(dag_directory='directory',
+                                          file_paths=['abc.txt', 'def.txt'],
+                                          parallelism=1, process_file_interval=1,
+                                          max_runs=-1, processor_factory=processor_factory)
+        manager._file_path_queue = ['abc.txt', 'def.txt']
+        zombie = SimpleTaskInstance('dag', 'task', datetime(2017, 1, 1))
+
+        manager.add_zombies({'def.txt': [zombie], 'unknown.txt': [zombie]})
+        self.assertEqual(['def.txt', 'abc.txt'], manager._file_path_queue)
+
+        # The file with zombies is processed first, along with its zombies
+        manager.heartbeat()
+        processor_factory.assert_called_once_with('def.txt', [zombie])
+        processor_factory.reset_mock()
+        manager._processors.clear()
+        manager.heartbeat()
+        processor_factory.assert_called_once_with('abc.txt', [])
+
+
+class TestListPyFilePaths(unittest.TestCase):
+    def setUp(self):
+        self.dag_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dag_folder)
+
+    def _write(self, name, content="from airflow import DAG\n"):
+        file_path = os.path.join(self.dag_folder, name)
+        if not os.path.isdir(os.path.dirname(file_path)):
+            os.makedirs(os.path.dirname(file_path))
+        with open(file_path, 'w') as f:
+            f.write(content)
+        return file_path
+
+    def test_airflowignore_scope(self):
+        kept = [self._write('dag.py'),
+                self._write('a/dag.py'),
+                self._write('b/ignored_in_a.py')]
+        self._write('.airflowignore', 'vendor\n')
+        self._write('vendor/lib/dag.py')
+        self._write('a/.airflowignore', 'ignored_in_a\n')
+        self._write('a/ignored_in_a.py')
+
+        self.assertEqual(sorted(kept),
+                         sorted(list_py_file_paths(self.dag_folder)))
+
+    def test_airflowignore_pruned_and_cached(self):
+        kept = self._write('dag.py')
+        self._write('.airflowignore', 'vendor\n')
+        self._write('vendor/dag.py')
+
+        walked = []
+        real_walk = os.walk
+
+        def walk(*args, **kwargs):
+            for root, dirs, files in real_walk(*args, **kwargs):
+                walked.append(root)
+                yield root, dirs, files
+
+        with patch.object(dag_processing.os, 'walk', side_effect=walk):
+            self.assertEqual([kept], list_py_file_paths(self.dag_folder))
+        # The ignored directory is not traversed
+        self.assertEqual([self.dag_folder], walked)
+
+        ignore_file = os.path.join(self.dag_folder, '.airflowignore')
+        patterns = dag_processing.read_ignore_patterns(ignore_file)
+        self.assertIs(patterns, dag_processing.read_ignore_patterns(ignore_file))
+
+        self._write('.airflowignore', 'nothing\n')
+        self.assertEqual(2, len(list_py_file_paths(self.dag_folder)))
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import unittest
+
+from airflow import settings
+from airflow.jobs import BaseJob
+from airflow.models import DAG, TaskInstance
+from airflow.operators.dummy_operator import DummyOperator
+from airflow.utils.heartbeat import HeartbeatThread
+from airflow.utils.state import State
+
+
+DEFAULT_DATE = datetime.datetime(2016, 1, 1)
+DAG_ID = 'test_heartbeat_thread_dag'
+
+
+class TestHeartbeatThread(unittest.TestCase):
+    def setUp(self):
+        self.session = settings.Session()
+        self.job_ids = []
+        past = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        for _ in range(2):
+            job = BaseJob()
+            job.state = State.RUNNING
+            job.latest_heartbeat = past
+            self.session.add(job)
+            self.session.commit()
+            self.job_ids.append(job.id)
+        self.past = past
+
+    def tearDown(self):
+        self.session.query(BaseJob).filter(
+            BaseJob.id.in_(self.job_ids)).delete(synchronize_session=False)
+        self.session.query(TaskInstance).filter(
+            TaskInstance.dag_id == DAG_ID).delete()
+        self.session.commit()
+        self.session.close()
+
+    def _latest_heartbeats(self):
+        self.session.expire_all()
+        return dict(self.session.query(BaseJob.id, BaseJob.latest_heartbeat)
+                    .filter(BaseJob.id.in_(self.job_ids)))
+
+    def test_beat(self):
+        # Not started, the beats are sent from the test
+        thread = HeartbeatThread(heartrate=1)
+        for job_id in self.job_ids:
+            thread.register(job_id)
+
+        thread.beat()
+        for job_id, latest_heartbeat in self._latest_heartbeats().items():
+            self.assertGreater(latest_heartbeat, self.past)
+            self.assertFalse(thread.is_shut_down(job_id))
+
+        killed_id, running_id = self.job_ids
+        (self.session.query(BaseJob)
+         .filter(BaseJob.id == killed_id)
+         .update({BaseJob.state: State.SHUTDOWN,
+                  BaseJob.latest_heartbeat: self.past}))
+        self.session.commit()
+        thread.beat()
+        self.assertTrue(thread.is_shut_down(killed_id))
+        self.assertFalse(thread.is_shut_down(running_id))
+        latest_heartbeats = self._latest_heartbeats()
+        self.assertEqual(self.past, latest_heartbeats[killed_id])
+        self.assertGreater(latest_heartbeats[running_id], self.past)
+
+        thread.unregister(killed_id)
+        self.assertFalse(thread.is_shut_down(killed_id))
+        self.assertIsNone(thread.get_latest_beat(killed_id))
+
+    def test_task_instance_state(self):
+        dag = DAG(DAG_ID, start_date=DEFAULT_DATE)
+        running_ti = TaskInstance(DummyOperator(task_id='running', dag=dag),
+                                  DEFAULT_DATE)
+        running_ti.state = State.RUNNING
+        running_ti.hostname = 'host'
+        running_ti.pid = 123
+        self.session.merge(running_ti)
+        self.session.commit()
+        missing_ti = TaskInstance(DummyOperator(task_id='missing', dag=dag),
+                                  DEFAULT_DATE)
+
+        thread = HeartbeatThread(heartrate=1)
+        running_id, missing_id = self.job_ids
+        for job_id in self.job_ids:
+            thread.register(job_id)
+        thread.register_task_instance(running_id, running_ti.key)
+        thread.register_task_instance(missing_id, missing_ti.key)
+        self.assertIsNone(thread.get_task_instance_state(running_id))
+
+        # The states are read on the beat, along with the heartbeats
+        thread.beat()
+        self.assertEqual((State.RUNNING, 'host', 123),
+                         thread.get_task_instance_state(running_id))
+        self.assertEqual((None, None, None),
+                         thread.get_task_instance_state(missing_id))
+
+        (self.session.query(TaskInstance)
+         .filter(TaskInstance.dag_id == DAG_ID)
+         .update({TaskInstance.state: State.SUCCESS}))
+        self.session.commit()
+        thread.beat()
+        self.assertEqual((State.SUCCESS, 'host', 123),
+                         thread.get_task_instance_state(running_id))
+
+        thread.unregister(running_id)
+        self.assertIsNone(thread.get_task_instance_state(running_id))
+
+    def test_wait_for_beat(self):
+        thread = HeartbeatThread(heartrate=0.1)
+        self.assertFalse(thread.wait_for_beat(timeout=0.2))
+        thread.start()
+        try:
+            self.assertTrue(thread.wait_for_beat(timeout=5))
+        finally:
+            thread.stop()
@@ -84,6 +84,21 @@ class TestHelpers(unittest.TestCase):
         self.assertFalse(helpers.kill_using_shell(logging.getLogger(), pid_to_kill,
                                                   signal=signal.SIGKILL))
 
+    def test_wait_for_handles(self):
+        result_queue = multiprocessing.Queue()
+        handles = [result_queue._reader]
+
+        start = time.time()
+        self.assertFalse(helpers.wait_for_handles(handles, 0.2))
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+        # A result put from another process wakes up the waiter
+        child = multiprocessing.Process(target=result_queue.put, args=('done',))
+        child.start()
+        self.assertTrue(helpers.wait_for_handles(handles, 10))
+        self.assertEqual('done', result_queue.get())
+        child.join()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from sqlalchemy import event
+
+from airflow import settings
+from airflow.utils.loop_profiler import LoopProfiler
+
+
+class TestLoopProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = LoopProfiler('test_loop', history_size=2)
+        self.profiler.start()
+
+    def tearDown(self):
+        self.profiler.stop()
+
+    def _run_query(self):
+        session = settings.Session()
+        session.execute('SELECT 1')
+        session.close()
+
+    def test_phases(self):
+        for _ in range(3):
+            self.profiler.start_loop()
+            with self.profiler.phase('query'):
+                self._run_query()
+                self._run_query()
+            with self.profiler.phase('no_query'):
+                pass
+            self.profiler.end_loop()
+
+        # only the last loops are kept
+        self.assertEqual(2, len(self.profiler.history))
+        loop = self.profiler.history[-1]
+        self.assertEqual(['query', 'no_query', LoopProfiler.TOTAL], list(loop))
+        self.assertEqual(2, loop['query'][1])
+        self.assertEqual(0, loop['no_query'][1])
+        self.assertEqual(2, loop[LoopProfiler.TOTAL][1])
+
+        report = self.profiler.report()
+        self.assertIn('Avg Queries', report)
+        lines = report.splitlines()
+        self.assertTrue(lines[2].startswith('query'))
+        self.assertTrue(lines[-1].startswith(LoopProfiler.TOTAL))
+
+    def test_stop(self):
+        self.profiler.stop()
+        self.assertFalse(event.contains(
+            settings.engine, 'before_cursor_execute', self.profiler._count_query))
+
+        self.profiler.start_loop()
+        with self.profiler.phase('query'):
+            self._run_query()
+        self.profiler.end_loop()
+        self.assertEqual(0, self.profiler.history[-1]['query'][1])
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import unittest
+
+from airflow import settings
+from airflow.models import DAG, Pool, TaskInstance
+from airflow.operators.dummy_operator import DummyOperator
+from airflow.utils.pool_ledger import PoolLedger
+from airflow.utils.state import State
+
+DEFAULT_DATE = datetime.datetime(2016, 1, 1)
+POOL = 'test_pool_ledger'
+DAG_ID = 'test_pool_ledger_dag'
+
+
+class TestPoolLedger(unittest.TestCase):
+    def setUp(self):
+        self.session = settings.Session()
+        self._clean()
+        self.session.add(Pool(pool=POOL, slots=3))
+        dag = DAG(DAG_ID, start_date=DEFAULT_DATE)
+        self.tasks = [DummyOperator(task_id='dummy_{}'.format(i), dag=dag, pool=POOL)
+                      for i in range(3)]
+        self.session.commit()
+
+    def tearDown(self):
+        self._clean()
+        self.session.close()
+
+    def _clean(self):
+        self.session.query(Pool).filter(Pool.pool == POOL).delete()
+        self.session.query(TaskInstance).filter(TaskInstance.dag_id == DAG_ID).delete()
+        self.session.commit()
+
+    def _set_state(self, task, state):
+        ti = TaskInstance(task, DEFAULT_DATE)
+        ti.state = state
+        self.session.merge(ti)
+        self.session.commit()
+
+    def test_seeded_from_db(self):
+        self._set_state(self.tasks[0], State.RUNNING)
+        self._set_state(self.tasks[1], State.QUEUED)
+        self._set_state(self.tasks[2], State.SCHEDULED)
+
+        ledger = PoolLedger(reconcile_interval=10)
+        ledger.refresh(session=self.session)
+
+        self.assertTrue(ledger.has_pool(POOL))
+        self.assertFalse(ledger.has_pool('no_such_pool'))
+        self.assertEqual(2, ledger.used_slots(POOL))
+        self.assertEqual(1, ledger.open_slots(POOL))
+
+    def test_incremental_updates_until_reconciled(self):
+        ledger = PoolLedger(reconcile_interval=2)
+        ledger.refresh(session=self.session)
+        self.assertEqual(3, ledger.open_slots(POOL))
+
+        keys = [TaskInstance(task, DEFAULT_DATE).key for task in self.tasks]
+        ledger.take_slots(POOL, keys[0])
+        ledger.take_slots(POOL, keys[1])
+        ledger.take_slots(POOL, keys[1])
+        self.assertEqual(1, ledger.open_slots(POOL))
+        ledger.release_slots(keys[0])
+        self.assertEqual(2, ledger.open_slots(POOL))
+        ledger.release_slots(keys[1])
+        ledger.release_slots(keys[1])
+        ledger.release_slots(keys[2])
+        self.assertEqual(3, ledger.open_slots(POOL))
+
+        # the ledger is not reconciled until the interval has passed
+        self._set_state(self.tasks[0], State.RUNNING)
+        ledger.refresh(session=self.session)
+        self.assertEqual(3, ledger.open_slots(POOL))
+        ledger.refresh(session=self.session)
+        self.assertEqual(2, ledger.open_slots(POOL))
+
+    def test_invalidate(self):
+        ledger = PoolLedger(reconcile_interval=10)
+        ledger.refresh(session=self.session)
+        for task in self.tasks:
+            ledger.take_slots(POOL, TaskInstance(task, DEFAULT_DATE).key)
+        self.assertEqual(0, ledger.open_slots(POOL))
+
+        ledger.invalidate()
+        ledger.refresh(session=self.session)
+        self.assertEqual(3, ledger.open_slots(POOL))
+
+    def test_release_after_reconcile(self):
+        ledger = PoolLedger(reconcile_interval=10)
+        ledger.refresh(session=self.session)
+        finished_ti = TaskInstance(self.tasks[0], DEFAULT_DATE)
+        ledger.take_slots(POOL, finished_ti.key)
+        self._set_state(self.tasks[1], State.RUNNING)
+
+        # The task instance finishes before the ledger is reconciled, and
+        # the executor reports it after
+        self._set_state(self.tasks[0], State.SUCCESS)
+        ledger.reconcile(session=self.session)
+        self.assertEqual(2, ledger.open_slots(POOL))
+        ledger.release_slots(finished_ti.key)
+        self.assertEqual(2, ledger.open_slots(POOL))
+
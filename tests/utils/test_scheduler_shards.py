@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import unittest
+
+from airflow import settings
+from airflow.jobs import SchedulerJob
+from airflow.models import SchedulerShardLease
+from airflow.utils.scheduler_shards import ShardLeaseManager, get_shard
+from airflow.utils.state import State
+
+NUM_SHARDS = 4
+
+
+class TestShardLeaseManager(unittest.TestCase):
+    def setUp(self):
+        self.session = settings.Session()
+        self._clean()
+
+    def tearDown(self):
+        self._clean()
+        self.session.close()
+
+    def _clean(self):
+        self.session.query(SchedulerShardLease).delete()
+        self.session.query(SchedulerJob).delete()
+        self.session.commit()
+
+    def _start_scheduler(self):
+        job = SchedulerJob()
+        job.state = State.RUNNING
+        self.session.add(job)
+        self.session.commit()
+        return job.id, ShardLeaseManager(job.id, NUM_SHARDS, lease_timeout=30)
+
+    def test_get_shard(self):
+        shard = get_shard('/dags/a/dag.py', '/dags', NUM_SHARDS)
+        self.assertIn(shard, range(NUM_SHARDS))
+        # Only the path relative to the DAGs folder matters
+        self.assertEqual(shard, get_shard('/other/a/dag.py', '/other', NUM_SHARDS))
+
+    def test_rebalance(self):
+        job_a_id, manager_a = self._start_scheduler()
+        # The shards were never owned
+        self.assertEqual(set(range(NUM_SHARDS)), manager_a.heartbeat())
+        self.assertEqual(set(range(NUM_SHARDS)), manager_a.shards)
+
+        # A new scheduler waits for the others to release their extra shards
+        _, manager_b = self._start_scheduler()
+        self.assertEqual(set(), manager_b.heartbeat())
+        self.assertEqual(set(), manager_b.shards)
+        manager_a.heartbeat()
+        self.assertEqual(NUM_SHARDS // 2, len(manager_a.shards))
+        # The scheduler that released the shards may still run their tasks
+        self.assertEqual(set(), manager_b.heartbeat())
+        self.assertEqual(set(range(NUM_SHARDS)) - manager_a.shards, manager_b.shards)
+
+        # The shards of a scheduler that died are taken over once its lease
+        # expired
+        dead_shards = manager_a.shards
+        expired = datetime.datetime.utcnow() - datetime.timedelta(minutes=1)
+        (self.session.query(SchedulerJob)
+         .filter(SchedulerJob.id == job_a_id)
+         .update({SchedulerJob.latest_heartbeat: expired}))
+        (self.session.query(SchedulerShardLease)
+         .filter(SchedulerShardLease.scheduler_id == job_a_id)
+         .update({SchedulerShardLease.latest_heartbeat: expired}))
+        self.session.commit()
+        self.assertEqual(dead_shards, manager_b.heartbeat())
+        self.assertEqual(set(range(NUM_SHARDS)), manager_b.shards)
+
+        manager_b.release()
+        self.assertEqual(0, self.session.query(SchedulerShardLease).filter(
+            SchedulerShardLease.scheduler_id != None).count())
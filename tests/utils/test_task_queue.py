@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from airflow.utils.task_queue import TaskQueue
+
+
+def task(priority, queue='default'):
+    return ('command', priority, queue, None)
+
+
+class TestTaskQueue(unittest.TestCase):
+    def test_pop_highest(self):
+        queue = TaskQueue()
+        queue['low'] = task(1)
+        queue['high'] = task(10)
+        queue['medium_1'] = task(5)
+        queue['medium_2'] = task(5)
+
+        self.assertEqual(['high', 'medium_1'],
+                         [key for key, _ in queue.pop_highest(2)])
+        self.assertEqual(['medium_2', 'low'],
+                         [key for key, _ in queue.pop_highest(10)])
+        self.assertEqual([], queue.pop_highest(10))
+        self.assertEqual(0, len(queue))
+
+    def test_mapping_changes(self):
+        queue = TaskQueue()
+        queue['a'] = task(1)
+        queue['b'] = task(2)
+        queue['c'] = task(3)
+        queue.pop('c')
+        del queue['b']
+        # Replaced with a lower priority
+        queue['a'] = task(0)
+        queue['d'] = task(1)
+
+        self.assertIn('a', queue)
+        self.assertNotIn('b', queue)
+        self.assertEqual([('d', task(1)), ('a', task(0))], queue.pop_highest(10))
+
+        queue['e'] = task(1)
+        queue.clear()
+        self.assertEqual([], queue.pop_highest(10))
+
+    def test_pop_highest_by_queue(self):
+        queue = TaskQueue()
+        queue['a'] = task(1, 'q1')
+        queue['b'] = task(2, 'q2')
+        queue['c'] = task(3, 'q1')
+
+        self.assertEqual(['c', 'a'],
+                         [key for key, _ in queue.pop_highest(10, queue='q1')])
+        self.assertEqual([], queue.pop_highest(10, queue='q3'))
+        self.assertEqual(['b'], [key for key, _ in queue.pop_highest(10)])
+
+    def test_compaction(self):
+        queue = TaskQueue()
+        for i in range(1000):
+            queue[i] = task(i)
+            queue.pop(i)
+        queue['last'] = task(0)
+        self.assertLess(len(queue._heap), 100)
+        self.assertEqual(['last'], [key for key, _ in queue.pop_highest(10)])